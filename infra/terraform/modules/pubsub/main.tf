@@ -33,3 +33,17 @@ resource "google_pubsub_topic" "dlq" {
   name     = "${each.key}-dlq"
   project  = var.project_id
 }
+
+# Payment events are published with the booking id as ordering key
+# (services/payment-service/src/events.py); subscribers must opt in to ordering
+resource "google_pubsub_topic" "payment_events" {
+  name    = "payment-events"
+  project = var.project_id
+}
+
+resource "google_pubsub_subscription" "payment_events_read_model" {
+  name                    = "payment-events-read-model-sub"
+  topic                   = google_pubsub_topic.payment_events.name
+  project                 = var.project_id
+  enable_message_ordering = true
+}
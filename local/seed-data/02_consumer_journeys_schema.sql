@@ -141,6 +141,18 @@ ALTER TABLE bookings ADD COLUMN IF NOT EXISTS cancelled_at TIMESTAMP WITH TIME Z
 ALTER TABLE bookings ADD COLUMN IF NOT EXISTS cancellation_reason TEXT;
 ALTER TABLE bookings ADD COLUMN IF NOT EXISTS total_price DECIMAL(10, 2);
 ALTER TABLE bookings ADD COLUMN IF NOT EXISTS hotel_id UUID;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITH TIME ZONE;
+-- Give PENDING bookings created before expires_at existed the standard hold
+-- (BOOKING_EXPIRATION_MINUTES), so the expiry sweeper can see them
+UPDATE bookings SET expires_at = created_at + interval '15 minutes'
+WHERE status = 'PENDING' AND expires_at IS NULL;
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS total_amount DECIMAL(10, 2);
+-- Bumped on every status change; transitions are conditional on it (shared/transitions)
+ALTER TABLE bookings ADD COLUMN IF NOT EXISTS version INT NOT NULL DEFAULT 0;
+
+-- PNR numbers are reserved in blocks of 100 per booking-service process;
+-- see services/booking-service/src/pnr.py (2^30 codes = 6 base32 chars)
+CREATE SEQUENCE IF NOT EXISTS booking_pnr_seq INCREMENT BY 100 MINVALUE 0 MAXVALUE 1073741823 START WITH 0;
 
 -- Booking Extras (Journey 104)
 CREATE TABLE IF NOT EXISTS booking_extras (
@@ -152,6 +164,55 @@ CREATE TABLE IF NOT EXISTS booking_extras (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Transactional outbox for booking events: rows are written in the same
+-- transaction as the booking change and published by the relay worker
+CREATE TABLE IF NOT EXISTS booking_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    topic VARCHAR(100) NOT NULL,
+    event_type VARCHAR(100) NOT NULL,
+    aggregate_id UUID,
+    payload JSONB NOT NULL,
+    ordering_key VARCHAR(100),
+    attempts INT DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),  -- Pushed back exponentially on failure
+    published_at TIMESTAMP WITH TIME ZONE,
+    parked_at TIMESTAMP WITH TIME ZONE  -- Set once attempts run out; parked rows are never relayed
+);
+
+-- Checkout sagas (book -> pay -> ticket) with persisted step state.
+-- Card details are never stored; see services/booking-service/src/saga.py
+CREATE TABLE IF NOT EXISTS booking_sagas (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    step VARCHAR(20) NOT NULL,
+    booking_id UUID,
+    payment_id UUID,
+    ticket_ids JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Booking read model ("My trips"): one row per booking with flight and
+-- passenger summaries, maintained from booking and flight events
+CREATE TABLE IF NOT EXISTS booking_summaries (
+    booking_id UUID PRIMARY KEY,
+    user_id UUID NOT NULL,
+    pnr VARCHAR(20),
+    resource_type VARCHAR(20),
+    resource_id UUID,
+    status VARCHAR(20),
+    total_amount DECIMAL(10, 2),
+    created_at TIMESTAMP WITH TIME ZONE,
+    expires_at TIMESTAMP WITH TIME ZONE,
+    flight JSONB,
+    passengers JSONB NOT NULL DEFAULT '[]',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Passengers (Journey 110)
 CREATE TABLE IF NOT EXISTS passengers (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -169,6 +230,56 @@ CREATE TABLE IF NOT EXISTS passengers (
 -- PAYMENT SERVICE EXTENSIONS
 -- ==========================================
 
+-- Optimistic concurrency for payment status changes (shared/transitions)
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS version INT NOT NULL DEFAULT 0;
+
+-- Asynchronous payments: the PENDING row is the job (services/payment-service/src/workers/payment_jobs.py)
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS transaction_id VARCHAR(100);
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS error TEXT;
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+-- Nightly payment/booking reconciliation (services/payment-service/src/workers/reconciliation.py)
+CREATE TABLE IF NOT EXISTS payment_reconciliation_runs (
+    id UUID PRIMARY KEY,
+    status VARCHAR(20) NOT NULL, -- RUNNING, COMPLETED, FAILED, SKIPPED
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE,
+    bookings_scanned BIGINT DEFAULT 0,
+    payments_scanned BIGINT DEFAULT 0,
+    discrepancies BIGINT DEFAULT 0,
+    error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS payment_reconciliation_discrepancies (
+    id BIGSERIAL PRIMARY KEY,
+    run_id UUID NOT NULL REFERENCES payment_reconciliation_runs(id) ON DELETE CASCADE,
+    kind VARCHAR(40) NOT NULL,
+    booking_id UUID,
+    payment_id UUID,
+    booking_status VARCHAR(20),
+    payment_status VARCHAR(20),
+    amount DECIMAL(10, 2),
+    detected_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Batch refund jobs (services/payment-service/src/workers/batch_refunds.py)
+CREATE TABLE IF NOT EXISTS payment_refund_jobs (
+    id UUID PRIMARY KEY,
+    status VARCHAR(30) NOT NULL, -- PENDING, RUNNING, COMPLETED, COMPLETED_WITH_ERRORS, FAILED
+    flight_id UUID,
+    payment_ids JSONB,
+    reason TEXT,
+    total INT DEFAULT 0,
+    refunded INT DEFAULT 0,
+    failed INT DEFAULT 0,
+    skipped INT DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),  -- Last progress; stale PENDING/RUNNING jobs are resumed
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Promotions (Journey 28)
 CREATE TABLE IF NOT EXISTS promotions (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -197,6 +308,21 @@ CREATE TABLE IF NOT EXISTS promotion_usage (
     used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Promotion targeting (NULL = applies to any route / class)
+ALTER TABLE promotions ADD COLUMN IF NOT EXISTS origin VARCHAR(3);
+ALTER TABLE promotions ADD COLUMN IF NOT EXISTS destination VARCHAR(3);
+ALTER TABLE promotions ADD COLUMN IF NOT EXISTS class_type VARCHAR(20);
+
+-- Sharded promotion usage counters: redemptions spread over N rows so
+-- concurrent checkouts don't queue on a single row lock
+CREATE TABLE IF NOT EXISTS promotion_usage_counters (
+    promotion_id UUID REFERENCES promotions(id),
+    shard INT NOT NULL,
+    uses INT NOT NULL DEFAULT 0,
+    capacity INT, -- NULL = unlimited
+    PRIMARY KEY (promotion_id, shard)
+);
+
 -- EMI Plans (Journey 105)
 CREATE TABLE IF NOT EXISTS emi_plans (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -219,6 +345,20 @@ CREATE TABLE IF NOT EXISTS emi_installments (
     status VARCHAR(20)
 );
 
+-- EMI scheduler state (services/payment-service/src/workers/emi_scheduler.py)
+-- status: PENDING -> PROCESSING -> PAID | FAILED; next_attempt_at doubles as the claim lease.
+-- Installments inserted without next_attempt_at are first due on their due_date
+ALTER TABLE emi_installments ADD COLUMN IF NOT EXISTS attempts INT NOT NULL DEFAULT 0;
+ALTER TABLE emi_installments ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE emi_installments ADD COLUMN IF NOT EXISTS claim_token UUID;
+ALTER TABLE emi_installments ADD COLUMN IF NOT EXISTS last_error TEXT;
+ALTER TABLE emi_installments ADD COLUMN IF NOT EXISTS transaction_id VARCHAR(100);
+UPDATE emi_installments SET status = 'PENDING' WHERE status IS NULL AND paid_at IS NULL;
+UPDATE emi_installments SET status = 'PAID' WHERE status IS NULL;
+ALTER TABLE emi_installments ALTER COLUMN status SET DEFAULT 'PENDING';
+ALTER TABLE emi_installments ALTER COLUMN status SET NOT NULL;
+UPDATE emi_installments SET next_attempt_at = due_date WHERE next_attempt_at IS NULL;
+
 -- Invoices (Journey 27)
 CREATE TABLE IF NOT EXISTS invoices (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -228,6 +368,37 @@ CREATE TABLE IF NOT EXISTS invoices (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Month-end invoice runs (services/payment-service/src/workers/invoices.py)
+CREATE TABLE IF NOT EXISTS invoice_runs (
+    id UUID PRIMARY KEY,
+    period VARCHAR(7) NOT NULL, -- YYYY-MM
+    status VARCHAR(20) NOT NULL, -- RUNNING, COMPLETED, FAILED
+    invoices INT DEFAULT 0,
+    bytes BIGINT DEFAULT 0,
+    seconds DECIMAL(10, 3),
+    worker_stats JSONB,
+    error TEXT,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    heartbeat_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(), -- A RUNNING run silent for INVOICE_RUN_STALE_SECONDS is abandoned
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Idempotency keys for retried POSTs (booking-service, payment-service).
+-- Stores the exact response so retries are replayed instead of re-executed.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(50) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL,
+    state VARCHAR(20) NOT NULL,
+    owner UUID,  -- Claim token; only the owner renews, completes or releases an IN_PROGRESS key
+    status_code INT,
+    response_headers TEXT,
+    response_body BYTEA,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+
 -- ==========================================
 -- SEARCH SERVICE EXTENSIONS
 -- ==========================================
@@ -306,6 +477,19 @@ CREATE TABLE IF NOT EXISTS tickets (
     issued_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Boarding pass fields, denormalized so a ticket read is a single-row lookup
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS passenger_name VARCHAR(255);
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS flight_id UUID;
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS flight_number VARCHAR(20);
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS origin VARCHAR(3);
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS destination VARCHAR(3);
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS departure_time TIMESTAMP WITH TIME ZONE;
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS arrival_time TIMESTAMP WITH TIME ZONE;
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS seat_number VARCHAR(10);
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS qr_code_data TEXT;
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'VALID'; -- VALID, USED, CANCELLED
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
 -- ==========================================
 -- IOT SERVICE
 -- ==========================================
@@ -368,13 +552,74 @@ CREATE TABLE IF NOT EXISTS system_metrics (
 CREATE INDEX IF NOT EXISTS idx_webhooks_user_id ON webhooks(user_id);
 CREATE INDEX IF NOT EXISTS idx_bookings_user_id ON bookings(user_id);
 CREATE INDEX IF NOT EXISTS idx_bookings_pnr ON bookings(pnr);
+-- Batch refunds select every booking on a cancelled flight
+CREATE INDEX IF NOT EXISTS idx_bookings_resource_id ON bookings(resource_id);
+-- Partial index for the expiry sweeper: only unpaid bookings are ever scanned
+CREATE INDEX IF NOT EXISTS idx_bookings_pending_expires_at ON bookings(expires_at) WHERE status = 'PENDING';
+-- Partial index for the payment job requeue loop
+CREATE INDEX IF NOT EXISTS idx_payments_active ON payments(updated_at) WHERE status IN ('PENDING', 'PROCESSING');
+-- Only due/claimed EMI installments are ever scanned by the scheduler
+CREATE INDEX IF NOT EXISTS idx_emi_installments_due ON emi_installments(next_attempt_at) WHERE status IN ('PENDING', 'PROCESSING');
+CREATE INDEX IF NOT EXISTS idx_emi_installments_unscheduled ON emi_installments(due_date) WHERE status = 'PENDING' AND next_attempt_at IS NULL;
+-- One invoice per payment; also serves the invoice job's NOT EXISTS check
+CREATE UNIQUE INDEX IF NOT EXISTS idx_invoices_payment_id ON invoices(payment_id);
+-- Reconciliation streams payments in booking order (bookings use their primary key)
+CREATE INDEX IF NOT EXISTS idx_payments_booking_id ON payments(booking_id, id);
+CREATE INDEX IF NOT EXISTS idx_reconciliation_discrepancies_run ON payment_reconciliation_discrepancies(run_id, kind);
+CREATE INDEX IF NOT EXISTS idx_payment_refund_jobs_active ON payment_refund_jobs(updated_at) WHERE status IN ('PENDING', 'RUNNING');
+CREATE INDEX IF NOT EXISTS idx_booking_outbox_unpublished ON booking_outbox(id) WHERE published_at IS NULL AND parked_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_booking_sagas_active ON booking_sagas(updated_at) WHERE status IN ('RUNNING', 'COMPENSATING');
+CREATE INDEX IF NOT EXISTS idx_booking_summaries_user_created ON booking_summaries(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_booking_summaries_resource_id ON booking_summaries(resource_id);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
 CREATE INDEX IF NOT EXISTS idx_price_alerts_user_id ON price_alerts(user_id);
 CREATE INDEX IF NOT EXISTS idx_price_alerts_flight_id ON price_alerts(flight_id);
 CREATE INDEX IF NOT EXISTS idx_api_usage_logs_user_id ON api_usage_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_api_usage_logs_created_at ON api_usage_logs(created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_booking_id ON tickets(booking_id);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets(status);
+CREATE INDEX IF NOT EXISTS idx_tickets_flight_id ON tickets(flight_id);
 CREATE INDEX IF NOT EXISTS idx_support_tickets_user_id ON support_tickets(user_id);
 CREATE INDEX IF NOT EXISTS idx_support_tickets_status ON support_tickets(status);
 
+-- Backfill the booking read model for bookings that predate it (idempotent)
+INSERT INTO booking_summaries (
+    booking_id, user_id, pnr, resource_type, resource_id, status, total_amount,
+    created_at, expires_at, flight, passengers, updated_at
+)
+SELECT
+    b.id, b.user_id, b.pnr, b.resource_type, b.resource_id, b.status, b.total_amount,
+    b.created_at, b.expires_at,
+    CASE WHEN f.id IS NULL THEN NULL ELSE jsonb_build_object(
+        'flight_number', f.flight_number,
+        'origin', f.origin,
+        'destination', f.destination,
+        'price', f.base_price,
+        'currency', 'USD',
+        'departure_time', f.departure_time,
+        'arrival_time', f.arrival_time,
+        'duration_minutes', COALESCE(EXTRACT(EPOCH FROM f.arrival_time - f.departure_time)::int / 60, 0),
+        'airline', 'JourneyIQ Air',
+        'aircraft', 'Boeing 737-800',
+        'status', f.status
+    ) END,
+    COALESCE((
+        SELECT jsonb_agg(jsonb_build_object(
+            'first_name', p.first_name,
+            'last_name', p.last_name,
+            'title', p.title,
+            'date_of_birth', p.date_of_birth,
+            'passport_number', p.passport_number,
+            'email', p.email,
+            'phone', p.phone
+        ))
+        FROM passengers p WHERE p.booking_id = b.id
+    ), '[]'::jsonb),
+    now()
+FROM bookings b
+LEFT JOIN flights f ON b.resource_type = 'FLIGHT' AND f.id = b.resource_id
+ON CONFLICT (booking_id) DO NOTHING;
+
 -- Success message
 DO $$
 BEGIN
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 import logging
+from shared.http_client import close_clients
 from src.routes import admin
 
 # Configure logging
@@ -34,6 +35,11 @@ Instrumentator().instrument(app).expose(app)
 # Include routers
 app.include_router(admin.router)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close pooled inter-service HTTP connections
+    await close_clients()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
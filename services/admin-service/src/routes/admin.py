@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Any
 from pydantic import BaseModel
-import httpx
 import asyncio
+from shared.http_client import get_client
 from src.config import settings
 
 router = APIRouter(tags=["admin"])
@@ -36,15 +36,14 @@ async def system_health_check():
     results = []
     failed_count = 0
     
-    async with httpx.AsyncClient(timeout=3.0) as client:
-        # Check all services in parallel
-        tasks = [check_service(client, s["name"], s["url"]) for s in services]
-        service_statuses = await asyncio.gather(*tasks)
-        
-        for status in service_statuses:
-            results.append(status)
-            if status.status != "UP":
-                failed_count += 1
+    # Check all services in parallel over pooled keep-alive connections
+    tasks = [check_service(get_client(s["name"]), s["name"], s["url"]) for s in services]
+    service_statuses = await asyncio.gather(*tasks)
+    
+    for status in service_statuses:
+        results.append(status)
+        if status.status != "UP":
+            failed_count += 1
     
     overall = "HEALTHY"
     if failed_count == len(services):
@@ -56,7 +55,7 @@ async def system_health_check():
 
 async def check_service(client, name, url) -> ServiceStatus:
     try:
-        response = await client.get(url)
+        response = await client.get(url, timeout=3.0)
         if response.status_code == 200:
             return ServiceStatus(service=name, status="UP", details=response.json())
         else:
@@ -72,18 +71,17 @@ async def list_users():
     
     # Simulating connection to user service
     try:
-        async with httpx.AsyncClient() as client:
-            # Assuming user-service has a list endpoint (which we implemented earlier?)
-            # If not, we'll mock response for admin demo
-            # response = await client.get(f"{settings.USER_SERVICE_URL}/users")
-            # users = response.json()
-            
-            # Mock response for demo purposes
-            return [
-                {"id": "u1", "email": "admin@journeyiq.com", "role": "ADMIN", "is_active": True},
-                {"id": "u2", "email": "user@example.com", "role": "USER", "is_active": True},
-                {"id": "u3", "email": "traveler@example.com", "role": "USER", "is_active": True}
-            ]
+        # Assuming user-service has a list endpoint (which we implemented earlier?)
+        # If not, we'll mock response for admin demo
+        # response = await get_client("user-service").get(f"{settings.USER_SERVICE_URL}/users")
+        # users = response.json()
+        
+        # Mock response for demo purposes
+        return [
+            {"id": "u1", "email": "admin@journeyiq.com", "role": "ADMIN", "is_active": True},
+            {"id": "u2", "email": "user@example.com", "role": "USER", "is_active": True},
+            {"id": "u3", "email": "traveler@example.com", "role": "USER", "is_active": True}
+        ]
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"User service unavailable: {str(e)}")
 
@@ -13,6 +13,7 @@ from src.vector_db import db_instance
 from src.ingest import ingest_rag_documents
 from src.routes import health
 from src.logging import setup_logging, logger
+from shared.http_client import close_clients
 
 # ============================================================================
 # Pydantic Models
@@ -107,6 +108,11 @@ async def startup_event():
     logger.info("Starting AI Service - initializing RAG ingestion")
     asyncio.create_task(ingest_rag_documents())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled inter-service HTTP connections"""
+    await close_clients()
+
 # ============================================================================
 # AI Agent Endpoints
 # ============================================================================
@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from src.logging import setup_logging
 from src.routes import health, auth
 from prometheus_fastapi_instrumentator import Instrumentator
+from shared.http_client import close_clients
 import os
 
 app = FastAPI(
@@ -60,6 +61,11 @@ async def startup_event():
     # In a real app, initialize DB connection pool here if not using dependency injection
     pass
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close pooled inter-service HTTP connections
+    await close_clients()
+
 @app.get("/health", tags=["Health"])
 async def health_check():
     return {"status": "healthy"}
@@ -57,20 +57,20 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     
     # Sync with User Service
     try:
-        import httpx
+        from shared.http_client import get_client
         from src.config import settings
         # Assuming settings.USER_SERVICE_URL exists or hardcoded for now in this MVP fix
         # In production, use a message queue (Kafka/RabbitMQ) for reliability
         user_service_url = f"{settings.USER_SERVICE_URL}/" 
         
-        async with httpx.AsyncClient() as client:
-            await client.post(user_service_url, json={
-                "id": new_user.id,
-                "email": user.email,
-                "full_name": user.full_name,
-                "preferences": {}
-            })
-            logger.info(f"Synced user {user.email} to User Service")
+        client = get_client("user-service")
+        await client.post(user_service_url, json={
+            "id": new_user.id,
+            "email": user.email,
+            "full_name": user.full_name,
+            "preferences": {}
+        })
+        logger.info(f"Synced user {user.email} to User Service")
             
     except Exception as e:
         logger.error(f"Failed to sync user to User Service: {str(e)}")
@@ -1,8 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
+import asyncio
 import logging
-from src.routes import bookings
+from contextlib import asynccontextmanager
+from shared.http_client import close_clients
+from shared.idempotency import IdempotencyMiddleware, PostgresIdempotencyStore
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.routes import bookings, checkout
+from src.workers.expiry_sweeper import run_expiry_sweeper
+from src.workers.outbox_relay import run_outbox_relay
+from src.read_model import rebuild_all
+from src.saga import booking_saga
+from src.workers.read_model_consumer import read_model_consumer
 
 # Configure logging
 logging.basicConfig(
@@ -12,11 +23,39 @@ logging.basicConfig(
 
 logger = logging.getLogger("booking-service")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: Background workers (expiry sweeper, outbox relay)
+    workers = []
+    if settings.BOOKING_SWEEP_ENABLED:
+        workers.append(asyncio.create_task(run_expiry_sweeper()))
+    if settings.OUTBOX_RELAY_ENABLED:
+        workers.append(asyncio.create_task(run_outbox_relay()))
+    if settings.READ_MODEL_REBUILD_ON_STARTUP:
+        async with AsyncSessionLocal() as db:
+            await rebuild_all(db)
+            await db.commit()
+        logger.info("Booking read model rebuilt")
+    if settings.READ_MODEL_ENABLED:
+        read_model_consumer.start(asyncio.get_running_loop())
+    try:
+        await booking_saga.recover()
+    except Exception as e:
+        logger.error(f"Checkout saga recovery failed: {e}")
+    yield
+    # Shutdown: Stop background workers, then close pooled inter-service HTTP connections
+    read_model_consumer.stop()
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await close_clients()
+
 # Create FastAPI app
 app = FastAPI(
     title="JourneyIQ Booking Service",
     description="Booking management with passenger information and payment integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -28,6 +67,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Retried booking creations replay the original response instead of booking twice
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=PostgresIdempotencyStore(AsyncSessionLocal, ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+    scope="booking-service",
+    routes=[("POST", "/"), ("POST", "/bulk"), ("POST", "/checkout")]
+)
+
 # Prometheus metrics
 Instrumentator().instrument(app).expose(app)
 
@@ -47,15 +94,19 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "create_booking": "POST /bookings",
+            "create_bookings_bulk": "POST /bookings/bulk",
             "get_booking": "GET /bookings/{id}",
+            "get_booking_by_pnr": "GET /bookings/pnr/{pnr}",
             "list_user_bookings": "GET /bookings/user/{user_id}",
             "cancel_booking": "DELETE /bookings/{id}",
+            "checkout": "POST /bookings/checkout",
             "health": "/health"
         }
     }
 
 
 # Include routers (After static routes to avoid shadowing)
+app.include_router(checkout.router)
 app.include_router(bookings.router)
 
 if __name__ == "__main__":
@@ -12,8 +12,43 @@ class Settings(BaseSettings):
     # Service URLs
     PRICING_SERVICE_URL: str = os.getenv("PRICING_SERVICE_URL", "http://pricing-service:8000")
     INVENTORY_SERVICE_URL: str = os.getenv("INVENTORY_SERVICE_URL", "http://inventory-service:8000")
+    PAYMENT_SERVICE_URL: str = os.getenv("PAYMENT_SERVICE_URL", "http://payment-service:8000")
+    TICKETING_SERVICE_URL: str = os.getenv("TICKETING_SERVICE_URL", "http://ticketing-service:8000")
     
     # Booking settings
     BOOKING_EXPIRATION_MINUTES: int = 15  # Unpaid bookings expire after 15 minutes
+    BULK_BOOKING_MAX_ITEMS: int = 100  # Per POST /bulk request
+    
+    # Hot-PNR lookup cache (check-in / kiosk traffic)
+    PNR_CACHE_MAX_ENTRIES: int = 10000
+    PNR_CACHE_TTL_SECONDS: float = 15.0
+    
+    # Checkout saga (book -> pay -> ticket)
+    SAGA_TICKET_ATTEMPTS: int = 3  # Ticketing is retried before the saga compensates
+    SAGA_RECOVERY_AFTER_SECONDS: int = 120  # Running sagas untouched this long are recovered on startup
+    
+    # Expiry sweeper
+    BOOKING_SWEEP_ENABLED: bool = True
+    BOOKING_SWEEP_INTERVAL_SECONDS: int = 30
+    BOOKING_SWEEP_BATCH_SIZE: int = 500
+    BOOKING_SWEEP_MAX_BATCHES: int = 20  # Per tick, so one replica can't monopolize a backlog
+    
+    # Idempotency-Key replay window for POST /
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    
+    # Booking read model consumers
+    READ_MODEL_ENABLED: bool = True
+    READ_MODEL_REBUILD_ON_STARTUP: bool = False  # Repair booking_summaries from source tables (the migration backfills)
+    READ_MODEL_BOOKING_SUBSCRIPTION: str = "booking-events-read-model-sub"
+    READ_MODEL_PAYMENT_SUBSCRIPTION: str = "payment-events-read-model-sub"
+    READ_MODEL_FLIGHT_SUBSCRIPTION: str = "inventory.flight.updated.v1-read-model-sub"
+    
+    # Outbox relay
+    OUTBOX_RELAY_ENABLED: bool = True
+    OUTBOX_RELAY_BATCH_SIZE: int = 200
+    OUTBOX_RELAY_POLL_SECONDS: float = 1.0  # Idle poll; new commits wake the relay immediately
+    OUTBOX_RELAY_MAX_ATTEMPTS: int = 10  # Failed events are parked after this many publishes
+    OUTBOX_RETRY_BASE_SECONDS: float = 2.0  # Backoff doubles per attempt...
+    OUTBOX_RETRY_MAX_SECONDS: float = 600.0  # ...up to this
 
 settings = Settings()
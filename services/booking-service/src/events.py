@@ -1,8 +1,9 @@
+import asyncio
 import json
 from google.cloud import pubsub_v1
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, Callable, List, Optional
 from datetime import datetime
 
 logger = logging.getLogger("events")
@@ -17,11 +18,25 @@ class EventProducer:
             self.client = pubsub_v1.PublisherClient()
         except Exception as e:
             logger.warning(f"PubSub client init failed (expected in local without creds): {e}")
+        # In mock mode, published events are handed to these in-process listeners
+        self.local_listeners: List[Callable[[str, List[Dict[str, Any]]], Awaitable[None]]] = []
+
+    def add_local_listener(self, listener: Callable[[str, List[Dict[str, Any]]], Awaitable[None]]):
+        """Receive events in-process when Pub/Sub is unavailable (local dev)."""
+        self.local_listeners.append(listener)
+
+    async def _dispatch_local(self, topic_id: str, events: List[Dict[str, Any]]):
+        for listener in self.local_listeners:
+            try:
+                await listener(topic_id, events)
+            except Exception as e:
+                logger.warning(f"Local event listener failed for {topic_id}: {e}")
 
     async def publish(self, topic_id: str, data: Dict[str, Any], ordering_key: str = None):
         """Publish event to Pub/Sub topic."""
         if not self.client:
             logger.info(f"[MOCK PUBLISH] Topic: {topic_id}, Data: {data}")
+            await self._dispatch_local(topic_id, [data])
             return "mock-msg-id"
 
         topic_path = self.client.topic_path(self.project_id, topic_id)
@@ -55,43 +70,103 @@ class EventProducer:
         logger.info(f"Published message {message_id} to {topic_id}")
         return message_id
 
+    async def publish_batch(self, topic_id: str, events: List[Dict[str, Any]], ordering_keys: List[Optional[str]] = None) -> List[bool]:
+        """
+        Publish many events to one topic.
+
+        All messages are handed to the client first (which batches them on
+        the wire), then the futures are awaited together off the event loop.
+        Unlike publish(), failures are reported rather than swallowed:
+        returns one success flag per event, in order.
+        """
+        if not events:
+            return []
+        if not self.client:
+            logger.info(f"[MOCK PUBLISH] Topic: {topic_id}, Batch of {len(events)} events")
+            await self._dispatch_local(topic_id, events)
+            return [True] * len(events)
+
+        topic_path = self.client.topic_path(self.project_id, topic_id)
+        keys = ordering_keys or [None] * len(events)
+        futures = []
+        for data, key in zip(events, keys):
+            data_str = json.dumps(data).encode("utf-8")
+            if key:
+                futures.append(self.client.publish(topic_path, data_str, ordering_key=key))
+            else:
+                futures.append(self.client.publish(topic_path, data_str))
+
+        def _wait() -> List[bool]:
+            results = []
+            for future in futures:
+                try:
+                    future.result()
+                    results.append(True)
+                except Exception as e:
+                    logger.warning(f"Failed to publish to {topic_id}: {e}")
+                    results.append(False)
+            return results
+
+        results = await asyncio.to_thread(_wait)
+        if not any(results):
+            # Most likely a missing topic; create it so the next attempt can succeed
+            try:
+                self.client.create_topic(name=topic_path)
+                logger.info(f"Created topic {topic_id}")
+            except Exception:
+                pass
+        logger.info(f"Published {sum(results)}/{len(events)} messages to {topic_id}")
+        return results
+
 producer = EventProducer()
 
+BOOKING_TOPIC = "booking-events"
+
+# Booking event payloads (staged in the outbox or published directly)
+def booking_created_event(booking_id: str, user_id: str, amount: float, currency: str = "USD") -> Dict[str, Any]:
+    return {
+        "event_type": "booking.created",
+        "booking_id": booking_id,
+        "user_id": user_id,
+        "amount": amount,
+        "currency": currency,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def booking_confirmed_event(booking_id: str) -> Dict[str, Any]:
+    return {
+        "event_type": "booking.confirmed",
+        "booking_id": booking_id,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def booking_cancelled_event(booking_id: str, reason: str = None, refundable: bool = False) -> Dict[str, Any]:
+    return {
+        "event_type": "booking.cancelled",
+        "booking_id": booking_id,
+        "reason": reason,
+        "refundable": refundable,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 # Convenience functions for booking events
 async def publish_booking_created(booking_id: str, user_id: str, amount: float, currency: str = "USD"):
     """Publish booking.created event."""
     await producer.publish(
-        topic_id="booking-events",
-        data={
-            "event_type": "booking.created",
-            "booking_id": booking_id,
-            "user_id": user_id,
-            "amount": amount,
-            "currency": currency,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        topic_id=BOOKING_TOPIC,
+        data=booking_created_event(booking_id, user_id, amount, currency)
     )
 
 async def publish_booking_confirmed(booking_id: str):
     """Publish booking.confirmed event."""
     await producer.publish(
-        topic_id="booking-events",
-        data={
-            "event_type": "booking.confirmed",
-            "booking_id": booking_id,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        topic_id=BOOKING_TOPIC,
+        data=booking_confirmed_event(booking_id)
     )
 
 async def publish_booking_cancelled(booking_id: str, reason: str = None, refundable: bool = False):
     """Publish booking.cancelled event."""
     await producer.publish(
-        topic_id="booking-events",
-        data={
-            "event_type": "booking.cancelled",
-            "booking_id": booking_id,
-            "reason": reason,
-            "refundable": refundable,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-    )
\ No newline at end of file
+        topic_id=BOOKING_TOPIC,
+        data=booking_cancelled_event(booking_id, reason, refundable)
+    )
@@ -0,0 +1,119 @@
+"""
+Request-scoped batch loaders for booking reads.
+
+Booking endpoints used to issue one `select(Flight)` per booking. A
+BookingLoader collects the flight ids referenced by a page of bookings
+and fetches them with a single `IN` query, caching results for the rest
+of the request. Passengers are eager-loaded with `selectinload`, which
+is one extra query per page regardless of page size.
+
+Usage:
+    @router.get("/...")
+    async def endpoint(loader: BookingLoader = Depends(get_booking_loader)):
+        bookings = await loader.load_bookings(select(Booking).where(...))
+        return [loader.serialize(b) for b in bookings]
+"""
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from src.database import get_db
+from src.models import Booking, Flight, Passenger
+
+
+def flight_resource_details(flight: Flight, class_type: Optional[str] = None) -> dict:
+    """Standard `resource_details` payload for a flight."""
+    details = {
+        "flight_number": flight.flight_number,
+        "origin": flight.origin,
+        "destination": flight.destination,
+        "price": float(flight.base_price),
+        "currency": "USD",
+        "departure_time": flight.departure_time.isoformat() if flight.departure_time else None,
+        "arrival_time": flight.arrival_time.isoformat() if flight.arrival_time else None,
+        "duration_minutes": int((flight.arrival_time - flight.departure_time).total_seconds() / 60) if flight.arrival_time and flight.departure_time else 0,
+        "airline": "JourneyIQ Air",
+        "aircraft": "Boeing 737-800"
+    }
+    if class_type:
+        details["class_type"] = class_type
+    return details
+
+
+def passenger_details(passenger: Passenger) -> dict:
+    """Standard passenger payload."""
+    return {
+        "first_name": passenger.first_name,
+        "last_name": passenger.last_name,
+        "title": passenger.title,
+        "date_of_birth": passenger.date_of_birth.isoformat() if passenger.date_of_birth else None,
+        "passport_number": passenger.passport_number,
+        "email": passenger.email,
+        "phone": passenger.phone
+    }
+
+
+class BookingLoader:
+    """Batches and caches flight lookups for the lifetime of one request."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._flights: Dict[UUID, Optional[Flight]] = {}
+
+    async def load_flights(self, flight_ids: Iterable[UUID]) -> Dict[UUID, Optional[Flight]]:
+        """Fetch all uncached flights in one query; returns id -> Flight (or None)."""
+        wanted = {UUID(str(fid)) for fid in flight_ids if fid is not None}
+        missing = wanted - self._flights.keys()
+        if missing:
+            result = await self.db.execute(select(Flight).where(Flight.id.in_(missing)))
+            found = {flight.id: flight for flight in result.scalars().all()}
+            for fid in missing:
+                self._flights[fid] = found.get(fid)
+        return {fid: self._flights[fid] for fid in wanted}
+
+    async def load_flight(self, flight_id: UUID) -> Optional[Flight]:
+        flights = await self.load_flights([flight_id])
+        return flights.get(UUID(str(flight_id)))
+
+    async def load_bookings(self, query) -> List[Booking]:
+        """Run a booking query with passengers eager-loaded and prime the flight cache."""
+        result = await self.db.execute(query.options(selectinload(Booking.passengers)))
+        bookings = result.scalars().all()
+        await self.load_flights(b.resource_id for b in bookings if b.resource_type == "FLIGHT")
+        return bookings
+
+    async def load_booking(self, booking_id: str) -> Optional[Booking]:
+        bookings = await self.load_bookings(select(Booking).where(Booking.id == booking_id))
+        return bookings[0] if bookings else None
+
+    def resource_details(self, booking: Booking) -> Optional[dict]:
+        """Resource details from the cache; call after load_bookings()."""
+        if booking.resource_type != "FLIGHT":
+            return None
+        flight = self._flights.get(booking.resource_id)
+        return flight_resource_details(flight) if flight else None
+
+    def serialize(self, booking: Booking) -> dict:
+        """Standard booking payload with flight and passenger details."""
+        return {
+            "id": str(booking.id),
+            "user_id": str(booking.user_id),
+            "pnr": booking.pnr,
+            "resource_type": booking.resource_type,
+            "resource_id": str(booking.resource_id),
+            "status": booking.status,
+            "total_amount": float(booking.total_amount) if booking.total_amount else 0,
+            "created_at": booking.created_at.isoformat() if booking.created_at else None,
+            "expires_at": booking.expires_at.isoformat() if booking.expires_at else None,
+            "resource_details": self.resource_details(booking),
+            "passengers": [passenger_details(p) for p in booking.passengers]
+        }
+
+
+async def get_booking_loader(db: AsyncSession = Depends(get_db)) -> BookingLoader:
+    """FastAPI dependency: one loader per request, sharing the request's session."""
+    return BookingLoader(db)
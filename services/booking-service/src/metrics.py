@@ -0,0 +1,89 @@
+"""
+Custom Prometheus metrics for booking-service.
+
+HTTP request metrics come from prometheus-fastapi-instrumentator; these
+cover the booking pipeline internals.
+"""
+import time
+from contextlib import contextmanager
+from typing import Awaitable, TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+T = TypeVar("T")
+
+BOOKING_STAGE_LATENCY = Histogram(
+    "booking_create_stage_seconds",
+    "Latency of each booking creation stage",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+BOOKINGS_EXPIRED = Counter(
+    "booking_expiry_swept_total",
+    "PENDING bookings cancelled by the expiry sweeper"
+)
+
+EXPIRY_LAG = Gauge(
+    "booking_expiry_lag_seconds",
+    "Age of the oldest overdue PENDING booking (0 when the sweeper is caught up)"
+)
+
+EXPIRY_BATCH_LATENCY = Histogram(
+    "booking_expiry_batch_seconds",
+    "Duration of one expiry sweep batch (claim, update, commit)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+
+OUTBOX_PUBLISHED = Counter(
+    "booking_outbox_published_total",
+    "Outbox events handed to Pub/Sub by the relay",
+    ["result"]  # sent, failed, parked
+)
+
+OUTBOX_RELAY_LATENCY = Histogram(
+    "booking_outbox_relay_batch_seconds",
+    "Duration of one outbox relay batch (claim, publish, mark)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+
+SAGA_STEP_LATENCY = Histogram(
+    "booking_saga_step_seconds",
+    "Latency of each checkout saga step",
+    ["step"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+SAGAS_FINISHED = Counter(
+    "booking_sagas_total",
+    "Checkout sagas by final status",
+    ["status"]  # COMPLETED, COMPENSATED, FAILED
+)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Record the duration of a block under `booking_create_stage_seconds{stage=...}`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        BOOKING_STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_saga_step(step: str):
+    """Record the duration of a block under `booking_saga_step_seconds{step=...}`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SAGA_STEP_LATENCY.labels(step).observe(time.perf_counter() - start)
+
+
+async def timed(stage: str, awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, recording its latency as a booking stage."""
+    with track_stage(stage):
+        return await awaitable
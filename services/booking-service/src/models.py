@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, TIMESTAMP, DECIMAL, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, TIMESTAMP, DECIMAL, ForeignKey, BigInteger, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -10,11 +10,16 @@ class Booking(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True)
     user_id = Column(UUID(as_uuid=True), nullable=False)
+    pnr = Column(String(20), unique=True)  # 6-char booking reference, see src/pnr.py
     resource_type = Column(String(20), nullable=False)  # FLIGHT, HOTEL
     resource_id = Column(UUID(as_uuid=True), nullable=False)
     status = Column(String(20), nullable=False)  # PENDING, CONFIRMED, CANCELLED
+    version = Column(Integer, nullable=False, default=0)  # Bumped on every status change, see shared/transitions
     total_amount = Column(DECIMAL(10, 2), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True))
+    expires_at = Column(TIMESTAMP(timezone=True))  # Unpaid PENDING bookings expire after this
+    cancelled_at = Column(TIMESTAMP(timezone=True))
+    cancellation_reason = Column(String)
     passengers = relationship("Passenger", back_populates="booking", cascade="all, delete-orphan")
 
 class Passenger(Base):
@@ -42,3 +47,51 @@ class Flight(Base):
     arrival_time = Column(TIMESTAMP(timezone=True), nullable=False)
     base_price = Column(DECIMAL(10, 2), nullable=False)
     status = Column(String(20), default='SCHEDULED')
+
+class OutboxEvent(Base):
+    __tablename__ = "booking_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    topic = Column(String(100), nullable=False)
+    event_type = Column(String(100), nullable=False)
+    aggregate_id = Column(UUID(as_uuid=True))  # Booking the event is about
+    payload = Column(JSONB, nullable=False)
+    ordering_key = Column(String(100))
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True))
+    next_attempt_at = Column(TIMESTAMP(timezone=True))  # Not claimed before this; backs off after failures
+    published_at = Column(TIMESTAMP(timezone=True))  # NULL until the relay publishes it
+    parked_at = Column(TIMESTAMP(timezone=True))  # Set after OUTBOX_RELAY_MAX_ATTEMPTS failures
+
+class BookingSummary(Base):
+    """Denormalized read model for booking lists (see src/read_model.py)."""
+    __tablename__ = "booking_summaries"
+
+    booking_id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    pnr = Column(String(20))
+    resource_type = Column(String(20))
+    resource_id = Column(UUID(as_uuid=True))
+    status = Column(String(20))
+    total_amount = Column(DECIMAL(10, 2))
+    created_at = Column(TIMESTAMP(timezone=True))
+    expires_at = Column(TIMESTAMP(timezone=True))
+    flight = Column(JSONB)  # flight_resource_details() shape, plus live status
+    passengers = Column(JSONB, nullable=False, default=list)  # [passenger_details()]
+    updated_at = Column(TIMESTAMP(timezone=True))
+
+class BookingSagaState(Base):
+    """Persisted step state of a checkout saga (see src/saga.py)."""
+    __tablename__ = "booking_sagas"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    status = Column(String(20), nullable=False)  # RUNNING, COMPLETED, COMPENSATING, COMPENSATED, FAILED
+    step = Column(String(20), nullable=False)  # BOOK, PAY, TICKET, DONE
+    booking_id = Column(UUID(as_uuid=True))
+    payment_id = Column(UUID(as_uuid=True))
+    ticket_ids = Column(JSONB)
+    error = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True))
+    updated_at = Column(TIMESTAMP(timezone=True))
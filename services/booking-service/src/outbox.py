@@ -0,0 +1,77 @@
+"""
+Transactional outbox for booking events.
+
+Instead of publishing to Pub/Sub after the commit (where a failure loses
+the event), request handlers stage events as `booking_outbox` rows in the
+same transaction as the booking change. The relay worker
+(`src.workers.outbox_relay`) publishes them and marks them sent, giving
+at-least-once delivery with no Pub/Sub latency on the request path.
+
+Usage:
+    await stage_event(db, booking_created_event(...))
+    await db.commit()
+    wake_relay()
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.events import BOOKING_TOPIC
+from src.models import OutboxEvent
+
+_relay_wakeup: Optional[asyncio.Event] = None
+
+
+def _outbox_row(data: Dict[str, Any], topic: str, ordering_key: Optional[str], created_at: datetime) -> Dict[str, Any]:
+    return {
+        "topic": topic,
+        "event_type": data["event_type"],
+        "aggregate_id": data.get("booking_id"),
+        "payload": data,
+        "ordering_key": ordering_key,
+        "attempts": 0,
+        "created_at": created_at,
+        "next_attempt_at": created_at
+    }
+
+
+async def stage_events(
+    db: AsyncSession,
+    events: List[Dict[str, Any]],
+    topic: str = BOOKING_TOPIC,
+    ordering_key: Optional[str] = None
+) -> None:
+    """Add events to the outbox in the caller's transaction (does not commit)."""
+    if not events:
+        return
+    created_at = datetime.utcnow()
+    await db.execute(
+        insert(OutboxEvent),
+        [_outbox_row(data, topic, ordering_key, created_at) for data in events]
+    )
+
+
+async def stage_event(
+    db: AsyncSession,
+    data: Dict[str, Any],
+    topic: str = BOOKING_TOPIC,
+    ordering_key: Optional[str] = None
+) -> None:
+    """Add one event to the outbox in the caller's transaction (does not commit)."""
+    await stage_events(db, [data], topic=topic, ordering_key=ordering_key)
+
+
+def relay_wakeup() -> asyncio.Event:
+    """Event the relay waits on between polls (created lazily on the running loop)."""
+    global _relay_wakeup
+    if _relay_wakeup is None:
+        _relay_wakeup = asyncio.Event()
+    return _relay_wakeup
+
+
+def wake_relay() -> None:
+    """Tell the relay new rows were committed so it publishes without waiting for the next poll."""
+    relay_wakeup().set()
@@ -0,0 +1,123 @@
+"""
+PNR (booking reference) generation and hot-PNR cache.
+
+PNRs are 6 Crockford base32 characters (~1.07 billion codes). Numbers come
+from the `booking_pnr_seq` Postgres sequence, which increments in blocks:
+each process takes a whole block with one `nextval()` and hands out its
+numbers locally, so allocation is usually a memory operation. Every
+number is pushed through a fixed bijection over 30 bits before encoding,
+so codes are collision-free without a retry loop, yet consecutive
+bookings don't get guessable neighbouring codes.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+
+PNR_LENGTH = 6
+PNR_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32: no I, L, O, U
+PNR_BITS = 5 * PNR_LENGTH
+PNR_SPACE = 1 << PNR_BITS
+_MASK = PNR_SPACE - 1
+_MULTIPLIER = 0x2C9277B5  # Odd, so multiplication mod 2^30 is invertible
+_XOR_KEY = 0x15A3C6E9 & _MASK
+
+# Characters customers commonly misread, mapped to their Crockford value
+_READ_ALIASES = str.maketrans({"O": "0", "I": "1", "L": "1"})
+_DECODE = {ch: i for i, ch in enumerate(PNR_ALPHABET)}
+
+
+def _permute(n: int) -> int:
+    """Bijection on [0, 2^30): xorshift / odd-multiply rounds."""
+    n ^= n >> 15
+    n = (n * _MULTIPLIER) & _MASK
+    n ^= n >> 13
+    return n ^ _XOR_KEY
+
+
+def encode_pnr(n: int) -> str:
+    """Encode a sequence number (0 <= n < 2^30) as a 6-character PNR."""
+    if not 0 <= n < PNR_SPACE:
+        raise ValueError("PNR sequence exhausted")
+    value = _permute(n)
+    chars = []
+    for _ in range(PNR_LENGTH):
+        chars.append(PNR_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def normalize_pnr(pnr: str) -> Optional[str]:
+    """Canonical form of user input, or None if it can't be a PNR."""
+    pnr = pnr.strip().upper().translate(_READ_ALIASES)
+    if len(pnr) != PNR_LENGTH or any(ch not in _DECODE for ch in pnr):
+        return None
+    return pnr
+
+
+class PnrAllocator:
+    """Hands out sequence numbers from blocks reserved with one nextval()."""
+
+    def __init__(self, sequence: str = "booking_pnr_seq"):
+        self.sequence = sequence
+        self._next = 0
+        self._end = 0
+        self._block_size: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def next_pnr(self, db: AsyncSession) -> str:
+        async with self._lock:
+            if self._next >= self._end:
+                await self._reserve_block(db)
+            n = self._next
+            self._next += 1
+        return encode_pnr(n)
+
+    async def _reserve_block(self, db: AsyncSession) -> None:
+        if self._block_size is None:
+            # Block size is the sequence's own increment, so replicas can never overlap
+            self._block_size = (await db.execute(
+                text("SELECT increment_by FROM pg_sequences WHERE sequencename = :name"),
+                {"name": self.sequence}
+            )).scalar_one()
+        start = (await db.execute(text(f"SELECT nextval('{self.sequence}')"))).scalar_one()
+        self._next, self._end = start, start + self._block_size
+
+
+class HotPnrCache:
+    """Small LRU of serialized bookings by PNR, with a short TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, pnr: str) -> Optional[dict]:
+        entry = self._entries.get(pnr)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del self._entries[pnr]
+            return None
+        self._entries.move_to_end(pnr)
+        return payload
+
+    def put(self, pnr: str, payload: dict) -> None:
+        self._entries[pnr] = (time.monotonic() + self.ttl_seconds, payload)
+        self._entries.move_to_end(pnr)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, pnr: Optional[str]) -> None:
+        if pnr:
+            self._entries.pop(pnr, None)
+
+
+pnr_allocator = PnrAllocator()
+hot_pnr_cache = HotPnrCache(settings.PNR_CACHE_MAX_ENTRIES, settings.PNR_CACHE_TTL_SECONDS)
@@ -0,0 +1,143 @@
+"""
+Denormalized booking read model.
+
+`booking_summaries` holds one row per booking with the flight and
+passenger details that booking lists need, stored as JSONB in the same
+shape `BookingLoader.serialize()` returns. "My trips" is then a single
+query on `(user_id, created_at)` with no joins.
+
+The projection is maintained from events rather than on the write path:
+- booking.* and payment.* events re-derive the booking's row from the
+  source tables (idempotent and order-insensitive, so at-least-once
+  delivery is safe); payment-service changes booking status directly, so
+  its events are what keep paid and refunded bookings current
+- flight.updated events merge the new flight status / delay into every
+  summary for that flight with one set-based UPDATE. The delay only
+  exists in those events, so re-projection carries it over
+
+Existing bookings are backfilled by the schema migration.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models import BookingSummary
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_SQL = """
+    INSERT INTO booking_summaries (
+        booking_id, user_id, pnr, resource_type, resource_id, status, total_amount,
+        created_at, expires_at, flight, passengers, updated_at
+    )
+    SELECT
+        b.id, b.user_id, b.pnr, b.resource_type, b.resource_id, b.status, b.total_amount,
+        b.created_at, b.expires_at,
+        CASE WHEN f.id IS NULL THEN NULL ELSE jsonb_build_object(
+            'flight_number', f.flight_number,
+            'origin', f.origin,
+            'destination', f.destination,
+            'price', f.base_price,
+            'currency', 'USD',
+            'departure_time', f.departure_time,
+            'arrival_time', f.arrival_time,
+            'duration_minutes', COALESCE(EXTRACT(EPOCH FROM f.arrival_time - f.departure_time)::int / 60, 0),
+            'airline', 'JourneyIQ Air',
+            'aircraft', 'Boeing 737-800',
+            'status', f.status
+        ) END,
+        COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'first_name', p.first_name,
+                'last_name', p.last_name,
+                'title', p.title,
+                'date_of_birth', p.date_of_birth,
+                'passport_number', p.passport_number,
+                'email', p.email,
+                'phone', p.phone
+            ))
+            FROM passengers p WHERE p.booking_id = b.id
+        ), '[]'::jsonb),
+        now()
+    FROM bookings b
+    LEFT JOIN flights f ON b.resource_type = 'FLIGHT' AND f.id = b.resource_id
+    {where}
+    ON CONFLICT (booking_id) DO UPDATE SET
+        pnr = EXCLUDED.pnr,
+        status = EXCLUDED.status,
+        total_amount = EXCLUDED.total_amount,
+        expires_at = EXCLUDED.expires_at,
+        -- delay_minutes comes only from flight.updated events: keep it
+        flight = CASE WHEN EXCLUDED.flight IS NULL THEN NULL ELSE EXCLUDED.flight || jsonb_strip_nulls(
+            jsonb_build_object('delay_minutes', booking_summaries.flight -> 'delay_minutes')
+        ) END,
+        passengers = EXCLUDED.passengers,
+        updated_at = EXCLUDED.updated_at
+"""
+
+_PROJECT_BOOKINGS_SQL = text(_PROJECT_SQL.format(where="WHERE b.id = ANY(CAST(:booking_ids AS uuid[]))"))
+_PROJECT_ALL_SQL = text(_PROJECT_SQL.format(where=""))
+
+_APPLY_FLIGHT_UPDATE_SQL = text("""
+    UPDATE booking_summaries
+    SET flight = flight || jsonb_build_object('status', CAST(:status AS text), 'delay_minutes', CAST(:delay_minutes AS int)),
+        updated_at = now()
+    WHERE resource_id = CAST(:flight_id AS uuid) AND flight IS NOT NULL
+""")
+
+
+async def project_bookings(db: AsyncSession, booking_ids: Iterable[str]) -> None:
+    """Upsert summaries for the given bookings from the source tables (does not commit)."""
+    ids = [str(booking_id) for booking_id in booking_ids]
+    if ids:
+        await db.execute(_PROJECT_BOOKINGS_SQL, {"booking_ids": ids})
+
+
+async def rebuild_all(db: AsyncSession) -> None:
+    """Backfill / repair: re-derive every summary (does not commit)."""
+    await db.execute(_PROJECT_ALL_SQL)
+
+
+async def apply_event(db: AsyncSession, event: Dict[str, Any]) -> None:
+    """Apply one booking or flight event to the read model (does not commit)."""
+    event_type = event.get("event_type", "")
+    if event_type.startswith(("booking.", "payment.")) and event.get("booking_id"):
+        await project_bookings(db, [event["booking_id"]])
+    elif event.get("flight_id") and event.get("status"):
+        # flight.updated (inventory.flight.updated.v1) carries no event_type
+        await db.execute(_APPLY_FLIGHT_UPDATE_SQL, {
+            "flight_id": event["flight_id"],
+            "status": event["status"],
+            "delay_minutes": event.get("delay_minutes") or 0
+        })
+    else:
+        logger.debug(f"Read model ignoring event: {event_type or event}")
+
+
+def serialize_summary(summary: BookingSummary) -> dict:
+    """Same payload as BookingLoader.serialize(), straight from the projection."""
+    return {
+        "id": str(summary.booking_id),
+        "user_id": str(summary.user_id),
+        "pnr": summary.pnr,
+        "resource_type": summary.resource_type,
+        "resource_id": str(summary.resource_id),
+        "status": summary.status,
+        "total_amount": float(summary.total_amount) if summary.total_amount else 0,
+        "created_at": summary.created_at.isoformat() if summary.created_at else None,
+        "expires_at": summary.expires_at.isoformat() if summary.expires_at else None,
+        "resource_details": summary.flight,
+        "passengers": summary.passengers or []
+    }
+
+
+async def list_user_summaries(db: AsyncSession, user_id: str, status: Optional[str] = None) -> List[dict]:
+    """User's bookings, newest first; served by idx_booking_summaries_user_created."""
+    query = select(BookingSummary).where(BookingSummary.user_id == user_id)
+    if status:
+        query = query.where(BookingSummary.status == status.upper())
+    query = query.order_by(BookingSummary.created_at.desc())
+    result = await db.execute(query)
+    return [serialize_summary(summary) for summary in result.scalars().all()]
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime, timedelta, date
-from uuid import uuid4
-import httpx
+from datetime import datetime, date
 from src.database import get_db
-from src.models import Booking, Flight, Passenger
+from src.models import Booking
 from src.config import settings
+from src.loaders import BookingLoader, get_booking_loader
+from src.services import BookingService, FlightNotFoundError, SeatsUnavailableError, PricingError
+from src.read_model import list_user_summaries
+from shared.transitions import RowNotFoundError, InvalidTransitionError
+from src.pnr import hot_pnr_cache, normalize_pnr
 
 router = APIRouter(tags=["bookings"])
 
@@ -32,6 +34,7 @@ class BookingCreate(BaseModel):
 
 class BookingResponse(BaseModel):
     id: str
+    pnr: Optional[str] = None
     flight_id: str
     user_id: str
     status: str
@@ -41,6 +44,21 @@ class BookingResponse(BaseModel):
     created_at: datetime
     expires_at: Optional[datetime]
 
+class BulkBookingItem(BaseModel):
+    flight_id: str
+    passengers: List[PassengerInfo]
+    class_type: str = "economy"
+    add_ons: List[str] = []
+
+class BulkBookingCreate(BaseModel):
+    user_id: str
+    bookings: List[BulkBookingItem]
+
+class BulkBookingResponse(BaseModel):
+    bookings: List[BookingResponse]
+    total: int
+    total_amount: float
+
 class BookingListResponse(BaseModel):
     bookings: List[dict]
     total: int
@@ -52,158 +70,147 @@ async def create_booking(
 ):
     """
     Create a new booking.
-    - Gets flight details
-    - Calculates price via pricing service
-    - Creates booking with PENDING status
+    - Looks up the flight, checks availability and prices it concurrently
+    - Creates booking and passengers with PENDING status in one transaction
     - Sets 15-minute expiration
     """
-    # Get flight details
-    flight_result = await db.execute(
-        select(Flight).where(Flight.id == booking_request.flight_id)
+    service = BookingService(
+        db,
+        pricing_service_url=settings.PRICING_SERVICE_URL,
+        inventory_service_url=settings.INVENTORY_SERVICE_URL
     )
-    flight = flight_result.scalar_one_or_none()
     
-    if not flight:
-        raise HTTPException(status_code=404, detail="Flight not found")
-    
-    # Calculate price via pricing service
     try:
-        async with httpx.AsyncClient() as client:
-            pricing_response = await client.post(
-                f"{settings.PRICING_SERVICE_URL}/calculate",
-                json={
-                    "flight_id": booking_request.flight_id,
-                    "passengers": len(booking_request.passengers),
-                    "class_type": booking_request.class_type,
-                    "add_ons": booking_request.add_ons
-                },
-                timeout=10.0
-            )
-            pricing_response.raise_for_status()
-            pricing_data = pricing_response.json()
-            total_amount = pricing_data["breakdown"]["total"]
-    except Exception as e:
+        booking = await service.create_booking(
+            flight_id=booking_request.flight_id,
+            user_id=booking_request.user_id,
+            passengers=[p.model_dump() for p in booking_request.passengers],
+            class_type=booking_request.class_type,
+            add_ons=booking_request.add_ons,
+            booking_expiration_minutes=settings.BOOKING_EXPIRATION_MINUTES
+        )
+    except FlightNotFoundError:
+        raise HTTPException(status_code=404, detail="Flight not found")
+    except SeatsUnavailableError:
+        raise HTTPException(status_code=409, detail="Insufficient seats available")
+    except PricingError as e:
         raise HTTPException(status_code=500, detail=f"Pricing service error: {str(e)}")
     
-    # Create booking
-    booking_id = str(uuid4())
-    created_at = datetime.utcnow()
-    expires_at = created_at + timedelta(minutes=settings.BOOKING_EXPIRATION_MINUTES)
-    
-    new_booking = Booking(
-        id=booking_id,
+    return BookingResponse(
+        id=booking["id"],
+        pnr=booking["pnr"],
+        flight_id=booking_request.flight_id,
         user_id=booking_request.user_id,
-        resource_type="FLIGHT",
-        resource_id=booking_request.flight_id,
-        status="PENDING",
-        total_amount=total_amount,
-        created_at=created_at
+        status=booking["status"],
+        total_amount=booking["total_amount"],
+        passengers=booking_request.passengers,
+        resource_details=booking["resource_details"],
+        created_at=booking["created_at"],
+        expires_at=booking["expires_at"]
     )
 
-    db.add(new_booking)
-    await db.commit()
-
-    for passenger_data in booking_request.passengers:
-        passenger = Passenger(
-            id=str(uuid4()),
-            booking_id=booking_id,
-            first_name=passenger_data.first_name,
-            last_name=passenger_data.last_name,
-            title=passenger_data.title,
-            date_of_birth=passenger_data.date_of_birth,
-            passport_number=passenger_data.passport_number,
-            email=passenger_data.email,
-            phone=passenger_data.phone
+@router.post("/bulk", response_model=BulkBookingResponse, status_code=201)
+async def create_bookings_bulk(
+    bulk_request: BulkBookingCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create many bookings in one request (group / corporate travel).
+    - One batched pricing request for all items
+    - All bookings and passengers inserted in a single transaction
+    - booking.created events published as one batch
+    - All-or-nothing: any failing item rejects the whole request
+    """
+    if not bulk_request.bookings:
+        raise HTTPException(status_code=400, detail="No bookings provided")
+    if len(bulk_request.bookings) > settings.BULK_BOOKING_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_BOOKING_MAX_ITEMS} bookings per request")
+    
+    service = BookingService(
+        db,
+        pricing_service_url=settings.PRICING_SERVICE_URL,
+        inventory_service_url=settings.INVENTORY_SERVICE_URL
+    )
+    
+    try:
+        bookings = await service.create_bookings_bulk(
+            user_id=bulk_request.user_id,
+            items=[
+                {
+                    "flight_id": item.flight_id,
+                    "passengers": [p.model_dump() for p in item.passengers],
+                    "class_type": item.class_type,
+                    "add_ons": item.add_ons
+                }
+                for item in bulk_request.bookings
+            ],
+            booking_expiration_minutes=settings.BOOKING_EXPIRATION_MINUTES
         )
-        db.add(passenger)
+    except FlightNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except SeatsUnavailableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except PricingError as e:
+        raise HTTPException(status_code=500, detail=f"Pricing service error: {str(e)}")
+    
+    responses = [
+        BookingResponse(
+            id=booking["id"],
+            pnr=booking["pnr"],
+            flight_id=item.flight_id,
+            user_id=bulk_request.user_id,
+            status=booking["status"],
+            total_amount=booking["total_amount"],
+            passengers=item.passengers,
+            resource_details=booking["resource_details"],
+            created_at=booking["created_at"],
+            expires_at=booking["expires_at"]
+        )
+        for item, booking in zip(bulk_request.bookings, bookings)
+    ]
+    return BulkBookingResponse(
+        bookings=responses,
+        total=len(responses),
+        total_amount=round(sum(b.total_amount for b in responses), 2)
+    )
 
-    await db.commit()
-    await db.refresh(new_booking)
+@router.get("/pnr/{pnr}")
+async def get_booking_by_pnr(
+    pnr: str,
+    loader: BookingLoader = Depends(get_booking_loader)
+):
+    """
+    Get booking details by PNR (check-in, kiosks).
+    Uses idx_bookings_pnr, with a short-TTL cache in front for hot PNRs.
+    """
+    code = normalize_pnr(pnr)
+    if not code:
+        raise HTTPException(status_code=404, detail="Booking not found")
     
-    # Prepare response with standardized format
-    resource_details = {
-        "flight_number": flight.flight_number,
-        "origin": flight.origin,
-        "destination": flight.destination,
-        "price": float(flight.base_price),
-        "currency": "USD",
-        "class_type": booking_request.class_type,
-        "departure_time": flight.departure_time.isoformat(),
-        "arrival_time": flight.arrival_time.isoformat(),
-        "duration_minutes": int((flight.arrival_time - flight.departure_time).total_seconds() / 60),
-        "airline": "JourneyIQ Air",
-        "aircraft": "Boeing 737-800"
-    }
+    cached = hot_pnr_cache.get(code)
+    if cached is not None:
+        return cached
     
-    return BookingResponse(
-        id=booking_id,
-        flight_id=booking_request.flight_id,
-        user_id=booking_request.user_id,
-        status="PENDING",
-        total_amount=total_amount,
-        passengers=booking_request.passengers,
-        resource_details=resource_details,
-        created_at=created_at,
-        expires_at=expires_at
-    )
+    bookings = await loader.load_bookings(select(Booking).where(Booking.pnr == code))
+    if not bookings:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    
+    payload = loader.serialize(bookings[0])
+    hot_pnr_cache.put(code, payload)
+    return payload
 
 @router.get("/{booking_id}")
 async def get_booking(
     booking_id: str,
-    db: AsyncSession = Depends(get_db)
+    loader: BookingLoader = Depends(get_booking_loader)
 ):
     """Get booking details by ID."""
-    result = await db.execute(
-        select(Booking).options(selectinload(Booking.passengers)).where(Booking.id == booking_id)
-    )
-    booking = result.scalar_one_or_none()
+    booking = await loader.load_booking(booking_id)
     
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
-    # Get flight details if it's a flight booking
-    resource_details = None
-    if booking.resource_type == "FLIGHT":
-        flight_result = await db.execute(
-            select(Flight).where(Flight.id == booking.resource_id)
-        )
-        flight = flight_result.scalar_one_or_none()
-        if flight:
-            resource_details = {
-                "flight_number": flight.flight_number,
-                "origin": flight.origin,
-                "destination": flight.destination,
-                "price": float(flight.base_price),
-                "currency": "USD",
-                "departure_time": flight.departure_time.isoformat() if flight.departure_time else None,
-                "arrival_time": flight.arrival_time.isoformat() if flight.arrival_time else None,
-                "duration_minutes": int((flight.arrival_time - flight.departure_time).total_seconds() / 60) if flight.arrival_time and flight.departure_time else 0,
-                "airline": "JourneyIQ Air",
-                "aircraft": "Boeing 737-800"
-            }
-    
-    return {
-        "id": str(booking.id),
-        "user_id": str(booking.user_id),
-        "resource_type": booking.resource_type,
-        "resource_id": str(booking.resource_id),
-        "status": booking.status,
-        "total_amount": float(booking.total_amount) if booking.total_amount else 0,
-        "created_at": booking.created_at.isoformat() if booking.created_at else None,
-        "resource_details": resource_details,
-        "passengers": [
-            {
-                "first_name": p.first_name,
-                "last_name": p.last_name,
-                "title": p.title,
-                "date_of_birth": p.date_of_birth.isoformat() if p.date_of_birth else None,
-                "passport_number": p.passport_number,
-                "email": p.email,
-                "phone": p.phone
-            }
-            for p in booking.passengers
-        ] if hasattr(booking, 'passengers') and booking.passengers else []
-    }
+    return loader.serialize(booking)
 
 @router.get("/user/{user_id}", response_model=BookingListResponse)
 async def list_user_bookings(
@@ -211,58 +218,13 @@ async def list_user_bookings(
     status: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """List all bookings for a specific user with details."""
-    query = select(Booking).where(Booking.user_id == user_id)
-    
-    if status:
-        query = query.where(Booking.status == status.upper())
-    
-    result = await db.execute(query)
-    bookings = result.scalars().all()
-    
-    booking_list = []
-    for booking in bookings:
-        resource_details = None
-        if booking.resource_type == "FLIGHT":
-            flight_result = await db.execute(
-                select(Flight).where(Flight.id == booking.resource_id)
-            )
-            flight = flight_result.scalar_one_or_none()
-            if flight:
-                resource_details = {
-                    "flight_number": flight.flight_number,
-                    "origin": flight.origin,
-                    "destination": flight.destination,
-                    "price": float(flight.base_price),
-                    "currency": "USD",
-                    "departure_time": flight.departure_time.isoformat() if flight.departure_time else None,
-                    "arrival_time": flight.arrival_time.isoformat() if flight.arrival_time else None,
-                    "duration_minutes": int((flight.arrival_time - flight.departure_time).total_seconds() / 60) if flight.arrival_time and flight.departure_time else 0,
-                    "airline": "JourneyIQ Air",
-                    "aircraft": "Boeing 737-800"
-                }
-
-        booking_list.append({
-            "id": str(booking.id),
-            "resource_type": booking.resource_type,
-            "resource_id": str(booking.resource_id),
-            "status": booking.status,
-            "total_amount": float(booking.total_amount) if booking.total_amount else 0,
-            "created_at": booking.created_at.isoformat() if booking.created_at else None,
-            "resource_details": resource_details,
-            "passengers": [
-                {
-                    "first_name": p.first_name,
-                    "last_name": p.last_name,
-                    "title": p.title,
-                    "date_of_birth": p.date_of_birth.isoformat() if p.date_of_birth else None,
-                    "passport_number": p.passport_number,
-                    "email": p.email,
-                    "phone": p.phone
-                }
-                for p in booking.passengers
-            ] if hasattr(booking, 'passengers') and booking.passengers else []
-        })
+    """
+    List all bookings for a specific user with details, newest first.
+    Served from the booking_summaries read model (one indexed query on
+    user_id, created_at), which is kept up to date from booking and
+    flight events, so very recent changes may take a moment to appear.
+    """
+    booking_list = await list_user_summaries(db, user_id, status)
     
     return BookingListResponse(
         bookings=booking_list,
@@ -275,23 +237,15 @@ async def cancel_booking(
     db: AsyncSession = Depends(get_db)
 ):
     """Cancel a booking."""
-    result = await db.execute(
-        select(Booking).where(Booking.id == booking_id)
-    )
-    booking = result.scalar_one_or_none()
-    
-    if not booking:
+    service = BookingService(db)
+    try:
+        await service.cancel_booking(booking_id)
+    except RowNotFoundError:
         raise HTTPException(status_code=404, detail="Booking not found")
-    
-    if booking.status == "CANCELLED":
-        raise HTTPException(status_code=400, detail="Booking already cancelled")
-    
-    if booking.status == "CONFIRMED":
-        # In production, you'd check if refund is allowed
-        pass
-    
-    booking.status = "CANCELLED"
-    await db.commit()
+    except InvalidTransitionError as e:
+        if e.current_status == "CANCELLED":
+            raise HTTPException(status_code=400, detail="Booking already cancelled")
+        raise HTTPException(status_code=409, detail=str(e))
     
     return {
         "message": "Booking cancelled successfully",
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from pydantic import BaseModel
+from src.routes.bookings import PassengerInfo
+from src.saga import booking_saga
+
+router = APIRouter(tags=["checkout"])
+
+# Request/Response Models
+class PaymentMethod(BaseModel):
+    type: str  # credit_card, debit_card, paypal
+    card_number: Optional[str] = None
+    expiry_month: Optional[str] = None
+    expiry_year: Optional[str] = None
+    cvv: Optional[str] = None
+    cardholder_name: Optional[str] = None
+
+class CheckoutRequest(BaseModel):
+    flight_id: str
+    user_id: str
+    passengers: List[PassengerInfo]
+    class_type: str = "economy"
+    add_ons: List[str] = []
+    payment_method: PaymentMethod
+
+class CheckoutStatus(BaseModel):
+    saga_id: str
+    user_id: str
+    status: str  # RUNNING, COMPLETED, COMPENSATING, COMPENSATED, FAILED
+    step: str  # BOOK, PAY, TICKET, DONE
+    booking_id: Optional[str] = None
+    payment_id: Optional[str] = None
+    ticket_ids: List[str] = []
+    error: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+@router.post("/checkout", response_model=CheckoutStatus, status_code=202)
+async def start_checkout(checkout_request: CheckoutRequest):
+    """
+    Book, pay and ticket in one call.
+    Starts a checkout saga and returns immediately; poll
+    GET /checkout/{saga_id} for progress. Failed checkouts are
+    compensated (payment refunded, booking cancelled).
+    """
+    # Python mode keeps date_of_birth a date for the passenger insert;
+    # only the payment method is forwarded as JSON
+    request = checkout_request.model_dump(exclude={"payment_method"})
+    request["payment_method"] = checkout_request.payment_method.model_dump(mode="json")
+    saga = await booking_saga.start(request)
+    return CheckoutStatus(**saga)
+
+@router.get("/checkout/{saga_id}", response_model=CheckoutStatus)
+async def get_checkout(saga_id: str):
+    """Get checkout saga progress."""
+    saga = await booking_saga.get(saga_id)
+    
+    if not saga:
+        raise HTTPException(status_code=404, detail="Checkout not found")
+    
+    return CheckoutStatus(**saga)
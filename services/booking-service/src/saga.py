@@ -0,0 +1,314 @@
+"""
+Checkout saga: book -> pay -> ticket, orchestrated by booking-service.
+
+Clients used to drive booking creation, `POST /payments/` and ticket
+generation themselves, one round trip at a time, and a failure halfway
+left orphaned bookings or charges. `POST /checkout` now starts a saga
+and returns immediately; the steps run in the background and their
+progress is persisted in `booking_sagas` after every step:
+
+    BOOK    create the PENDING booking (BookingService.create_booking)
+    PAY     charge via payment-service, with an Idempotency-Key derived
+            from the saga id so a retried call can never double-charge
+    TICKET  generate every passenger's ticket concurrently; retried up
+            to SAGA_TICKET_ATTEMPTS times since the customer has paid
+    DONE
+
+If a step fails, completed steps are compensated in reverse order
+(refund the payment, cancel the booking) and the saga ends COMPENSATED,
+or FAILED if a compensation itself failed and needs an operator.
+
+Payment details are only ever held in memory. A saga interrupted by a
+restart therefore cannot be resumed forward before payment; `recover()`
+compensates it instead, and resumes ticketing for sagas that had
+already been paid.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import select, update
+
+from shared.http_client import get_client
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.metrics import SAGA_STEP_LATENCY, SAGAS_FINISHED, track_saga_step
+from src.models import BookingSagaState, Passenger
+from src.services import BookingService
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+COMPENSATING = "COMPENSATING"
+COMPENSATED = "COMPENSATED"
+FAILED = "FAILED"
+
+
+class SagaStepError(Exception):
+    """A saga step failed; the saga will be compensated."""
+
+
+class BookingSaga:
+    """Orchestrates checkout sagas; one module-level instance per process."""
+
+    def __init__(self):
+        self._tasks = set()
+
+    def _spawn(self, coro) -> None:
+        # Keep a reference so background sagas aren't garbage collected mid-flight
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self, request: Dict) -> Dict:
+        """
+        Persist a new saga and run it in the background.
+
+        `request` has user_id, flight_id, passengers, class_type, add_ons
+        and payment_method (never persisted).
+        """
+        saga_id = str(uuid4())
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            db.add(BookingSagaState(
+                id=saga_id,
+                user_id=request["user_id"],
+                status=RUNNING,
+                step="BOOK",
+                created_at=now,
+                updated_at=now
+            ))
+            await db.commit()
+        self._spawn(self.execute(saga_id, request))
+        return await self.get(saga_id)
+
+    async def get(self, saga_id: str) -> Optional[Dict]:
+        async with AsyncSessionLocal() as db:
+            saga = (await db.execute(
+                select(BookingSagaState).where(BookingSagaState.id == saga_id)
+            )).scalar_one_or_none()
+        return self._serialize(saga) if saga else None
+
+    async def execute(self, saga_id: str, request: Dict) -> None:
+        """Run BOOK -> PAY -> TICKET, compensating on the first failure."""
+        started = time.perf_counter()
+        try:
+            with track_saga_step("BOOK"):
+                async with AsyncSessionLocal() as db:
+                    service = BookingService(
+                        db,
+                        pricing_service_url=settings.PRICING_SERVICE_URL,
+                        inventory_service_url=settings.INVENTORY_SERVICE_URL
+                    )
+                    booking = await service.create_booking(
+                        flight_id=request["flight_id"],
+                        user_id=request["user_id"],
+                        passengers=request["passengers"],
+                        class_type=request.get("class_type", "economy"),
+                        add_ons=request.get("add_ons") or [],
+                        booking_expiration_minutes=settings.BOOKING_EXPIRATION_MINUTES
+                    )
+            await self._save(saga_id, step="PAY", booking_id=booking["id"])
+
+            with track_saga_step("PAY"):
+                payment_id = await self._pay(saga_id, booking, request["payment_method"])
+            await self._save(saga_id, step="TICKET", payment_id=payment_id)
+
+            await self._ticket(saga_id, booking["id"])
+        except Exception as e:
+            logger.warning(f"Saga {saga_id} failed: {e}")
+            await self.compensate(saga_id, str(e))
+        finally:
+            SAGA_STEP_LATENCY.labels("total").observe(time.perf_counter() - started)
+
+    async def compensate(self, saga_id: str, reason: str) -> None:
+        """Undo completed steps in reverse order: refund, then cancel the booking."""
+        await self._save(saga_id, status=COMPENSATING, error=reason)
+        saga = await self._load(saga_id)
+        failures = []
+
+        try:
+            payment_ids = [str(saga.payment_id)] if saga.payment_id else []
+            if not payment_ids and saga.booking_id and saga.step == "PAY":
+                # The charge may have gone through even though we never saw the response
+                payment_ids = await self._succeeded_payments(str(saga.booking_id))
+            for payment_id in payment_ids:
+                await self._refund(payment_id)
+        except Exception as e:
+            failures.append(f"refund: {e}")
+
+        if saga.booking_id:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await BookingService(db).cancel_booking(str(saga.booking_id), reason="CHECKOUT_FAILED")
+            except ValueError:
+                pass  # Already cancelled (e.g. by the refund)
+            except Exception as e:
+                failures.append(f"cancel: {e}")
+
+        if failures:
+            logger.error(f"Saga {saga_id} compensation incomplete: {failures}")
+            await self._save(saga_id, status=FAILED, error=f"{reason}; compensation failed: {'; '.join(failures)}")
+            SAGAS_FINISHED.labels(FAILED).inc()
+        else:
+            await self._save(saga_id, status=COMPENSATED)
+            SAGAS_FINISHED.labels(COMPENSATED).inc()
+
+    async def recover(self) -> int:
+        """
+        Pick up sagas abandoned by a crashed or restarted process.
+
+        Paid sagas resume ticketing; anything earlier is compensated.
+        Each saga is claimed with a conditional update so only one
+        replica recovers it. Returns the number recovered.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.SAGA_RECOVERY_AFTER_SECONDS)
+        async with AsyncSessionLocal() as db:
+            stale = (await db.execute(
+                select(BookingSagaState.id, BookingSagaState.status, BookingSagaState.step, BookingSagaState.updated_at)
+                .where(BookingSagaState.status.in_([RUNNING, COMPENSATING]))
+                .where(BookingSagaState.updated_at < cutoff)
+            )).all()
+
+        recovered = 0
+        for saga in stale:
+            async with AsyncSessionLocal() as db:
+                claimed = await db.execute(
+                    update(BookingSagaState)
+                    .where(BookingSagaState.id == saga.id)
+                    .where(BookingSagaState.updated_at == saga.updated_at)
+                    .values(updated_at=datetime.utcnow())
+                )
+                await db.commit()
+            if claimed.rowcount != 1:
+                continue  # Another replica got it
+            recovered += 1
+            saga_id = str(saga.id)
+            if saga.status == RUNNING and saga.step == "TICKET":
+                self._spawn(self._resume_ticketing(saga_id))
+            else:
+                self._spawn(self.compensate(saga_id, f"Interrupted during {saga.step}"))
+        if recovered:
+            logger.info(f"Recovering {recovered} interrupted checkout sagas")
+        return recovered
+
+    async def _resume_ticketing(self, saga_id: str) -> None:
+        saga = await self._load(saga_id)
+        try:
+            await self._ticket(saga_id, str(saga.booking_id))
+        except Exception as e:
+            await self.compensate(saga_id, str(e))
+
+    async def _ticket(self, saga_id: str, booking_id: str) -> None:
+        with track_saga_step("TICKET"):
+            ticket_ids = await self._issue_tickets(booking_id)
+        await self._save(saga_id, step="DONE", status=COMPLETED, ticket_ids=ticket_ids)
+        SAGAS_FINISHED.labels(COMPLETED).inc()
+
+    # Step implementations
+    async def _pay(self, saga_id: str, booking: Dict, payment_method: Dict) -> str:
+        client = get_client("payment-service")
+        response = await client.post(
+            f"{settings.PAYMENT_SERVICE_URL}/payments/",
+            json={
+                "booking_id": booking["id"],
+                "amount": booking["total_amount"],
+                "currency": "USD",
+                "payment_method": payment_method
+            },
+            headers={"Idempotency-Key": f"saga-{saga_id}-pay"},
+            timeout=30.0
+        )
+        if response.status_code != 201:
+            raise SagaStepError(f"Payment failed ({response.status_code}): {response.text}")
+        return response.json()["payment_id"]
+
+    async def _refund(self, payment_id: str) -> None:
+        client = get_client("payment-service")
+        response = await client.post(f"{settings.PAYMENT_SERVICE_URL}/payments/{payment_id}/refund", timeout=30.0)
+        # 400 = not refundable because it already was (or never succeeded)
+        if response.status_code not in (200, 400):
+            raise SagaStepError(f"Refund failed ({response.status_code}): {response.text}")
+
+    async def _succeeded_payments(self, booking_id: str) -> List[str]:
+        client = get_client("payment-service")
+        response = await client.get(f"{settings.PAYMENT_SERVICE_URL}/payments/booking/{booking_id}", timeout=10.0)
+        response.raise_for_status()
+        return [p["id"] for p in response.json()["payments"] if p["status"] == "SUCCEEDED"]
+
+    async def _issue_tickets(self, booking_id: str) -> List[str]:
+        """Generate all passengers' tickets concurrently, retrying only the failures."""
+        async with AsyncSessionLocal() as db:
+            passengers = (await db.execute(
+                select(Passenger).where(Passenger.booking_id == booking_id)
+            )).scalars().all()
+
+        client = get_client("ticketing-service")
+
+        async def issue(passenger) -> str:
+            response = await client.post(
+                f"{settings.TICKETING_SERVICE_URL}/generate",
+                json={
+                    "request": {"booking_id": booking_id},
+                    "passenger": {"first_name": passenger.first_name, "last_name": passenger.last_name}
+                },
+                timeout=30.0
+            )
+            if response.status_code != 201:
+                raise SagaStepError(f"Ticketing failed ({response.status_code}): {response.text}")
+            return response.json()["ticket_id"]
+
+        tickets: Dict[int, str] = {}
+        pending = list(range(len(passengers)))
+        for attempt in range(settings.SAGA_TICKET_ATTEMPTS):
+            results = await asyncio.gather(*[issue(passengers[i]) for i in pending], return_exceptions=True)
+            failed = []
+            for i, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    failed.append(i)
+                    error = result
+                else:
+                    tickets[i] = result
+            if not failed:
+                return [tickets[i] for i in range(len(passengers))]
+            pending = failed
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        raise SagaStepError(f"Ticketing failed for {len(pending)} passenger(s): {error}")
+
+    # Persistence
+    async def _load(self, saga_id: str) -> BookingSagaState:
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(BookingSagaState).where(BookingSagaState.id == saga_id)
+            )).scalar_one()
+
+    async def _save(self, saga_id: str, **values) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(BookingSagaState)
+                .where(BookingSagaState.id == saga_id)
+                .values(updated_at=datetime.utcnow(), **values)
+            )
+            await db.commit()
+
+    @staticmethod
+    def _serialize(saga: BookingSagaState) -> Dict:
+        return {
+            "saga_id": str(saga.id),
+            "user_id": str(saga.user_id),
+            "status": saga.status,
+            "step": saga.step,
+            "booking_id": str(saga.booking_id) if saga.booking_id else None,
+            "payment_id": str(saga.payment_id) if saga.payment_id else None,
+            "ticket_ids": saga.ticket_ids or [],
+            "error": saga.error,
+            "created_at": saga.created_at.isoformat() if saga.created_at else None,
+            "updated_at": saga.updated_at.isoformat() if saga.updated_at else None
+        }
+
+
+booking_saga = BookingSaga()
@@ -5,6 +5,16 @@ This package contains all business logic for the booking service.
 Business rules, validation, and orchestration logic lives here.
 """
 
-from .booking_service import BookingService
+from .booking_service import (
+    BookingService,
+    FlightNotFoundError,
+    SeatsUnavailableError,
+    PricingError,
+)
 
-__all__ = ["BookingService"]
+__all__ = [
+    "BookingService",
+    "FlightNotFoundError",
+    "SeatsUnavailableError",
+    "PricingError",
+]
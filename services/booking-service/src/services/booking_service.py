@@ -7,14 +7,32 @@ Business logic is separated from API routes to maintain clean architecture.
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert
 from uuid import uuid4
-import httpx
+import asyncio
 import logging
+from shared.http_client import get_client, hedged_request
+from shared.transitions import transition_status
+from src.events import booking_created_event, booking_confirmed_event, booking_cancelled_event
+from src.metrics import track_stage, timed
+from src.outbox import stage_event, stage_events, wake_relay
+from src.pnr import pnr_allocator, hot_pnr_cache
 
 logger = logging.getLogger(__name__)
 
 
+class FlightNotFoundError(ValueError):
+    """The requested flight does not exist."""
+
+
+class SeatsUnavailableError(ValueError):
+    """Not enough seats left for the requested passengers."""
+
+
+class PricingError(ValueError):
+    """The pricing service could not quote the booking."""
+
+
 class BookingService:
     """
     Business logic service for booking operations.
@@ -24,7 +42,7 @@ class BookingService:
     - Status transitions
     - Expiration handling
     - Validation logic
-    - Event publishing
+    - Event publishing (via the transactional outbox)
     
     Usage:
         service = BookingService(db_session)
@@ -61,119 +79,251 @@ class BookingService:
         2. Check seat availability
         3. Price calculated via pricing service
         4. Booking expires in N minutes if unpaid
-        5. Event published for downstream services
-        """
-        # Business Rule 1: Validate flight exists
-        flight = await self._get_flight(flight_id)
-        if not flight:
-            raise ValueError("Flight not found")
-        
-        # Business Rule 2: Check availability
-        if not await self._check_availability(flight_id, len(passengers), class_type):
-            raise ValueError("Insufficient seats available")
-        
-        # Business Rule 3: Calculate price via pricing service
-        try:
-            total_amount = await self._calculate_price(
-                flight_id=flight_id,
-                passenger_count=len(passengers),
-                class_type=class_type,
-                add_ons=add_ons or []
-            )
-        except Exception as e:
-            logger.error(f"Price calculation failed: {e}")
-            raise ValueError(f"Price calculation failed: {str(e)}")
-        
-        # Business Rule 4: Create booking with expiration
-        booking_id = str(uuid4())
-        created_at = datetime.utcnow()
-        expires_at = created_at + timedelta(minutes=booking_expiration_minutes)
-        
-        # Import here to avoid circular imports
-        from src.models import Booking
+        5. Event staged in the outbox, in the booking's transaction
         
-        booking = Booking(
-            id=booking_id,
-            user_id=user_id,
-            resource_type="FLIGHT",
-            resource_id=flight_id,
-            status="PENDING",
-            created_at=created_at
-        )
-        
-        self.db.add(booking)
-        await self.db.commit()
-        await self.db.refresh(booking)
+        Rules 1-3 are independent, so the flight lookup and both upstream
+        calls run concurrently. The booking and all passengers are written
+        in a single transaction. Each stage is recorded in
+        booking_create_stage_seconds.
+        """
+        from src.models import Booking, Passenger
+        from src.loaders import flight_resource_details
         
-        # Business Rule 5: Publish event for downstream services
-        try:
-            from src.events import publish_booking_created
-            await publish_booking_created(
-                booking_id=booking_id,
-                user_id=user_id,
-                amount=total_amount
-            )
-        except Exception as e:
-            logger.warning(f"Failed to publish booking event: {e}")
-            # Don't fail booking creation if event publishing fails
-        
-        # Prepare response
-        flight_details = {
-            "flight_number": getattr(flight, 'flight_number', 'N/A'),
-            "origin": getattr(flight, 'origin', 'N/A'),
-            "destination": getattr(flight, 'destination', 'N/A'),
-            "departure_time": flight.departure_time.isoformat() if hasattr(flight, 'departure_time') and flight.departure_time else None,
-            "arrival_time": flight.arrival_time.isoformat() if hasattr(flight, 'arrival_time') and flight.arrival_time else None,
-            "base_price": float(flight.base_price) if hasattr(flight, 'base_price') else 0.0
-        }
+        with track_stage("total"):
+            # Business Rules 1-3: Validate flight, check availability, calculate price
+            with track_stage("upstream"):
+                flight, available, total_amount = await asyncio.gather(
+                    timed("flight_lookup", self._get_flight(flight_id)),
+                    timed("availability", self._check_availability(flight_id, len(passengers), class_type)),
+                    timed("pricing", self._calculate_price(
+                        flight_id=flight_id,
+                        passenger_count=len(passengers),
+                        class_type=class_type,
+                        add_ons=add_ons or []
+                    )),
+                    return_exceptions=True
+                )
+            
+            if isinstance(flight, Exception):
+                raise flight
+            if not flight:
+                raise FlightNotFoundError("Flight not found")
+            if available is False:
+                raise SeatsUnavailableError("Insufficient seats available")
+            if isinstance(total_amount, Exception):
+                logger.error(f"Price calculation failed: {total_amount}")
+                raise PricingError(str(total_amount))
+            
+            # Business Rule 4: Create booking with expiration
+            booking_id = str(uuid4())
+            pnr = await pnr_allocator.next_pnr(self.db)
+            created_at = datetime.utcnow()
+            expires_at = created_at + timedelta(minutes=booking_expiration_minutes)
+            
+            with track_stage("persist"):
+                await self.db.execute(
+                    insert(Booking).values(
+                        id=booking_id,
+                        user_id=user_id,
+                        pnr=pnr,
+                        resource_type="FLIGHT",
+                        resource_id=flight_id,
+                        status="PENDING",
+                        total_amount=total_amount,
+                        created_at=created_at,
+                        expires_at=expires_at
+                    )
+                )
+                if passengers:
+                    # One executemany for every passenger
+                    await self.db.execute(
+                        insert(Passenger),
+                        [self._passenger_row(booking_id, p) for p in passengers]
+                    )
+                # Business Rule 5: Event for downstream services, committed with the booking
+                await stage_event(self.db, booking_created_event(
+                    booking_id=booking_id,
+                    user_id=user_id,
+                    amount=total_amount
+                ))
+                await self.db.commit()
+            wake_relay()
         
         return {
             "id": booking_id,
+            "pnr": pnr,
             "flight_id": flight_id,
             "user_id": user_id,
             "status": "PENDING",
             "total_amount": total_amount,
             "passengers": passengers,
-            "flight_details": flight_details,
+            "resource_details": flight_resource_details(flight, class_type=class_type),
             "created_at": created_at.isoformat(),
             "expires_at": expires_at.isoformat()
         }
     
+    async def create_bookings_bulk(
+        self,
+        user_id: str,
+        items: List[Dict],
+        booking_expiration_minutes: int = 15
+    ) -> List[Dict]:
+        """
+        Create many bookings at once (group / corporate travel).
+        
+        Each item has flight_id, passengers, class_type and add_ons. The
+        same business rules as create_booking apply, but batched:
+        - all flights are loaded with one IN query
+        - availability is checked once per (flight, class) for the summed
+          passenger count, concurrently
+        - all items are priced with one /calculate/batch request
+        - bookings, passengers and outbox events are written with
+          multi-row inserts in a single transaction
+        
+        The batch is all-or-nothing; errors name the offending item index.
+        """
+        from src.models import Booking, Flight, Passenger
+        from src.loaders import flight_resource_details
+        
+        # Seats needed per (flight, class) across the whole group
+        seats_needed: Dict[tuple, int] = {}
+        for item in items:
+            slot = (item["flight_id"], item.get("class_type", "economy"))
+            seats_needed[slot] = seats_needed.get(slot, 0) + len(item["passengers"])
+        
+        with track_stage("bulk_total"):
+            with track_stage("bulk_upstream"):
+                flight_ids = {item["flight_id"] for item in items}
+                flights_result, prices, *availability = await asyncio.gather(
+                    timed("bulk_flight_lookup", self.db.execute(select(Flight).where(Flight.id.in_(flight_ids)))),
+                    timed("bulk_pricing", self._calculate_prices_batch(items)),
+                    *[
+                        timed("bulk_availability", self._check_availability(flight_id, count, class_type))
+                        for (flight_id, class_type), count in seats_needed.items()
+                    ],
+                    return_exceptions=True
+                )
+            
+            if isinstance(flights_result, Exception):
+                raise flights_result
+            flights = {str(f.id): f for f in flights_result.scalars().all()}
+            for i, item in enumerate(items):
+                if item["flight_id"].lower() not in flights:
+                    raise FlightNotFoundError(f"Item {i}: Flight not found")
+            for (flight_id, class_type), available in zip(seats_needed, availability):
+                if available is False:
+                    raise SeatsUnavailableError(f"Insufficient seats available on flight {flight_id} ({class_type})")
+            if isinstance(prices, Exception):
+                logger.error(f"Batch price calculation failed: {prices}")
+                raise PricingError(str(prices))
+            
+            created_at = datetime.utcnow()
+            expires_at = created_at + timedelta(minutes=booking_expiration_minutes)
+            booking_rows, passenger_rows, events, bookings = [], [], [], []
+            for item, total_amount in zip(items, prices):
+                booking_id = str(uuid4())
+                pnr = await pnr_allocator.next_pnr(self.db)
+                booking_rows.append({
+                    "id": booking_id,
+                    "user_id": user_id,
+                    "pnr": pnr,
+                    "resource_type": "FLIGHT",
+                    "resource_id": item["flight_id"],
+                    "status": "PENDING",
+                    "total_amount": total_amount,
+                    "created_at": created_at,
+                    "expires_at": expires_at
+                })
+                passenger_rows.extend(self._passenger_row(booking_id, p) for p in item["passengers"])
+                events.append(booking_created_event(booking_id=booking_id, user_id=user_id, amount=total_amount))
+                bookings.append({
+                    "id": booking_id,
+                    "pnr": pnr,
+                    "flight_id": item["flight_id"],
+                    "user_id": user_id,
+                    "status": "PENDING",
+                    "total_amount": total_amount,
+                    "passengers": item["passengers"],
+                    "resource_details": flight_resource_details(
+                        flights[item["flight_id"].lower()],
+                        class_type=item.get("class_type", "economy")
+                    ),
+                    "created_at": created_at.isoformat(),
+                    "expires_at": expires_at.isoformat()
+                })
+            
+            with track_stage("bulk_persist"):
+                await self.db.execute(insert(Booking), booking_rows)
+                if passenger_rows:
+                    await self.db.execute(insert(Passenger), passenger_rows)
+                await stage_events(self.db, events)
+                await self.db.commit()
+            wake_relay()
+        
+        logger.info(f"Created {len(bookings)} bookings in bulk for user {user_id}")
+        return bookings
+    
     async def confirm_booking(self, booking_id: str) -> Dict:
-        """Confirm a booking after payment."""
-        from src.models import Booking
+        """
+        Confirm a booking after payment.
         
-        booking = await self._get_booking(booking_id)
-        if not booking:
-            raise ValueError("Booking not found")
+        A single conditional UPDATE (PENDING -> CONFIRMED), so a concurrent
+        cancel or expiry can never be overwritten.
         
-        if booking.status != "PENDING":
-            raise ValueError(f"Cannot confirm booking with status {booking.status}")
+        Raises:
+            RowNotFoundError, InvalidTransitionError (both ValueErrors)
+        """
+        from src.models import Booking
         
-        booking.status = "CONFIRMED"
+        row = await transition_status(
+            self.db, Booking, booking_id, "CONFIRMED", ["PENDING"],
+            returning=[Booking.pnr]
+        )
+        await stage_event(self.db, booking_confirmed_event(str(booking_id)))
         await self.db.commit()
-        await self.db.refresh(booking)
+        hot_pnr_cache.invalidate(row.pnr)
+        wake_relay()
         
-        return {"id": str(booking.id), "status": booking.status}
+        return {"id": str(booking_id), "status": "CONFIRMED", "version": row.version}
     
     async def cancel_booking(self, booking_id: str, reason: str = None) -> Dict:
-        """Cancel a booking."""
-        from src.models import Booking
-        
-        booking = await self._get_booking(booking_id)
-        if not booking:
-            raise ValueError("Booking not found")
+        """
+        Cancel a PENDING or CONFIRMED booking with one conditional UPDATE.
         
-        if booking.status == "CANCELLED":
-            raise ValueError("Booking already cancelled")
+        Raises:
+            RowNotFoundError, InvalidTransitionError (both ValueErrors)
+        """
+        from src.models import Booking
         
-        booking.status = "CANCELLED"
+        row = await transition_status(
+            self.db, Booking, booking_id, "CANCELLED", ["PENDING", "CONFIRMED"],
+            returning=[Booking.pnr],
+            cancelled_at=datetime.utcnow(),
+            cancellation_reason=reason
+        )
+        await stage_event(self.db, booking_cancelled_event(str(booking_id), reason=reason))
         await self.db.commit()
-        await self.db.refresh(booking)
+        hot_pnr_cache.invalidate(row.pnr)
+        wake_relay()
         
-        return {"id": str(booking.id), "status": booking.status}
+        return {"id": str(booking_id), "status": "CANCELLED", "version": row.version}
     
     # Private helper methods
+    @staticmethod
+    def _passenger_row(booking_id: str, passenger: Dict) -> Dict:
+        """Column values for a passenger insert."""
+        return {
+            "id": str(uuid4()),
+            "booking_id": booking_id,
+            "first_name": passenger["first_name"],
+            "last_name": passenger["last_name"],
+            "title": passenger.get("title"),
+            "date_of_birth": passenger.get("date_of_birth"),
+            "passport_number": passenger.get("passport_number"),
+            "email": passenger.get("email"),
+            "phone": passenger.get("phone")
+        }
+    
     async def _get_flight(self, flight_id: str) -> Optional[object]:
         """Get flight by ID from database."""
         from src.models import Flight
@@ -189,29 +339,57 @@ class BookingService:
     async def _check_availability(self, flight_id: str, passenger_count: int, class_type: str) -> bool:
         """Check if enough seats are available."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.inventory_service_url}/availability",
-                    params={"flight_id": flight_id, "class_type": class_type, "seats_needed": passenger_count},
-                    timeout=5.0
-                )
-                if response.status_code == 200:
-                    return response.json().get("available", False)
+            client = get_client("inventory-service")
+            response = await client.get(
+                f"{self.inventory_service_url}/availability",
+                params={"flight_id": flight_id, "class_type": class_type, "seats_needed": passenger_count},
+                timeout=5.0
+            )
+            if response.status_code == 200:
+                return response.json().get("available", False)
         except Exception as e:
             logger.warning(f"Availability check failed: {e}, assuming available")
         return True
     
     async def _calculate_price(self, flight_id: str, passenger_count: int, class_type: str, add_ons: List[str]) -> float:
-        """Calculate booking price via pricing service."""
+        """Calculate booking price via pricing service (hedged: quotes are idempotent)."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.pricing_service_url}/calculate",
-                    json={"flight_id": flight_id, "passengers": passenger_count, "class_type": class_type, "add_ons": add_ons},
-                    timeout=10.0
-                )
-                response.raise_for_status()
-                return response.json()["breakdown"]["total"]
+            response = await hedged_request(
+                "pricing-service",
+                "POST",
+                f"{self.pricing_service_url}/calculate",
+                json={"flight_id": flight_id, "passengers": passenger_count, "class_type": class_type, "add_ons": add_ons},
+                timeout=10.0
+            )
+            response.raise_for_status()
+            return response.json()["breakdown"]["total"]
         except Exception as e:
             logger.error(f"Pricing service error: {e}")
             raise ValueError(f"Price calculation failed: {str(e)}")
+    
+    async def _calculate_prices_batch(self, items: List[Dict]) -> List[float]:
+        """
+        Price many bookings with one pricing-service call; totals in item order.
+        Not hedged: a batch takes far longer than a single quote, so the quote
+        p95 would hedge almost every batch (and skew that p95 upward).
+        """
+        try:
+            client = get_client("pricing-service")
+            response = await client.post(
+                f"{self.pricing_service_url}/calculate/batch",
+                json={"items": [
+                    {
+                        "flight_id": item["flight_id"],
+                        "passengers": len(item["passengers"]),
+                        "class_type": item.get("class_type", "economy"),
+                        "add_ons": item.get("add_ons") or []
+                    }
+                    for item in items
+                ]},
+                timeout=30.0
+            )
+            response.raise_for_status()
+            return [result["breakdown"]["total"] for result in response.json()["results"]]
+        except Exception as e:
+            logger.error(f"Pricing service error: {e}")
+            raise ValueError(f"Batch price calculation failed: {str(e)}")
@@ -0,0 +1 @@
+"""Background workers started from the application lifespan."""
@@ -0,0 +1,108 @@
+"""
+Expiry sweeper for unpaid bookings.
+
+PENDING bookings carry an `expires_at` deadline. The sweeper wakes up every
+BOOKING_SWEEP_INTERVAL_SECONDS and cancels overdue bookings in bounded
+batches. Each batch claims rows with `FOR UPDATE SKIP LOCKED`, so several
+replicas can sweep concurrently without blocking each other or a user who
+is confirming the same booking, and is committed on its own so locks are
+held only for one batch. The batch's booking.cancelled events are staged
+in the outbox inside that same transaction.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import text
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.events import booking_cancelled_event
+from src.metrics import BOOKINGS_EXPIRED, EXPIRY_BATCH_LATENCY, EXPIRY_LAG
+from src.outbox import stage_events, wake_relay
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_REASON = "EXPIRED"
+
+# Served by idx_bookings_pending_expires_at (partial index on PENDING rows)
+_EXPIRE_BATCH_SQL = text("""
+    WITH expired AS (
+        SELECT id FROM bookings
+        WHERE status = 'PENDING' AND expires_at < now()
+        ORDER BY expires_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE bookings b
+    SET status = 'CANCELLED', version = b.version + 1, cancelled_at = now(), cancellation_reason = :reason
+    FROM expired
+    WHERE b.id = expired.id AND b.status = 'PENDING'
+    RETURNING b.id
+""")
+
+_OLDEST_OVERDUE_SQL = text("""
+    SELECT min(expires_at) FROM bookings
+    WHERE status = 'PENDING' AND expires_at < now()
+""")
+
+
+async def expire_batch(batch_size: int) -> List[str]:
+    """Cancel up to `batch_size` overdue bookings in one transaction; returns their ids."""
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(_EXPIRE_BATCH_SQL, {"batch_size": batch_size, "reason": EXPIRY_REASON})
+        booking_ids = [str(row.id) for row in result]
+        await stage_events(db, [
+            booking_cancelled_event(booking_id, reason=EXPIRY_REASON, refundable=False)
+            for booking_id in booking_ids
+        ])
+        await db.commit()
+    EXPIRY_BATCH_LATENCY.observe(time.perf_counter() - start)
+
+    if booking_ids:
+        BOOKINGS_EXPIRED.inc(len(booking_ids))
+        wake_relay()
+    return booking_ids
+
+
+async def update_lag() -> None:
+    """Set `booking_expiry_lag_seconds` from the oldest overdue PENDING booking."""
+    async with AsyncSessionLocal() as db:
+        oldest = (await db.execute(_OLDEST_OVERDUE_SQL)).scalar()
+    lag = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0
+    EXPIRY_LAG.set(max(lag, 0.0))
+
+
+async def sweep_once() -> int:
+    """
+    Drain overdue bookings until a short batch comes back, capped at
+    BOOKING_SWEEP_MAX_BATCHES per tick. Returns the number expired.
+    """
+    batch_size = settings.BOOKING_SWEEP_BATCH_SIZE
+    total = 0
+    for _ in range(settings.BOOKING_SWEEP_MAX_BATCHES):
+        expired = await expire_batch(batch_size)
+        total += len(expired)
+        if len(expired) < batch_size:
+            break
+    await update_lag()
+    if total:
+        logger.info(f"Expired {total} unpaid bookings")
+    return total
+
+
+async def run_expiry_sweeper() -> None:
+    """Sweep loop; runs until cancelled."""
+    interval = settings.BOOKING_SWEEP_INTERVAL_SECONDS
+    logger.info(f"Booking expiry sweeper started (interval={interval}s, batch={settings.BOOKING_SWEEP_BATCH_SIZE})")
+    while True:
+        try:
+            await sweep_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Booking expiry sweep failed: {e}")
+        await asyncio.sleep(interval)
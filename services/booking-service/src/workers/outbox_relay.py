@@ -0,0 +1,135 @@
+"""
+Outbox relay: publishes staged booking events.
+
+Each iteration claims up to OUTBOX_RELAY_BATCH_SIZE unpublished rows with
+`FOR UPDATE SKIP LOCKED` (so replicas split the backlog), publishes them
+concurrently per topic, then marks successes sent and records failures
+with set-based updates in the same transaction. A failed row is not
+claimed again until its `next_attempt_at`, which backs off exponentially
+(OUTBOX_RETRY_BASE_SECONDS doubling up to OUTBOX_RETRY_MAX_SECONDS), so a
+poison event cannot hold up the rows behind it. After
+OUTBOX_RELAY_MAX_ATTEMPTS failures the row is parked (`parked_at`) and left
+for an operator. Consumers must tolerate the occasional duplicate.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import case, func, literal_column, select, update
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.events import producer
+from src.metrics import OUTBOX_PUBLISHED, OUTBOX_RELAY_LATENCY
+from src.models import OutboxEvent
+from src.outbox import relay_wakeup
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_at():
+    """next_attempt_at for a row failing its (attempts + 1)th publish."""
+    delay = func.least(
+        settings.OUTBOX_RETRY_BASE_SECONDS * func.power(2, OutboxEvent.attempts),
+        settings.OUTBOX_RETRY_MAX_SECONDS
+    )
+    return func.now() + delay * literal_column("interval '1 second'")
+
+
+async def relay_batch(batch_size: int) -> Tuple[int, int]:
+    """Publish one batch of due outbox rows; returns (rows claimed, rows published)."""
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(OutboxEvent.id, OutboxEvent.topic, OutboxEvent.payload, OutboxEvent.ordering_key)
+            .where(
+                OutboxEvent.published_at.is_(None),
+                OutboxEvent.parked_at.is_(None),
+                OutboxEvent.next_attempt_at <= func.now()
+            )
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not rows:
+            return 0, 0
+
+        by_topic: Dict[str, List] = defaultdict(list)
+        for row in rows:
+            by_topic[row.topic].append(row)
+
+        topics = list(by_topic)
+        results = await asyncio.gather(*[
+            producer.publish_batch(
+                topic,
+                [row.payload for row in by_topic[topic]],
+                ordering_keys=[row.ordering_key for row in by_topic[topic]]
+            )
+            for topic in topics
+        ])
+
+        sent, failed = [], []
+        for topic, flags in zip(topics, results):
+            for row, ok in zip(by_topic[topic], flags):
+                (sent if ok else failed).append(row.id)
+
+        if sent:
+            await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_(sent))
+                .values(published_at=func.now(), attempts=OutboxEvent.attempts + 1, last_error=None)
+            )
+        parked = []
+        if failed:
+            result = await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_(failed))
+                .values(
+                    attempts=OutboxEvent.attempts + 1,
+                    last_error="publish failed",
+                    next_attempt_at=_retry_at(),
+                    parked_at=case(
+                        (OutboxEvent.attempts + 1 >= settings.OUTBOX_RELAY_MAX_ATTEMPTS, func.now())
+                    )
+                )
+                .returning(OutboxEvent.id, OutboxEvent.parked_at)
+            )
+            parked = [row.id for row in result if row.parked_at is not None]
+        await db.commit()
+
+    OUTBOX_PUBLISHED.labels("sent").inc(len(sent))
+    OUTBOX_PUBLISHED.labels("failed").inc(len(failed) - len(parked))
+    OUTBOX_PUBLISHED.labels("parked").inc(len(parked))
+    OUTBOX_RELAY_LATENCY.observe(time.perf_counter() - start)
+    if failed:
+        logger.warning(f"Outbox relay: {len(failed)} of {len(rows)} events failed, will retry with backoff")
+    if parked:
+        logger.error(f"Outbox relay: parked events {parked} after {settings.OUTBOX_RELAY_MAX_ATTEMPTS} attempts")
+    return len(rows), len(sent)
+
+
+async def run_outbox_relay() -> None:
+    """
+    Relay loop; drains full batches back-to-back while they publish and
+    otherwise waits for a wake-up or the poll interval.
+    """
+    batch_size = settings.OUTBOX_RELAY_BATCH_SIZE
+    wakeup = relay_wakeup()
+    logger.info(f"Outbox relay started (batch={batch_size}, poll={settings.OUTBOX_RELAY_POLL_SECONDS}s)")
+    while True:
+        wakeup.clear()
+        try:
+            claimed, published = await relay_batch(batch_size)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Outbox relay failed: {e}")
+            claimed, published = 0, 0
+        if claimed >= batch_size and published:
+            continue
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=settings.OUTBOX_RELAY_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,78 @@
+"""
+Consumers that maintain the booking read model (src/read_model.py).
+
+Subscribes to booking events, payment events (payment-service changes
+booking status itself) and inventory flight updates on Pub/Sub.
+Messages arrive on the subscriber's callback threads and are applied on
+the application's event loop; a message is acked only after its change
+is committed, so failures are redelivered. Without Pub/Sub (local dev)
+the consumer listens to events published in-process instead.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+from google.cloud import pubsub_v1
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.events import producer
+from src.read_model import apply_event
+
+logger = logging.getLogger(__name__)
+
+APPLY_TIMEOUT_SECONDS = 30
+
+
+async def apply_events(events: List[Dict[str, Any]]) -> None:
+    """Apply events to the read model in one transaction."""
+    async with AsyncSessionLocal() as db:
+        for event in events:
+            await apply_event(db, event)
+        await db.commit()
+
+
+class ReadModelConsumer:
+    def __init__(self, subscription_ids: List[str]):
+        self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT", "journeyiq-local")
+        self.subscription_ids = subscription_ids
+        self.subscriber = None
+        self.futures = []
+        try:
+            self.subscriber = pubsub_v1.SubscriberClient()
+        except Exception as e:
+            logger.warning(f"PubSub subscriber init failed (expected in local without creds): {e}")
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        if not self.subscriber:
+            logger.info("[MOCK LISTENER] Read model fed from in-process events")
+            producer.add_local_listener(lambda topic_id, events: apply_events(events))
+            return
+
+        def callback(message):
+            try:
+                event = json.loads(message.data.decode("utf-8"))
+                asyncio.run_coroutine_threadsafe(apply_events([event]), loop).result(timeout=APPLY_TIMEOUT_SECONDS)
+                message.ack()
+            except Exception as e:
+                logger.error(f"Read model failed to apply message {message.message_id}: {e}")
+                message.nack()
+
+        for subscription_id in self.subscription_ids:
+            path = self.subscriber.subscription_path(self.project_id, subscription_id)
+            self.futures.append(self.subscriber.subscribe(path, callback=callback))
+            logger.info(f"Read model listening on {subscription_id}")
+
+    def stop(self):
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+
+read_model_consumer = ReadModelConsumer([
+    settings.READ_MODEL_BOOKING_SUBSCRIPTION,
+    settings.READ_MODEL_PAYMENT_SUBSCRIPTION,
+    settings.READ_MODEL_FLIGHT_SUBSCRIPTION
+])
@@ -118,6 +118,283 @@ class TestBookingCancellation:
         assert response.status_code == 404
 
 
+class TestBookingLoader:
+    """Test batched flight loading for booking reads"""
+    
+    def test_page_of_bookings_costs_two_queries(self):
+        """Bookings (with passengers) and all their flights load in one query each, whatever the page size"""
+        import asyncio
+        from datetime import datetime, timedelta
+        from types import SimpleNamespace
+        from uuid import uuid4
+        from src.loaders import BookingLoader
+        from src.models import Booking
+        from sqlalchemy import select
+        
+        departure = datetime(2026, 12, 1, 9, 0)
+        flights = [
+            SimpleNamespace(id=uuid4(), flight_number=f"JQ{i}", origin="JFK", destination="LHR", base_price=100,
+                            departure_time=departure, arrival_time=departure + timedelta(hours=7))
+            for i in range(5)
+        ]
+        bookings = [
+            SimpleNamespace(id=uuid4(), user_id=uuid4(), pnr="ABC123", resource_type="FLIGHT",
+                            resource_id=flights[i % 5].id, status="CONFIRMED", total_amount=100,
+                            created_at=departure, expires_at=None, passengers=[])
+            for i in range(20)
+        ]
+        statements = []
+        
+        class Session:
+            async def execute(self, stmt):
+                statements.append(stmt)
+                rows = bookings if stmt.column_descriptions[0]["entity"] is Booking else flights
+                return Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=rows))))
+        
+        loader = BookingLoader(Session())
+        loaded = asyncio.run(loader.load_bookings(select(Booking)))
+        payloads = [loader.serialize(b) for b in loaded]
+        asyncio.run(loader.load_flight(flights[0].id))  # Cached
+        
+        assert len(statements) == 2
+        assert "IN" in str(statements[1])
+        assert payloads[7]["resource_details"]["flight_number"] == "JQ2"
+
+
+class TestCreateBookingStages:
+    """Test BookingService.create_booking"""
+    
+    def test_upstream_stages_overlap_and_persist_once(self):
+        """Flight lookup, availability and pricing run concurrently; passengers are one executemany"""
+        import asyncio
+        import time
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock
+        from src.services.booking_service import BookingService
+        
+        flight = SimpleNamespace(id="f1", flight_number="JQ1", origin="JFK", destination="LHR",
+                                 departure_time=None, arrival_time=None, base_price=100)
+        
+        def slow(value):
+            async def stage(*args, **kwargs):
+                await asyncio.sleep(0.2)
+                return value
+            return stage
+        
+        db = Mock(execute=AsyncMock(), commit=AsyncMock())
+        service = BookingService(db)
+        passengers = [{"first_name": "Alice", "last_name": "Voyager"}, {"first_name": "Bob", "last_name": "Voyager"}]
+        
+        with patch.object(service, "_get_flight", side_effect=slow(flight)), \
+             patch.object(service, "_check_availability", side_effect=slow(True)), \
+             patch.object(service, "_calculate_price", side_effect=slow(240.0)), \
+             patch("src.services.booking_service.pnr_allocator.next_pnr", AsyncMock(return_value="ABC234")), \
+             patch("src.services.booking_service.wake_relay"):
+            started = time.perf_counter()
+            booking = asyncio.run(service.create_booking("f1", "u1", passengers))
+            elapsed = time.perf_counter() - started
+        
+        assert elapsed < 0.5  # Three 0.2s stages, not 0.6s in sequence
+        assert booking["total_amount"] == 240.0
+        assert booking["pnr"] == "ABC234"
+        # Booking, passengers (one executemany) and outbox event, then one commit
+        assert db.execute.await_count == 3
+        assert len(db.execute.await_args_list[1].args[1]) == 2
+        db.commit.assert_awaited_once()
+
+
+class TestExpirySweeper:
+    """Test the expired-booking sweeper"""
+    
+    def test_sweep_drains_until_short_batch(self):
+        """Full batches are followed by another; each batch stages its cancellation events"""
+        import asyncio
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock
+        from src.workers import expiry_sweeper
+        
+        batches = [[SimpleNamespace(id=f"b{i}") for i in range(n)] for n in (2, 2, 1)]
+        staged = []
+        
+        class Session:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc):
+                return False
+            
+            async def execute(self, stmt, params=None):
+                if "UPDATE bookings" in str(stmt):
+                    assert params["reason"] == "EXPIRED"
+                    return batches.pop(0)
+                return Mock(scalar=Mock(return_value=None))
+            
+            async def commit(self):
+                pass
+        
+        async def stage(db, events):
+            staged.append(events)
+        
+        with patch.object(expiry_sweeper, "AsyncSessionLocal", Session), \
+             patch.object(expiry_sweeper, "stage_events", stage), \
+             patch.object(expiry_sweeper, "wake_relay"), \
+             patch.object(expiry_sweeper.settings, "BOOKING_SWEEP_BATCH_SIZE", 2):
+            total = asyncio.run(expiry_sweeper.sweep_once())
+        
+        assert total == 5
+        assert [len(events) for events in staged] == [2, 2, 1]
+        assert staged[0][0]["refundable"] is False
+
+
+class TestOutboxRelay:
+    """Test the outbox relay worker"""
+    
+    def test_failed_events_back_off_and_park(self):
+        """Only due, unparked rows are claimed; failures get a retry time and are parked past the attempt cap"""
+        import asyncio
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock
+        from src.workers import outbox_relay
+        
+        rows = [SimpleNamespace(id=i, topic="booking-events", payload={"n": i}, ordering_key=None) for i in (1, 2)]
+        statements = []
+        
+        class Session:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc):
+                return False
+            
+            async def execute(self, stmt):
+                statements.append(stmt)
+                if stmt.is_select:
+                    return Mock(all=Mock(return_value=rows))
+                return [SimpleNamespace(id=2, parked_at="now")]
+            
+            async def commit(self):
+                pass
+        
+        with patch.object(outbox_relay, "AsyncSessionLocal", Session), \
+             patch.object(outbox_relay.producer, "publish_batch", AsyncMock(return_value=[True, False])):
+            claimed, published = asyncio.run(outbox_relay.relay_batch(10))
+        
+        assert (claimed, published) == (2, 1)
+        claim, sent, failed = (str(stmt) for stmt in statements)
+        assert "booking_outbox.next_attempt_at <= now()" in claim
+        assert "booking_outbox.parked_at IS NULL" in claim
+        assert "published_at=now()" in sent
+        assert "next_attempt_at=(now() + least(" in failed
+        assert "parked_at=CASE WHEN" in failed
+    
+    def test_failing_full_batch_waits_for_poll(self):
+        """A full batch that publishes nothing does not spin"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from src.workers import outbox_relay
+        
+        relay_batch = AsyncMock(return_value=(200, 0))
+        
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(outbox_relay.run_outbox_relay(), timeout=0.3)
+            except asyncio.TimeoutError:
+                pass
+        
+        with patch.object(outbox_relay, "relay_batch", relay_batch), \
+             patch.object(outbox_relay.settings, "OUTBOX_RELAY_BATCH_SIZE", 200), \
+             patch.object(outbox_relay.settings, "OUTBOX_RELAY_POLL_SECONDS", 0.1), \
+             patch.object(outbox_relay, "relay_wakeup", lambda: asyncio.Event()):
+            asyncio.run(run_briefly())
+        
+        assert relay_batch.await_count <= 4
+
+
+class TestBulkBooking:
+    """Test bulk group booking"""
+    
+    def test_group_is_checked_priced_and_written_in_batches(self):
+        """One flight query, one availability check per flight/class, one pricing call, multi-row inserts"""
+        import asyncio
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock
+        from src.services.booking_service import BookingService
+        
+        flights = [SimpleNamespace(id=f"f{i}", flight_number=f"JQ{i}", origin="JFK", destination="LHR",
+                                   departure_time=None, arrival_time=None, base_price=100) for i in (1, 2)]
+        alice, bob = {"first_name": "Alice", "last_name": "Voyager"}, {"first_name": "Bob", "last_name": "Voyager"}
+        items = [
+            {"flight_id": "f1", "passengers": [alice, bob]},
+            {"flight_id": "f1", "passengers": [alice]},
+            {"flight_id": "f2", "passengers": [bob], "class_type": "business"},
+        ]
+        flights_result = Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=flights))))
+        db = Mock(execute=AsyncMock(side_effect=[flights_result, None, None, None]), commit=AsyncMock())
+        service = BookingService(db)
+        availability = AsyncMock(return_value=True)
+        pricing = AsyncMock(return_value=[200.0, 100.0, 450.0])
+        
+        with patch.object(service, "_check_availability", availability), \
+             patch.object(service, "_calculate_prices_batch", pricing), \
+             patch("src.services.booking_service.pnr_allocator.next_pnr", AsyncMock(side_effect=["AAA234", "AAB234", "AAC234"])), \
+             patch("src.services.booking_service.wake_relay"):
+            bookings = asyncio.run(service.create_bookings_bulk("u1", items))
+        
+        assert [b["total_amount"] for b in bookings] == [200.0, 100.0, 450.0]
+        assert sorted(call.args for call in availability.await_args_list) == [("f1", 3, "economy"), ("f2", 1, "business")]
+        pricing.assert_awaited_once()
+        # Flights, then bookings, passengers and outbox events as executemany, then one commit
+        assert db.execute.await_count == 4
+        assert len(db.execute.await_args_list[1].args[1]) == 3
+        assert len(db.execute.await_args_list[2].args[1]) == 4
+        db.commit.assert_awaited_once()
+    
+    def test_too_many_items_rejected(self):
+        """Requests above BULK_BOOKING_MAX_ITEMS are rejected before any work"""
+        from src.config import settings
+        
+        item = {"flight_id": "f1", "passengers": [{"first_name": "A", "last_name": "B", "date_of_birth": "1990-01-01"}]}
+        response = client.post("/bulk", json={
+            "user_id": "u1",
+            "bookings": [item] * (settings.BULK_BOOKING_MAX_ITEMS + 1)
+        })
+        assert response.status_code == 400
+
+
+class TestReadModel:
+    """Test the denormalized booking read model"""
+    
+    def _apply(self, event):
+        import asyncio
+        from unittest.mock import AsyncMock
+        from src.read_model import apply_event
+        
+        db = Mock(execute=AsyncMock())
+        asyncio.run(apply_event(db, event))
+        return db.execute.await_args_list
+    
+    def test_booking_and_payment_events_reproject_the_booking(self):
+        """Both re-derive the summary from the source tables"""
+        for event_type in ("booking.confirmed", "payment.succeeded"):
+            (call,) = self._apply({"event_type": event_type, "booking_id": "b1"})
+            assert "INSERT INTO booking_summaries" in str(call.args[0])
+            assert call.args[1] == {"booking_ids": ["b1"]}
+    
+    def test_flight_update_merges_status_and_delay(self):
+        """flight.updated patches every summary for the flight with one UPDATE"""
+        (call,) = self._apply({"flight_id": "f1", "status": "DELAYED", "delay_minutes": 45})
+        assert "UPDATE booking_summaries" in str(call.args[0])
+        assert call.args[1] == {"flight_id": "f1", "status": "DELAYED", "delay_minutes": 45}
+    
+    def test_reprojection_keeps_flight_delay(self):
+        """delay_minutes only arrives in flight events, so the upsert carries it over"""
+        from src.read_model import _PROJECT_SQL
+        assert "booking_summaries.flight -> 'delay_minutes'" in _PROJECT_SQL
+    
+    def test_unrelated_events_are_ignored(self):
+        assert self._apply({"event_type": "ticket.issued"}) == []
+
+
 class TestSagaOrchestration:
     """Test saga pattern for booking workflow"""
     
@@ -135,6 +412,73 @@ class TestSagaOrchestration:
         pass
 
 
+class TestCheckout:
+    """Test checkout saga entry"""
+    
+    def test_checkout_passes_booking_step_with_typed_passengers(self):
+        """Passenger dates must reach the BOOK step as dates, not strings"""
+        import asyncio
+        from datetime import date
+        from unittest.mock import AsyncMock, MagicMock
+        from src.saga import booking_saga
+        from src.services import BookingService
+        
+        started = {}
+        
+        async def start(request):
+            started["request"] = request
+            return {"saga_id": "s1", "user_id": request["user_id"], "status": "RUNNING", "step": "BOOK"}
+        
+        with patch.object(booking_saga, "start", side_effect=start):
+            response = client.post("/checkout", json={
+                "flight_id": "f0000000-0000-0000-0000-000000000001",
+                "user_id": "a0000000-0000-0000-0000-000000000001",
+                "passengers": [{"first_name": "Alice", "last_name": "Voyager", "date_of_birth": "1990-05-17"}],
+                "payment_method": {"type": "credit_card", "card_number": "4242424242424242"}
+            })
+        assert response.status_code == 202
+        request = started["request"]
+        assert isinstance(request["passengers"][0]["date_of_birth"], date)
+        assert request["payment_method"]["type"] == "credit_card"
+        
+        service = MagicMock()
+        service.create_booking = AsyncMock(return_value={"id": "b1", "total_amount": 100.0})
+        session = MagicMock()
+        session.__aenter__ = AsyncMock(return_value=MagicMock())
+        session.__aexit__ = AsyncMock(return_value=False)
+        with patch("src.saga.AsyncSessionLocal", return_value=session), \
+             patch("src.saga.BookingService", return_value=service), \
+             patch.object(booking_saga, "_save", new=AsyncMock()), \
+             patch.object(booking_saga, "_pay", new=AsyncMock(return_value="p1")) as pay, \
+             patch.object(booking_saga, "_ticket", new=AsyncMock()), \
+             patch.object(booking_saga, "compensate", new=AsyncMock()) as compensate:
+            asyncio.run(booking_saga.execute("s1", request))
+        
+        passengers = service.create_booking.call_args.kwargs["passengers"]
+        row = BookingService._passenger_row("b1", passengers[0])
+        assert row["date_of_birth"] == date(1990, 5, 17)
+        pay.assert_awaited_once()
+        compensate.assert_not_awaited()
+
+
+class TestPnr:
+    """Test PNR encoding"""
+    
+    def test_pnr_codes_are_unique_and_well_formed(self):
+        """Consecutive sequence numbers should give distinct 6-char codes"""
+        from src.pnr import encode_pnr, PNR_ALPHABET
+        codes = [encode_pnr(n) for n in range(50000)]
+        assert len(set(codes)) == len(codes)
+        assert all(len(c) == 6 and set(c) <= set(PNR_ALPHABET) for c in codes)
+    
+    def test_normalize_pnr_handles_misread_characters(self):
+        """Lowercase and O/I/L aliases should normalize; bad input is rejected"""
+        from src.pnr import normalize_pnr
+        assert normalize_pnr(" ab1o2l ") == "AB1021"
+        assert normalize_pnr("ABC") is None
+        assert normalize_pnr("ABCDEU") is None
+
+
 class TestMetrics:
     """Test Prometheus metrics"""
     
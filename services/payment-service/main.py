@@ -1,8 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
+import asyncio
 import logging
-from src.routes import payments
+from contextlib import asynccontextmanager
+from shared.idempotency import IdempotencyMiddleware, PostgresIdempotencyStore
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.routes import payments, reconciliation, refunds, invoices
+from src.workers.payment_jobs import payment_jobs
+from src.workers.reconciliation import run_reconciliation
+from src.workers.batch_refunds import run_refund_job_recovery
+from src.workers.emi_scheduler import run_emi_scheduler
+from src.workers.invoices import run_invoice_scheduler
 
 # Configure logging
 logging.basicConfig(
@@ -12,11 +22,33 @@ logging.basicConfig(
 
 logger = logging.getLogger("payment-service")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: Asynchronous payment workers, nightly reconciliation, refund job recovery, EMI scheduler, month-end invoices
+    workers = []
+    if settings.PAYMENT_ASYNC_ENABLED:
+        payment_jobs.start()
+    if settings.RECONCILIATION_ENABLED:
+        workers.append(asyncio.create_task(run_reconciliation()))
+    if settings.REFUND_JOB_RECOVERY_ENABLED:
+        workers.append(asyncio.create_task(run_refund_job_recovery()))
+    if settings.EMI_SCHEDULER_ENABLED:
+        workers.append(asyncio.create_task(run_emi_scheduler()))
+    if settings.INVOICE_SCHEDULER_ENABLED:
+        workers.append(asyncio.create_task(run_invoice_scheduler()))
+    yield
+    # Shutdown: Stop workers; unfinished jobs stay in the table and are requeued
+    await payment_jobs.stop()
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
 # Create FastAPI app
 app = FastAPI(
     title="JourneyIQ Payment Service",
     description="Payment processing with mock gateway and refund handling",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -28,6 +60,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Retried payments replay the original response instead of charging twice
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=PostgresIdempotencyStore(AsyncSessionLocal, ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+    scope="payment-service",
+    routes=[("POST", "/payments/"), ("POST", "/payments/async")]
+)
+
 # Prometheus metrics
 Instrumentator().instrument(app).expose(app)
 
@@ -47,9 +87,16 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "process_payment": "POST /payments",
+            "process_payment_async": "POST /payments/async",
+            "get_payment_status": "GET /payments/{id}/status?wait={seconds}",
             "get_payment": "GET /payments/{id}",
             "get_booking_payments": "GET /payments/booking/{booking_id}",
             "refund_payment": "POST /payments/{id}/refund",
+            "batch_refund": "POST /payments/refunds/batch",
+            "get_batch_refund": "GET /payments/refunds/batch/{job_id}",
+            "start_invoice_run": "POST /payments/invoices/runs",
+            "start_reconciliation": "POST /payments/reconciliation/runs",
+            "get_reconciliation_run": "GET /payments/reconciliation/runs/{run_id}",
             "health": "/health"
         }
     }
@@ -57,6 +104,9 @@ async def root():
 
 # Include routers (After static routes to avoid shadowing)
 # Include routers (After static routes to avoid shadowing)
+app.include_router(reconciliation.router, prefix="/payments")
+app.include_router(refunds.router, prefix="/payments")
+app.include_router(invoices.router, prefix="/payments")
 app.include_router(payments.router, prefix="/payments")
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+"""
+Client-side protection for payment gateway adapters.
+
+- CircuitBreaker: after N consecutive gateway errors, fail fast for a
+  cool-down period instead of queueing requests behind a dead upstream,
+  then let a single trial call through (half-open).
+- ResultCache: bounded LRU + TTL map of idempotency key -> outcome, so a
+  retried key is answered locally instead of reaching the gateway again.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from src.metrics import GATEWAY_CIRCUIT_STATE
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (not thread-safe; one event loop)."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may go to the gateway now."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._set_state(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot for a call that never reached the gateway."""
+        self._trial_in_flight = False
+
+    def _set_state(self, state: int) -> None:
+        self.state = state
+        GATEWAY_CIRCUIT_STATE.set(state)
+
+
+class ResultCache:
+    """Bounded LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -1,35 +1,168 @@
 import asyncio
 import random
+import time
 import uuid
 from typing import Dict, Any
 import logging
 
+from src.adapters.resilience import CircuitBreaker, ResultCache
+from src.config import settings
+from src.metrics import GATEWAY_CALL_LATENCY, GATEWAY_IN_FLIGHT, GATEWAY_REJECTED, GATEWAY_IDEMPOTENT_HITS
+
 logger = logging.getLogger("payment-adapter")
 
+
+class GatewayError(Exception):
+    """The gateway call failed (API error or timeout); counts against the circuit breaker."""
+
+
+class CardDeclinedError(GatewayError):
+    """The gateway answered and declined the charge. A business outcome, not a gateway fault."""
+
+
+class GatewayUnavailableError(GatewayError):
+    """The call was not attempted: circuit open or no concurrency slot in time. Safe to retry later."""
+
+
 class StripeAdapter:
     """
     Simulates a real Stripe SDK interaction.
     Includes network latency simulation and random failure injection for chaos testing.
+
+    Every call goes through the same guards a real client needs:
+    - Idempotency: outcomes (including declines) are cached per idempotency
+      key, and identical concurrent calls share one gateway request.
+    - Concurrency limit: at most STRIPE_MAX_CONCURRENCY calls in flight;
+      callers wait up to STRIPE_ACQUIRE_TIMEOUT_SECONDS for a slot.
+    - Circuit breaker: STRIPE_BREAKER_FAILURE_THRESHOLD consecutive API
+      errors fail calls fast for STRIPE_BREAKER_RESET_SECONDS.
+
+    Latency, decline rate (PAYMENT_SUCCESS_RATE) and API error rate are set
+    from config so the payment path can be load-tested locally.
     """
-    
+
     def __init__(self, api_key: str):
         self.api_key = api_key
+        self.latency_range = (settings.STRIPE_MOCK_LATENCY_MIN_SECONDS, settings.STRIPE_MOCK_LATENCY_MAX_SECONDS)
+        self.decline_rate = 1 - settings.PAYMENT_SUCCESS_RATE
+        self.error_rate = settings.STRIPE_MOCK_ERROR_RATE
+        self.call_timeout = settings.STRIPE_CALL_TIMEOUT_SECONDS
+        self.acquire_timeout = settings.STRIPE_ACQUIRE_TIMEOUT_SECONDS
+        self.breaker = CircuitBreaker(settings.STRIPE_BREAKER_FAILURE_THRESHOLD, settings.STRIPE_BREAKER_RESET_SECONDS)
+        self.results = ResultCache(settings.STRIPE_RESULT_CACHE_MAX_ENTRIES, settings.STRIPE_RESULT_CACHE_TTL_SECONDS)
+        self._slots = asyncio.Semaphore(settings.STRIPE_MAX_CONCURRENCY)
+        self._in_flight: Dict[str, asyncio.Future] = {}
 
     async def create_payment_intent(self, amount: float, currency: str, idempotency_key: str) -> Dict[str, Any]:
         """
-        Creates a payment intent.
-        Mocks network latency (100ms - 500ms).
+        Creates (and confirms) a payment intent.
+
+        Raises:
+            CardDeclinedError: Charge declined (cached for the key, like Stripe does)
+            GatewayUnavailableError: Not attempted; retry later
+            GatewayError: API error or timeout
+        """
+        return await self._idempotent(
+            idempotency_key, "create_payment_intent", self._create_payment_intent, amount, currency, idempotency_key
+        )
+
+    async def create_refund(self, payment_intent_id: str, amount: float, idempotency_key: str) -> Dict[str, Any]:
+        """
+        Refunds (part of) a payment intent.
+
+        Raises:
+            GatewayUnavailableError: Not attempted; retry later
+            GatewayError: API error or timeout
         """
+        return await self._idempotent(
+            idempotency_key, "create_refund", self._create_refund, payment_intent_id, amount, idempotency_key
+        )
+
+    async def _idempotent(self, idempotency_key: str, operation: str, fn, *args):
+        """Answer from the result cache, join an identical in-flight call, or make the call."""
+        cached = self.results.get(idempotency_key)
+        if cached is not None:
+            GATEWAY_IDEMPOTENT_HITS.inc()
+            return self._unwrap(cached)
+
+        pending = self._in_flight.get(idempotency_key)
+        if pending is not None:
+            GATEWAY_IDEMPOTENT_HITS.inc()
+            return self._unwrap(await asyncio.shield(pending))
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[idempotency_key] = future
+        try:
+            outcome = await self._call(operation, fn, *args)
+            if isinstance(outcome, (dict, CardDeclinedError)):
+                # Definitive answers are replayed for the key; transient errors are not
+                self.results.put(idempotency_key, outcome)
+            future.set_result(outcome)
+        except BaseException as e:
+            future.set_result(e if isinstance(e, Exception) else GatewayError("Gateway call cancelled"))
+            raise
+        finally:
+            del self._in_flight[idempotency_key]
+        return self._unwrap(outcome)
+
+    @staticmethod
+    def _unwrap(outcome):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def _call(self, operation: str, fn, *args):
+        """Run one gateway request under the breaker and limiter. Returns the result or a CardDeclinedError."""
+        if not self.breaker.allow():
+            GATEWAY_REJECTED.labels("circuit_open").inc()
+            raise GatewayUnavailableError("Payment gateway circuit open")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            GATEWAY_REJECTED.labels("saturated").inc()
+            self.breaker.release_trial()
+            raise GatewayUnavailableError("Payment gateway concurrency limit reached")
+
+        GATEWAY_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(fn(*args), self.call_timeout)
+            outcome = "succeeded"
+            self.breaker.record_success()
+            return result
+        except CardDeclinedError as e:
+            outcome = "declined"
+            self.breaker.record_success()
+            return e
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            self.breaker.record_failure()
+            raise GatewayError(f"Payment gateway timed out after {self.call_timeout}s")
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            GATEWAY_CALL_LATENCY.labels(operation, outcome).observe(time.perf_counter() - start)
+            GATEWAY_IN_FLIGHT.dec()
+            self._slots.release()
+
+    async def _create_payment_intent(self, amount: float, currency: str, idempotency_key: str) -> Dict[str, Any]:
+        """The simulated network call."""
         # Simulate network latency
-        latency = random.uniform(0.1, 0.5)
+        latency = random.uniform(*self.latency_range)
         await asyncio.sleep(latency)
-        
+
         logger.info(f"Stripe: Creating PaymentIntent amount={amount} {currency} key={idempotency_key}")
 
-        # Simulate Idempotency Check (Mock logic: if key ends in '9', it fails)
-        if idempotency_key.endswith("9"):
-            # Simulate a "declined" card or API error
-            raise Exception("Stripe API Error: Card Declined (Simulated)")
+        if random.random() < self.error_rate:
+            raise GatewayError("Stripe API Error: 503 Service Unavailable (Simulated)")
+        if random.random() < self.decline_rate:
+            # Simulate a "declined" card
+            raise CardDeclinedError("Stripe API Error: Card Declined (Simulated)")
 
         return {
             "id": f"pi_{uuid.uuid4()}",
@@ -39,4 +172,20 @@ class StripeAdapter:
             "client_secret": f"pi_{uuid.uuid4()}_secret_{uuid.uuid4()}"
         }
 
-stripe_client = StripeAdapter(api_key="sk_test_mock")
+    async def _create_refund(self, payment_intent_id: str, amount: float, idempotency_key: str) -> Dict[str, Any]:
+        """The simulated network call."""
+        await asyncio.sleep(random.uniform(*self.latency_range))
+
+        logger.info(f"Stripe: Creating Refund payment_intent={payment_intent_id} amount={amount} key={idempotency_key}")
+
+        if random.random() < self.error_rate:
+            raise GatewayError("Stripe API Error: 503 Service Unavailable (Simulated)")
+
+        return {
+            "id": f"re_{uuid.uuid4()}",
+            "payment_intent": payment_intent_id,
+            "amount": amount,
+            "status": "succeeded"
+        }
+
+stripe_client = StripeAdapter(api_key=settings.STRIPE_API_KEY)
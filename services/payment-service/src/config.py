@@ -11,5 +11,66 @@ class Settings(BaseSettings):
     
     # Payment gateway settings (mock)
     PAYMENT_SUCCESS_RATE: float = 0.95  # 95% success rate for mock payments
+    STRIPE_API_KEY: str = "sk_test_mock"
+    
+    # Gateway fault injection for local load tests (see src/adapters/stripe.py)
+    STRIPE_MOCK_LATENCY_MIN_SECONDS: float = 0.1
+    STRIPE_MOCK_LATENCY_MAX_SECONDS: float = 0.5
+    STRIPE_MOCK_ERROR_RATE: float = 0.0  # API errors (trip the circuit breaker), on top of card declines
+    
+    # Gateway client protection
+    STRIPE_MAX_CONCURRENCY: int = 50
+    STRIPE_ACQUIRE_TIMEOUT_SECONDS: float = 2.0
+    STRIPE_CALL_TIMEOUT_SECONDS: float = 10.0
+    STRIPE_BREAKER_FAILURE_THRESHOLD: int = 5
+    STRIPE_BREAKER_RESET_SECONDS: float = 30.0
+    STRIPE_RESULT_CACHE_MAX_ENTRIES: int = 10000
+    STRIPE_RESULT_CACHE_TTL_SECONDS: int = 86400
+    
+    # Idempotency-Key replay window for POST /payments/
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    
+    # Asynchronous payments (POST /payments/async)
+    PAYMENT_ASYNC_ENABLED: bool = True
+    PAYMENT_ASYNC_WORKERS: int = 16  # Max concurrent gateway calls per replica
+    PAYMENT_QUEUE_MAX_SIZE: int = 1000
+    PAYMENT_REQUEUE_INTERVAL_SECONDS: float = 5.0
+    PAYMENT_PROCESSING_TIMEOUT_SECONDS: int = 60
+    PAYMENT_LONG_POLL_MAX_SECONDS: float = 30.0
+    PAYMENT_LONG_POLL_INTERVAL_SECONDS: float = 1.0  # Re-check interval for jobs run by other replicas
+    
+    # Nightly payment/booking reconciliation
+    RECONCILIATION_ENABLED: bool = True
+    RECONCILIATION_HOUR_UTC: int = 2
+    RECONCILIATION_FETCH_SIZE: int = 5000  # Rows per server-side cursor fetch
+    RECONCILIATION_WRITE_BATCH: int = 1000  # Discrepancies per insert
+    
+    # Batch refunds (POST /payments/refunds/batch)
+    REFUND_BATCH_CONCURRENCY: int = 20  # Gateway refunds in flight per job
+    REFUND_BATCH_CHUNK_SIZE: int = 200  # Payments per set-based update / progress step
+    REFUND_BATCH_MAX_PAYMENT_IDS: int = 10000
+    REFUND_JOB_RECOVERY_ENABLED: bool = True
+    REFUND_JOB_RECOVERY_INTERVAL_SECONDS: int = 60
+    REFUND_JOB_STALE_SECONDS: int = 600  # PENDING/RUNNING jobs with no progress this long are resumed
+    
+    # EMI installment scheduler
+    EMI_SCHEDULER_ENABLED: bool = True
+    EMI_SCHEDULER_INTERVAL_SECONDS: int = 60
+    EMI_CLAIM_BATCH_SIZE: int = 100
+    EMI_MAX_BATCHES: int = 20  # Per tick
+    EMI_CHARGE_CONCURRENCY: int = 20
+    EMI_CLAIM_LEASE_SECONDS: int = 300  # Must comfortably exceed STRIPE_CALL_TIMEOUT_SECONDS
+    EMI_MAX_ATTEMPTS: int = 5
+    EMI_RETRY_BASE_SECONDS: int = 3600  # Doubles per failed attempt
+    EMI_RETRY_MAX_SECONDS: int = 259200
+    EMI_RETRY_UNAVAILABLE_SECONDS: int = 300  # Gateway circuit open / saturated
+    
+    # Month-end invoices
+    INVOICE_SCHEDULER_ENABLED: bool = True
+    INVOICE_RUN_HOUR_UTC: int = 3  # On the 1st, for the previous month
+    INVOICE_WORKERS: int = os.cpu_count() or 2  # Render processes
+    INVOICE_CHUNK_SIZE: int = 200  # Rows per cursor fetch / per worker task
+    INVOICE_STORAGE_DIR: str = "/tmp/journeyiq-invoices"  # Local object store stand-in
+    INVOICE_RUN_STALE_SECONDS: int = 900  # RUNNING runs without a recorded chunk this long are abandoned
 
 settings = Settings()
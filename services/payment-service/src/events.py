@@ -0,0 +1,81 @@
+import asyncio
+import json
+from google.cloud import pubsub_v1
+import os
+import logging
+from typing import Dict, Any, Optional
+from datetime import datetime
+
+logger = logging.getLogger("events")
+
+class EventProducer:
+    def __init__(self):
+        self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT", "journeyiq-local")
+        # In local dev there are usually no credentials; events are then only logged
+        self.client = None
+        try:
+            # Payment events are published with the booking as ordering key
+            self.client = pubsub_v1.PublisherClient(
+                publisher_options=pubsub_v1.types.PublisherOptions(enable_message_ordering=True)
+            )
+        except Exception as e:
+            logger.warning(f"PubSub client init failed (expected in local without creds): {e}")
+
+    async def publish(self, topic_id: str, data: Dict[str, Any], ordering_key: str = None) -> Optional[str]:
+        """Publish event to Pub/Sub topic. Failures are logged, never raised."""
+        if not self.client:
+            logger.info(f"[MOCK PUBLISH] Topic: {topic_id}, Data: {data}")
+            return "mock-msg-id"
+
+        topic_path = self.client.topic_path(self.project_id, topic_id)
+        data_str = json.dumps(data).encode("utf-8")
+        try:
+            if ordering_key:
+                future = self.client.publish(topic_path, data_str, ordering_key=ordering_key)
+            else:
+                future = self.client.publish(topic_path, data_str)
+            # Wait off the event loop: payment workers and batch refunds share it
+            message_id = await asyncio.wrap_future(future)
+        except Exception as e:
+            logger.warning(f"Failed to publish to {topic_id}: {e}")
+            if ordering_key:
+                # A failed publish pauses its ordering key until resumed
+                self.client.resume_publish(topic_path, ordering_key)
+            return None
+        logger.info(f"Published message {message_id} to {topic_id}")
+        return message_id
+
+producer = EventProducer()
+
+PAYMENT_TOPIC = "payment-events"
+
+# Payment event payloads
+def payment_succeeded_event(payment_id: str, booking_id: str, amount: float, currency: str, transaction_id: str) -> Dict[str, Any]:
+    return {
+        "event_type": "payment.succeeded",
+        "payment_id": payment_id,
+        "booking_id": booking_id,
+        "amount": amount,
+        "currency": currency,
+        "transaction_id": transaction_id,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def payment_failed_event(payment_id: str, booking_id: str, reason: str) -> Dict[str, Any]:
+    return {
+        "event_type": "payment.failed",
+        "payment_id": payment_id,
+        "booking_id": booking_id,
+        "reason": reason,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def payment_refunded_event(payment_id: str, booking_id: str, amount: float, reason: str = None) -> Dict[str, Any]:
+    return {
+        "event_type": "payment.refunded",
+        "payment_id": payment_id,
+        "booking_id": booking_id,
+        "amount": amount,
+        "reason": reason,
+        "timestamp": datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,114 @@
+"""
+Invoice PDF rendering, run inside ProcessPoolExecutor workers.
+
+reportlab is pure-Python and CPU-bound, so rendering on the event loop
+(or in threads) would serialize on the GIL. Workers receive a chunk of
+plain dicts, render and write each PDF to the storage directory
+themselves (so PDF bytes never cross the process boundary), and return
+only file keys and timing.
+
+This module must stay importable without the app: no database, config
+or FastAPI imports, since every worker process imports it on start-up.
+"""
+import io
+import os
+import time
+from typing import Dict, List
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+PRIMARY_COLOR = (0.1, 0.4, 0.8)  # JourneyIQ Blue
+TEXT_COLOR = (0.2, 0.2, 0.2)
+
+
+def render_invoice(invoice: Dict) -> bytes:
+    """Render one invoice as PDF bytes."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    width, height = A4
+
+    # Header strip
+    c.setFillColorRGB(*PRIMARY_COLOR)
+    c.rect(0, height - 30*mm, width, 30*mm, fill=1, stroke=0)
+    c.setFillColorRGB(1, 1, 1)
+    c.setFont("Helvetica-Bold", 22)
+    c.drawString(20*mm, height - 19*mm, "JourneyIQ")
+    c.setFont("Helvetica", 12)
+    c.drawRightString(width - 20*mm, height - 19*mm, "TAX INVOICE")
+
+    # Invoice details
+    c.setFillColorRGB(*TEXT_COLOR)
+    y = height - 45*mm
+    for label, value in (
+        ("Invoice number", invoice["invoice_number"]),
+        ("Invoice date", invoice["invoice_date"]),
+        ("Billing period", invoice["period"]),
+        ("Customer", invoice["user_id"]),
+        ("Booking", invoice["booking_id"]),
+        ("Payment reference", invoice.get("transaction_id") or invoice["payment_id"]),
+    ):
+        c.setFont("Helvetica", 9)
+        c.drawString(20*mm, y, label.upper())
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(65*mm, y, str(value))
+        y -= 7*mm
+
+    # Line items
+    y -= 8*mm
+    c.setStrokeColorRGB(*PRIMARY_COLOR)
+    c.line(20*mm, y + 4*mm, width - 20*mm, y + 4*mm)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(20*mm, y, "DESCRIPTION")
+    c.drawRightString(width - 20*mm, y, "AMOUNT")
+    y -= 8*mm
+    c.setFont("Helvetica", 10)
+    c.drawString(20*mm, y, f"{invoice['resource_type'].title()} booking {invoice['resource_id']}")
+    c.drawRightString(width - 20*mm, y, f"{invoice['amount']:.2f} {invoice['currency']}")
+    y -= 6*mm
+    c.line(20*mm, y, width - 20*mm, y)
+    y -= 8*mm
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(20*mm, y, "TOTAL PAID")
+    c.drawRightString(width - 20*mm, y, f"{invoice['amount']:.2f} {invoice['currency']}")
+
+    # Footer
+    c.setFont("Helvetica", 8)
+    c.drawString(20*mm, 15*mm, "JourneyIQ - This invoice was generated electronically and is valid without signature.")
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def render_chunk(invoices: List[Dict], storage_dir: str) -> Dict:
+    """
+    Render and store a chunk of invoices (worker entry point).
+
+    Files are written to `{storage_dir}/{key}` via a temp file + rename,
+    so a crashed worker never leaves a truncated PDF behind.
+
+    Returns:
+        {"pid", "keys", "bytes", "seconds"} for throughput reporting
+    """
+    start = time.perf_counter()
+    keys = []
+    total_bytes = 0
+    for invoice in invoices:
+        pdf = render_invoice(invoice)
+        key = invoice["key"]
+        path = os.path.join(storage_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        keys.append(key)
+        total_bytes += len(pdf)
+    return {
+        "pid": os.getpid(),
+        "keys": keys,
+        "bytes": total_bytes,
+        "seconds": time.perf_counter() - start
+    }
@@ -0,0 +1,106 @@
+"""
+Custom Prometheus metrics for payment-service.
+
+HTTP request metrics come from prometheus-fastapi-instrumentator; these
+cover the asynchronous payment pipeline, the gateway adapter and the
+background jobs (reconciliation, batch refunds, EMI scheduler, invoices).
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+PAYMENT_QUEUE_DEPTH = Gauge(
+    "payment_job_queue_depth",
+    "Payment jobs waiting in this replica's in-process queue"
+)
+
+PAYMENT_JOBS_PROCESSED = Counter(
+    "payment_jobs_processed_total",
+    "Asynchronous payment jobs by outcome",
+    ["result"]  # succeeded, failed, refunded, refund_pending, deferred, skipped
+)
+
+PAYMENT_JOB_LATENCY = Histogram(
+    "payment_job_seconds",
+    "Time from claiming a payment job to its final status",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+GATEWAY_CALL_LATENCY = Histogram(
+    "payment_gateway_call_seconds",
+    "Latency of payment gateway calls",
+    ["operation", "outcome"],  # outcome: succeeded, declined, error, timeout
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+GATEWAY_IN_FLIGHT = Gauge(
+    "payment_gateway_in_flight",
+    "Gateway calls currently holding a concurrency slot"
+)
+
+GATEWAY_REJECTED = Counter(
+    "payment_gateway_rejected_total",
+    "Gateway calls rejected before reaching the gateway",
+    ["reason"]  # circuit_open, saturated
+)
+
+GATEWAY_IDEMPOTENT_HITS = Counter(
+    "payment_gateway_idempotent_hits_total",
+    "Gateway calls answered from the idempotency result cache (or joined an identical in-flight call)"
+)
+
+GATEWAY_CIRCUIT_STATE = Gauge(
+    "payment_gateway_circuit_state",
+    "Gateway circuit breaker state (0 closed, 1 half-open, 2 open)"
+)
+
+RECONCILIATION_ROWS = Counter(
+    "payment_reconciliation_rows_total",
+    "Rows streamed by reconciliation runs",
+    ["table"]  # bookings, payments
+)
+
+RECONCILIATION_DISCREPANCIES = Counter(
+    "payment_reconciliation_discrepancies_total",
+    "Discrepancies found by reconciliation runs",
+    ["kind"]
+)
+
+RECONCILIATION_DURATION = Histogram(
+    "payment_reconciliation_run_seconds",
+    "Duration of a full reconciliation run",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+)
+
+REFUNDS_PROCESSED = Counter(
+    "payment_batch_refunds_total",
+    "Payments processed by batch refund jobs",
+    ["result"]  # refunded, failed, skipped
+)
+
+REFUND_JOB_DURATION = Histogram(
+    "payment_batch_refund_job_seconds",
+    "Duration of a batch refund job",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+EMI_CHARGES = Counter(
+    "payment_emi_charges_total",
+    "EMI installment charge outcomes",
+    ["result"]  # paid, retry, failed, deferred
+)
+
+EMI_BATCH_LATENCY = Histogram(
+    "payment_emi_batch_seconds",
+    "Duration of one EMI batch (claim, charge, record)",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+INVOICES_RENDERED = Counter(
+    "payment_invoices_rendered_total",
+    "Invoice PDFs rendered and stored"
+)
+
+INVOICE_CHUNK_LATENCY = Histogram(
+    "payment_invoice_chunk_seconds",
+    "Worker time to render and store one chunk of invoices",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
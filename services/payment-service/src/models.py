@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, TIMESTAMP, DECIMAL
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, TIMESTAMP, DECIMAL, Integer, BigInteger, Text, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -11,7 +11,12 @@ class Payment(Base):
     booking_id = Column(UUID(as_uuid=True), nullable=False)
     amount = Column(DECIMAL(10, 2), nullable=False)
     currency = Column(String(3), nullable=False)
-    status = Column(String(20), nullable=False)  # SUCCEEDED, FAILED, REFUNDED
+    status = Column(String(20), nullable=False)  # PENDING, PROCESSING (async mode), SUCCEEDED, FAILED, REFUNDED
+    version = Column(Integer, nullable=False, default=0)  # Bumped on every status change, see shared/transitions
+    transaction_id = Column(String(100))  # Gateway reference
+    error = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -21,4 +26,71 @@ class Booking(Base):
     resource_type = Column(String(20), nullable=False)
     resource_id = Column(UUID(as_uuid=True), nullable=False)
     status = Column(String(20), nullable=False)
+    version = Column(Integer, nullable=False, default=0)
     created_at = Column(TIMESTAMP(timezone=True))
+
+class ReconciliationRun(Base):
+    __tablename__ = "payment_reconciliation_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    status = Column(String(20), nullable=False)  # RUNNING, COMPLETED, FAILED, SKIPPED
+    started_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True))
+    bookings_scanned = Column(BigInteger, default=0)
+    payments_scanned = Column(BigInteger, default=0)
+    discrepancies = Column(BigInteger, default=0)
+    error = Column(Text)
+
+class ReconciliationDiscrepancy(Base):
+    __tablename__ = "payment_reconciliation_discrepancies"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    run_id = Column(UUID(as_uuid=True), nullable=False)
+    kind = Column(String(40), nullable=False)  # See src/workers/reconciliation.py
+    booking_id = Column(UUID(as_uuid=True))
+    payment_id = Column(UUID(as_uuid=True))
+    booking_status = Column(String(20))
+    payment_status = Column(String(20))
+    amount = Column(DECIMAL(10, 2))
+    detected_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class RefundJob(Base):
+    __tablename__ = "payment_refund_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    status = Column(String(30), nullable=False)  # PENDING, RUNNING, COMPLETED, COMPLETED_WITH_ERRORS, FAILED
+    flight_id = Column(UUID(as_uuid=True))
+    payment_ids = Column(JSONB)
+    reason = Column(Text)
+    total = Column(Integer, default=0)
+    refunded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)  # Refunded at the gateway but changed concurrently in the DB
+    error = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())  # Last progress; stale jobs are resumed
+    finished_at = Column(TIMESTAMP(timezone=True))
+
+class Invoice(Base):
+    __tablename__ = "invoices"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    payment_id = Column(UUID(as_uuid=True))
+    invoice_number = Column(String(50), unique=True)
+    pdf_url = Column(String(500))
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class InvoiceRun(Base):
+    __tablename__ = "invoice_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    period = Column(String(7), nullable=False)  # YYYY-MM
+    status = Column(String(20), nullable=False)  # RUNNING, COMPLETED, FAILED
+    invoices = Column(Integer, default=0)
+    bytes = Column(BigInteger, default=0)
+    seconds = Column(DECIMAL(10, 3))
+    worker_stats = Column(JSONB)  # pid -> {invoices, bytes, seconds, invoices_per_second}
+    error = Column(Text)
+    started_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    heartbeat_at = Column(TIMESTAMP(timezone=True), server_default=func.now())  # Refreshed per recorded chunk
+    finished_at = Column(TIMESTAMP(timezone=True))
@@ -0,0 +1,63 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime, timezone
+from src.database import get_db
+from src.models import InvoiceRun
+from src.workers.invoices import start_run, generate, previous_period
+
+router = APIRouter(tags=["invoices"])
+
+# Keep references so background runs aren't garbage collected mid-flight
+_runs = set()
+
+def _run_done(task: asyncio.Task) -> None:
+    _runs.discard(task)
+    if not task.cancelled():
+        task.exception()  # Already logged and recorded on the run row
+
+# Request Models
+class InvoiceRunRequest(BaseModel):
+    period: Optional[str] = None  # YYYY-MM, defaults to the previous month
+
+@router.post("/invoices/runs", status_code=202)
+async def start_invoice_run(request: InvoiceRunRequest):
+    """Generate missing invoices for a billing period now (admin endpoint)."""
+    period = request.period or previous_period(datetime.now(timezone.utc))
+    try:
+        run_id = await start_run(period)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="period must be YYYY-MM")
+    task = asyncio.create_task(generate(run_id, period))
+    _runs.add(task)
+    task.add_done_callback(_run_done)
+    return {"run_id": run_id, "period": period, "status": "RUNNING", "status_url": f"/payments/invoices/runs/{run_id}"}
+
+@router.get("/invoices/runs/{run_id}")
+async def get_invoice_run(
+    run_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Invoice run status and per-worker throughput."""
+    run = (await db.execute(
+        select(InvoiceRun).where(InvoiceRun.id == run_id)
+    )).scalar_one_or_none()
+    
+    if not run:
+        raise HTTPException(status_code=404, detail="Invoice run not found")
+    
+    return {
+        "run_id": str(run.id),
+        "period": run.period,
+        "status": run.status,
+        "invoices": run.invoices,
+        "bytes": run.bytes,
+        "seconds": float(run.seconds) if run.seconds is not None else None,
+        "workers": run.worker_stats or {},
+        "error": run.error,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None
+    }
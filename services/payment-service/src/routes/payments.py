@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import Optional
 from pydantic import BaseModel
 from datetime import datetime
 from uuid import uuid4
-import random
-from src.database import get_db
+from src.database import get_db, AsyncSessionLocal
 from src.models import Payment, Booking
 from src.config import settings
+from src.adapters.stripe import stripe_client, GatewayError, GatewayUnavailableError, CardDeclinedError
+from src.events import PAYMENT_TOPIC, payment_failed_event, payment_refunded_event, payment_succeeded_event, producer
+from src.workers.payment_jobs import payment_jobs, refund_lost_race, ACTIVE_STATUSES
+from shared.transitions import (
+    RowNotFoundError,
+    InvalidTransitionError,
+    VersionConflictError,
+    transition_status,
+    retry_on_conflict,
+)
 
 router = APIRouter(tags=["payments"])
 
@@ -36,16 +46,27 @@ class PaymentResponse(BaseModel):
     currency: str
     processed_at: datetime
 
+class AsyncPaymentResponse(BaseModel):
+    payment_id: str
+    booking_id: str
+    status: str
+    status_url: str
+
 @router.post("/", response_model=PaymentResponse, status_code=201)
 async def process_payment(
     payment_request: PaymentRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Process a payment for a booking.
-    - Mock payment gateway (95% success rate)
+    - Charges through StripeAdapter (mock gateway, see src/adapters/stripe.py)
     - Updates booking status to CONFIRMED on success
-    - Generates transaction ID
+    - 402 on decline, 502 on gateway error, 503 if the gateway is shedding load
+    
+    The booking is confirmed with a conditional PENDING -> CONFIRMED update
+    in the same transaction as the payment row, so a booking cancelled or
+    expired while the charge was in flight is never flipped back.
     """
     # Verify booking exists
     booking_result = await db.execute(
@@ -62,54 +83,179 @@ async def process_payment(
     if booking.status == "CONFIRMED":
         raise HTTPException(status_code=400, detail="Booking already paid")
     
-    # Mock payment processing
-    payment_id = str(uuid4())
-    transaction_id = f"TXN{random.randint(100000, 999999)}"
+    # Release the pooled connection while the gateway call is in flight
+    await db.rollback()
     
-    # Simulate payment gateway (95% success rate)
-    success = random.random() < settings.PAYMENT_SUCCESS_RATE
+    payment_id = str(uuid4())
+    # Client retries with the same Idempotency-Key reuse the gateway outcome
+    gateway_key = f"{payment_request.booking_id}:{idempotency_key}" if idempotency_key else payment_id
     
-    if success:
-        # Create payment record
+    try:
+        intent = await stripe_client.create_payment_intent(
+            payment_request.amount, payment_request.currency, idempotency_key=gateway_key
+        )
+    except GatewayUnavailableError as e:
+        # Never attempted: nothing to record
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except GatewayError as e:
+        # Payment failed (declined or gateway error)
         new_payment = Payment(
             id=payment_id,
             booking_id=payment_request.booking_id,
             amount=payment_request.amount,
             currency=payment_request.currency,
-            status="SUCCEEDED"
+            status="FAILED",
+            error=str(e)
         )
         db.add(new_payment)
-        
-        # Update booking status
-        booking.status = "CONFIRMED"
-        
         await db.commit()
         
-        return PaymentResponse(
-            payment_id=payment_id,
-            booking_id=payment_request.booking_id,
-            status="SUCCEEDED",
-            transaction_id=transaction_id,
-            amount=payment_request.amount,
-            currency=payment_request.currency,
-            processed_at=datetime.utcnow()
-        )
-    else:
-        # Payment failed
-        new_payment = Payment(
+        if isinstance(e, CardDeclinedError):
+            raise HTTPException(
+                status_code=402,
+                detail="Payment failed. Please try again or use a different payment method."
+            )
+        raise HTTPException(status_code=502, detail=f"Payment gateway error: {e}")
+    
+    # Create payment record
+    new_payment = Payment(
+        id=payment_id,
+        booking_id=payment_request.booking_id,
+        amount=payment_request.amount,
+        currency=payment_request.currency,
+        status="SUCCEEDED",
+        transaction_id=intent["id"]
+    )
+    db.add(new_payment)
+    
+    # Update booking status
+    try:
+        await transition_status(db, Booking, payment_request.booking_id, "CONFIRMED", ["PENDING"])
+    except (RowNotFoundError, InvalidTransitionError) as e:
+        # Lost the race against a cancellation: refund the charge at the gateway
+        await db.rollback()
+        status, error = await refund_lost_race(payment_id, intent["id"], payment_request.amount, str(e))
+        db.add(Payment(
             id=payment_id,
             booking_id=payment_request.booking_id,
             amount=payment_request.amount,
             currency=payment_request.currency,
-            status="FAILED"
-        )
-        db.add(new_payment)
+            status=status,
+            transaction_id=intent["id"],
+            error=error
+        ))
         await db.commit()
-        
-        raise HTTPException(
-            status_code=402,
-            detail="Payment failed. Please try again or use a different payment method."
+        await producer.publish(
+            PAYMENT_TOPIC,
+            payment_failed_event(payment_id, payment_request.booking_id, error),
+            ordering_key=payment_request.booking_id
         )
+        if status == "REFUNDED":
+            raise HTTPException(status_code=409, detail=f"Booking changed during payment, charge refunded: {e}")
+        raise HTTPException(status_code=409, detail=f"Booking changed during payment, refund pending: {e}")
+    
+    await db.commit()
+    # Booking status changed here; the booking read model follows payment events
+    await producer.publish(
+        PAYMENT_TOPIC,
+        payment_succeeded_event(
+            payment_id, payment_request.booking_id, payment_request.amount, payment_request.currency, intent["id"]
+        ),
+        ordering_key=payment_request.booking_id
+    )
+    
+    return PaymentResponse(
+        payment_id=payment_id,
+        booking_id=payment_request.booking_id,
+        status="SUCCEEDED",
+        transaction_id=intent["id"],
+        amount=payment_request.amount,
+        currency=payment_request.currency,
+        processed_at=datetime.utcnow()
+    )
+
+@router.post("/async", response_model=AsyncPaymentResponse, status_code=202)
+async def process_payment_async(
+    payment_request: PaymentRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Accept a payment for background processing.
+    - Records a PENDING payment and returns 202 immediately
+    - A bounded worker pool charges the gateway and confirms the booking
+    - Poll (or long-poll with ?wait=) GET /payments/{id}/status for the result;
+      payment.succeeded / payment.failed events are published as well
+    """
+    booking_result = await db.execute(
+        select(Booking).where(Booking.id == payment_request.booking_id)
+    )
+    booking = booking_result.scalar_one_or_none()
+    
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    
+    if booking.status == "CANCELLED":
+        raise HTTPException(status_code=400, detail="Cannot pay for cancelled booking")
+    
+    if booking.status == "CONFIRMED":
+        raise HTTPException(status_code=400, detail="Booking already paid")
+    
+    payment_id = str(uuid4())
+    db.add(Payment(
+        id=payment_id,
+        booking_id=payment_request.booking_id,
+        amount=payment_request.amount,
+        currency=payment_request.currency,
+        status="PENDING"
+    ))
+    await db.commit()
+    payment_jobs.submit(payment_id)
+    
+    return AsyncPaymentResponse(
+        payment_id=payment_id,
+        booking_id=payment_request.booking_id,
+        status="PENDING",
+        status_url=f"/payments/{payment_id}/status"
+    )
+
+@router.get("/{payment_id}/status")
+async def get_payment_status(
+    payment_id: str,
+    wait: float = 0
+):
+    """
+    Status of a (usually asynchronous) payment.
+    
+    With `wait` > 0 the request long-polls: it returns as soon as the payment
+    leaves PENDING/PROCESSING, or after `wait` seconds (capped at
+    PAYMENT_LONG_POLL_MAX_SECONDS). No DB connection is held while waiting.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(wait, 0), settings.PAYMENT_LONG_POLL_MAX_SECONDS)
+    while True:
+        async with AsyncSessionLocal() as db:
+            payment = (await db.execute(
+                select(Payment).where(Payment.id == payment_id)
+            )).scalar_one_or_none()
+        
+        if not payment:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        
+        remaining = deadline - loop.time()
+        if payment.status not in ACTIVE_STATUSES or remaining <= 0:
+            break
+        await payment_jobs.wait_for_update(payment_id, min(remaining, settings.PAYMENT_LONG_POLL_INTERVAL_SECONDS))
+    
+    return {
+        "payment_id": str(payment.id),
+        "booking_id": str(payment.booking_id),
+        "status": payment.status,
+        "transaction_id": payment.transaction_id,
+        "error": payment.error,
+        "amount": float(payment.amount),
+        "currency": payment.currency,
+        "updated_at": payment.updated_at.isoformat() if payment.updated_at else None
+    }
 
 @router.get("/{payment_id}")
 async def get_payment(
@@ -167,6 +313,7 @@ async def refund_payment(
     """
     Process a refund for a payment.
     - Full or partial refund
+    - Refunds the charge at the gateway (idempotent per payment)
     - Updates payment status to REFUNDED
     - Updates booking status to CANCELLED
     """
@@ -187,24 +334,68 @@ async def refund_payment(
     if refund_amount > float(payment.amount):
         raise HTTPException(status_code=400, detail="Refund amount exceeds payment amount")
     
-    # Update payment status
-    payment.status = "REFUNDED"
+    # Rollback expires the row, so keep what the rest of the refund needs
+    booking_id, currency = payment.booking_id, payment.currency
+    charge_id = payment.transaction_id or str(payment.id)
+    version = payment.version
     
-    # Update booking status
-    booking_result = await db.execute(
-        select(Booking).where(Booking.id == payment.booking_id)
-    )
-    booking = booking_result.scalar_one_or_none()
-    if booking:
-        booking.status = "CANCELLED"
+    # Release the pooled connection while the gateway call is in flight
+    await db.rollback()
     
-    await db.commit()
+    try:
+        # Same key as batch and lost-race refunds, so a payment is refunded once
+        await stripe_client.create_refund(charge_id, refund_amount, idempotency_key=f"refund-{payment_id}")
+    except GatewayUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except GatewayError as e:
+        raise HTTPException(status_code=502, detail=f"Payment gateway error: {e}")
+    
+    async def refund():
+        nonlocal version
+        if version is None:
+            # Retry after a conflict: re-read the payment and re-check the refund still fits it
+            current = (await db.execute(
+                select(Payment.amount, Payment.version).where(Payment.id == payment_id)
+            )).first()
+            if current is None or refund_amount > float(current.amount):
+                raise HTTPException(status_code=409, detail="Payment changed during refund")
+            version = current.version
+        
+        # Update payment status, only if unchanged since it was read; a concurrent
+        # refund of the same payment reused the gateway refund
+        try:
+            await transition_status(db, Payment, payment_id, "REFUNDED", ["SUCCEEDED"], expected_version=version)
+        except InvalidTransitionError as e:
+            if e.current_status != "REFUNDED":
+                raise HTTPException(status_code=409, detail=f"Payment changed during refund: {e}")
+        except VersionConflictError:
+            version = None
+            raise
+        
+        # Update booking status
+        try:
+            await transition_status(db, Booking, booking_id, "CANCELLED", ["PENDING", "CONFIRMED"])
+        except (RowNotFoundError, InvalidTransitionError):
+            pass  # Already cancelled (or not a local booking)
+        
+        await db.commit()
+        return refund_amount, currency, str(booking_id)
+    
+    try:
+        refund_amount, currency, booking_id = await retry_on_conflict(refund, name="refund_payment", rollback=db)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=f"Payment changed during refund: {e}")
+    await producer.publish(
+        PAYMENT_TOPIC,
+        payment_refunded_event(payment_id, booking_id, refund_amount),
+        ordering_key=booking_id
+    )
     
     return {
         "message": "Refund processed successfully",
         "payment_id": payment_id,
         "refund_amount": refund_amount,
-        "currency": payment.currency,
+        "currency": currency,
         "status": "REFUNDED"
     }
 
@@ -0,0 +1,97 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from typing import Optional
+from src.database import get_db
+from src.models import ReconciliationRun, ReconciliationDiscrepancy
+from src.workers.reconciliation import start_run, reconcile
+
+router = APIRouter(tags=["reconciliation"])
+
+# Keep references so background runs aren't garbage collected mid-flight
+_runs = set()
+
+def _run_done(task: asyncio.Task) -> None:
+    _runs.discard(task)
+    if not task.cancelled():
+        task.exception()  # Already logged and recorded on the run row
+
+def _serialize_run(run: ReconciliationRun) -> dict:
+    return {
+        "run_id": str(run.id),
+        "status": run.status,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "bookings_scanned": run.bookings_scanned,
+        "payments_scanned": run.payments_scanned,
+        "discrepancies": run.discrepancies,
+        "error": run.error
+    }
+
+@router.post("/reconciliation/runs", status_code=202)
+async def start_reconciliation():
+    """Start a reconciliation run now (admin endpoint). Poll the run for progress."""
+    run_id = await start_run()
+    task = asyncio.create_task(reconcile(run_id))
+    _runs.add(task)
+    task.add_done_callback(_run_done)
+    return {"run_id": run_id, "status": "RUNNING", "status_url": f"/payments/reconciliation/runs/{run_id}"}
+
+@router.get("/reconciliation/runs/{run_id}")
+async def get_reconciliation_run(
+    run_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Run progress and discrepancy counts by kind."""
+    run = (await db.execute(
+        select(ReconciliationRun).where(ReconciliationRun.id == run_id)
+    )).scalar_one_or_none()
+    
+    if not run:
+        raise HTTPException(status_code=404, detail="Reconciliation run not found")
+    
+    by_kind = (await db.execute(
+        select(ReconciliationDiscrepancy.kind, func.count())
+        .where(ReconciliationDiscrepancy.run_id == run_id)
+        .group_by(ReconciliationDiscrepancy.kind)
+    )).all()
+    
+    return {**_serialize_run(run), "by_kind": {kind: count for kind, count in by_kind}}
+
+@router.get("/reconciliation/runs/{run_id}/discrepancies")
+async def list_discrepancies(
+    run_id: str,
+    kind: Optional[str] = None,
+    after_id: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    """Discrepancies for a run, keyset-paginated by `after_id`."""
+    query = (
+        select(ReconciliationDiscrepancy)
+        .where(ReconciliationDiscrepancy.run_id == run_id)
+        .where(ReconciliationDiscrepancy.id > after_id)
+        .order_by(ReconciliationDiscrepancy.id)
+        .limit(min(limit, 1000))
+    )
+    if kind:
+        query = query.where(ReconciliationDiscrepancy.kind == kind)
+    rows = (await db.execute(query)).scalars().all()
+    
+    return {
+        "run_id": run_id,
+        "discrepancies": [
+            {
+                "id": d.id,
+                "kind": d.kind,
+                "booking_id": str(d.booking_id) if d.booking_id else None,
+                "payment_id": str(d.payment_id) if d.payment_id else None,
+                "booking_status": d.booking_status,
+                "payment_status": d.payment_status,
+                "amount": float(d.amount) if d.amount is not None else None
+            }
+            for d in rows
+        ],
+        "next_after_id": rows[-1].id if rows else None
+    }
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+from src.config import settings
+from src.database import get_db
+from src.models import RefundJob
+from src.workers.batch_refunds import create_job, start_job
+
+router = APIRouter(tags=["refunds"])
+
+# Request Models
+class BatchRefundRequest(BaseModel):
+    flight_id: Optional[UUID] = None
+    payment_ids: Optional[List[UUID]] = None
+    reason: Optional[str] = None
+
+@router.post("/refunds/batch", status_code=202)
+async def start_batch_refund(request: BatchRefundRequest):
+    """
+    Refund every SUCCEEDED payment on a flight, or a list of payments.
+    - Runs in the background; poll GET /payments/refunds/batch/{job_id}
+    - Safe to repeat: already refunded payments are not eligible, and gateway
+      refunds are idempotent per payment
+    """
+    if not request.flight_id and not request.payment_ids:
+        raise HTTPException(status_code=400, detail="flight_id or payment_ids is required")
+    if request.payment_ids and len(request.payment_ids) > settings.REFUND_BATCH_MAX_PAYMENT_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.REFUND_BATCH_MAX_PAYMENT_IDS} payment ids per job")
+    
+    job_id = await create_job(
+        flight_id=str(request.flight_id) if request.flight_id else None,
+        payment_ids=[str(p) for p in request.payment_ids] if request.payment_ids else None,
+        reason=request.reason
+    )
+    start_job(job_id)
+    
+    return {"job_id": job_id, "status": "PENDING", "status_url": f"/payments/refunds/batch/{job_id}"}
+
+@router.get("/refunds/batch/{job_id}")
+async def get_batch_refund(
+    job_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Batch refund job progress."""
+    job = (await db.execute(
+        select(RefundJob).where(RefundJob.id == job_id)
+    )).scalar_one_or_none()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Refund job not found")
+    
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "flight_id": str(job.flight_id) if job.flight_id else None,
+        "total": job.total,
+        "refunded": job.refunded,
+        "failed": job.failed,
+        "skipped": job.skipped,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
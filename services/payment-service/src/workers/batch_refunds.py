@@ -0,0 +1,216 @@
+"""
+Batch refunds for mass cancellations.
+
+When a flight is cancelled every booking on it has to be refunded. A
+batch refund job (by flight id or an explicit list of payment ids):
+
+1. Selects every eligible SUCCEEDED payment in one query.
+2. Issues gateway refunds concurrently, at most REFUND_BATCH_CONCURRENCY
+   at a time. Refund idempotency keys are derived from the payment id, so
+   re-running a job never refunds twice.
+3. Per chunk of REFUND_BATCH_CHUNK_SIZE payments, marks refunded payments
+   REFUNDED and their bookings CANCELLED with one set-based UPDATE each
+   (conditional on status, so rows changed concurrently are skipped), and
+   publishes progress on the `payment_refund_jobs` row.
+
+Jobs run as in-process tasks. A job whose replica died stays PENDING or
+RUNNING with no progress; the recovery loop claims jobs idle for
+REFUND_JOB_STALE_SECONDS and resumes them. Resuming only picks up the
+payments still SUCCEEDED, and the per-payment idempotency keys make any
+overlap with a slow original run harmless.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import func, select, text, update
+
+from src.adapters.stripe import stripe_client
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.events import PAYMENT_TOPIC, payment_refunded_event, producer
+from src.metrics import REFUND_JOB_DURATION, REFUNDS_PROCESSED
+from src.models import Booking, Payment, RefundJob
+
+logger = logging.getLogger(__name__)
+
+# Keep references so background jobs aren't garbage collected mid-flight
+_tasks = set()
+
+_CLAIM_STALE_SQL = text("""
+    UPDATE payment_refund_jobs SET updated_at = now()
+    WHERE id IN (
+        SELECT id FROM payment_refund_jobs
+        WHERE status IN ('PENDING', 'RUNNING') AND updated_at < now() - make_interval(secs => :stale)
+        ORDER BY created_at
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id
+""")
+
+
+async def create_job(flight_id: Optional[str] = None, payment_ids: Optional[List[str]] = None, reason: Optional[str] = None) -> str:
+    """Record a new PENDING job and return its id."""
+    job_id = str(uuid4())
+    async with AsyncSessionLocal() as db:
+        db.add(RefundJob(
+            id=job_id,
+            status="PENDING",
+            flight_id=flight_id,
+            payment_ids=payment_ids,
+            reason=reason
+        ))
+        await db.commit()
+    return job_id
+
+
+async def _eligible_payments(db, flight_id: Optional[str], payment_ids: Optional[List[str]]) -> List:
+    query = select(
+        Payment.id, Payment.booking_id, Payment.amount, Payment.currency, Payment.transaction_id
+    ).where(Payment.status == "SUCCEEDED")
+    if flight_id:
+        query = query.join(Booking, Booking.id == Payment.booking_id).where(
+            Booking.resource_type == "FLIGHT", Booking.resource_id == flight_id
+        )
+    if payment_ids:
+        query = query.where(Payment.id.in_(payment_ids))
+    return (await db.execute(query.order_by(Payment.id))).all()
+
+
+def _task_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if not task.cancelled():
+        task.exception()  # Already logged and recorded on the job row
+
+
+def start_job(job_id: str) -> asyncio.Task:
+    """Run a job in the background on this replica."""
+    task = asyncio.create_task(run_job(job_id))
+    _tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task
+
+
+async def run_job(job_id: str) -> Dict[str, int]:
+    """Execute (or resume) a refund job. Returns its counters."""
+    start = time.perf_counter()
+    counts = {"total": 0, "refunded": 0, "failed": 0, "skipped": 0}
+    before = dict(counts)
+    try:
+        async with AsyncSessionLocal() as db:
+            job = (await db.execute(select(RefundJob).where(RefundJob.id == job_id))).scalar_one()
+            payments = await _eligible_payments(db, job.flight_id, job.payment_ids)
+            # A resumed job keeps what earlier runs applied; failures are retried
+            counts["refunded"], counts["skipped"] = job.refunded or 0, job.skipped or 0
+            before = dict(counts)
+            counts["total"] = counts["refunded"] + counts["skipped"] + len(payments)
+            await _progress(db, job_id, counts, status="RUNNING")
+
+            limit = asyncio.Semaphore(settings.REFUND_BATCH_CONCURRENCY)
+
+            async def refund(payment) -> Optional[Dict]:
+                async with limit:
+                    try:
+                        return await stripe_client.create_refund(
+                            payment.transaction_id or str(payment.id),
+                            float(payment.amount),
+                            idempotency_key=f"refund-{payment.id}"
+                        )
+                    except Exception as e:
+                        logger.warning(f"Refund job {job_id}: refund of {payment.id} failed: {e}")
+                        return None
+
+            chunk_size = settings.REFUND_BATCH_CHUNK_SIZE
+            for offset in range(0, len(payments), chunk_size):
+                chunk = payments[offset:offset + chunk_size]
+                results = await asyncio.gather(*[refund(p) for p in chunk])
+                refunded = [p for p, result in zip(chunk, results) if result is not None]
+                counts["failed"] += len(chunk) - len(refunded)
+
+                applied = await _apply(db, refunded)
+                counts["refunded"] += len(applied)
+                counts["skipped"] += len(refunded) - len(applied)
+                await _progress(db, job_id, counts)
+
+                for payment in refunded:
+                    if payment.id in applied:
+                        await producer.publish(
+                            PAYMENT_TOPIC,
+                            payment_refunded_event(str(payment.id), str(payment.booking_id), float(payment.amount), job.reason),
+                            ordering_key=str(payment.booking_id)
+                        )
+
+            await _progress(db, job_id, counts, status="COMPLETED" if not counts["failed"] else "COMPLETED_WITH_ERRORS", finished=True)
+        logger.info(f"Refund job {job_id} finished: {counts}")
+    except Exception as e:
+        logger.error(f"Refund job {job_id} failed: {e}")
+        async with AsyncSessionLocal() as db:
+            await _progress(db, job_id, counts, status="FAILED", finished=True, error=str(e))
+        raise
+    finally:
+        for result in ("refunded", "failed", "skipped"):
+            REFUNDS_PROCESSED.labels(result).inc(counts[result] - before[result])
+        REFUND_JOB_DURATION.observe(time.perf_counter() - start)
+    return counts
+
+
+async def _apply(db, refunded: List) -> set:
+    """Set-based status updates for one chunk. Returns the payment ids actually marked REFUNDED."""
+    if not refunded:
+        return set()
+    applied = (await db.execute(
+        update(Payment)
+        .where(Payment.id.in_([p.id for p in refunded]))
+        .where(Payment.status == "SUCCEEDED")
+        .values(status="REFUNDED", version=Payment.version + 1, updated_at=func.now())
+        .returning(Payment.id, Payment.booking_id)
+    )).all()
+    if applied:
+        await db.execute(
+            update(Booking)
+            .where(Booking.id.in_({row.booking_id for row in applied}))
+            .where(Booking.status.in_(["PENDING", "CONFIRMED"]))
+            .values(status="CANCELLED", version=Booking.version + 1)
+        )
+    await db.commit()
+    return {row.id for row in applied}
+
+
+async def _progress(db, job_id: str, counts: Dict[str, int], status: str = None, finished: bool = False, error: str = None) -> None:
+    values = {**counts, "updated_at": func.now()}
+    if status:
+        values["status"] = status
+    if finished:
+        values["finished_at"] = func.now()
+    if error:
+        values["error"] = error
+    await db.execute(update(RefundJob).where(RefundJob.id == job_id).values(**values))
+    await db.commit()
+
+
+async def resume_stale_jobs() -> List[str]:
+    """Claim jobs left PENDING/RUNNING by a dead replica and resume them here."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(_CLAIM_STALE_SQL, {"stale": float(settings.REFUND_JOB_STALE_SECONDS)})
+        job_ids = [str(row.id) for row in result]
+        await db.commit()
+    for job_id in job_ids:
+        logger.warning(f"Resuming stale refund job {job_id}")
+        start_job(job_id)
+    return job_ids
+
+
+async def run_refund_job_recovery() -> None:
+    """Recovery loop; runs until cancelled."""
+    interval = settings.REFUND_JOB_RECOVERY_INTERVAL_SECONDS
+    logger.info(f"Refund job recovery started (interval={interval}s, stale after {settings.REFUND_JOB_STALE_SECONDS}s)")
+    while True:
+        try:
+            await resume_stale_jobs()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Refund job recovery failed: {e}")
+        await asyncio.sleep(interval)
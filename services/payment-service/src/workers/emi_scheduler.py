@@ -0,0 +1,206 @@
+"""
+EMI installment scheduler.
+
+Every tick, due installments are claimed in batches:
+
+    WITH due AS (SELECT ... WHERE next_attempt_at <= now() ... FOR UPDATE SKIP LOCKED)
+    UPDATE emi_installments SET status = 'PROCESSING', claim_token = :token,
+        next_attempt_at = now() + lease ...
+
+so replicas never wait on (or double-claim) each other's rows, and the
+partial indexes on `next_attempt_at` (and on `due_date` for new rows that
+have no `next_attempt_at` yet) mean only due rows are scanned. The
+claim commits before any charge, so no transaction stays open across
+gateway calls; a replica that dies mid-batch leaves its rows PROCESSING
+until the lease passes, when they become due again.
+
+Claimed installments are charged concurrently through the gateway
+adapter. The idempotency key is `emi-{id}-{attempts}`: a lease-expired
+re-claim reuses the key (the gateway dedupes it), while a retry after a
+recorded failure gets a fresh one. Results are written with set-based
+updates fenced by the claim token, so a stale worker cannot overwrite a
+newer claim:
+
+    success             -> PAID (+ a SUCCEEDED payments row for the booking)
+    declined / error    -> attempts + 1, PENDING with exponential backoff,
+                           FAILED after EMI_MAX_ATTEMPTS
+    gateway unavailable -> PENDING after EMI_RETRY_UNAVAILABLE_SECONDS, no attempt used
+"""
+import asyncio
+import logging
+import time
+from uuid import uuid4
+
+from sqlalchemy import insert, text
+
+from src.adapters.stripe import stripe_client, GatewayUnavailableError
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.metrics import EMI_BATCH_LATENCY, EMI_CHARGES
+from src.models import Payment
+
+logger = logging.getLogger(__name__)
+
+# Served by idx_emi_installments_due and idx_emi_installments_unscheduled (partial indexes)
+_CLAIM_SQL = text("""
+    WITH due AS (
+        SELECT id FROM emi_installments
+        WHERE (status IN ('PENDING', 'PROCESSING') AND next_attempt_at <= now())
+           OR (status = 'PENDING' AND next_attempt_at IS NULL AND due_date <= CURRENT_DATE)
+        ORDER BY COALESCE(next_attempt_at, due_date)
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE emi_installments i
+    SET status = 'PROCESSING', claim_token = :token,
+        next_attempt_at = now() + make_interval(secs => :lease)
+    FROM due
+    WHERE i.id = due.id
+    RETURNING i.id, i.amount, i.attempts,
+        (SELECT p.booking_id FROM emi_plans p WHERE p.id = i.emi_plan_id) AS booking_id
+""")
+
+_PAID_SQL = text("""
+    UPDATE emi_installments i
+    SET status = 'PAID', paid_at = now(), transaction_id = r.transaction_id, last_error = NULL, claim_token = NULL
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:transaction_ids AS text[])) AS r(id, transaction_id)
+    WHERE i.id = r.id AND i.claim_token = :token
+    RETURNING i.id
+""")
+
+_FAILED_SQL = text("""
+    UPDATE emi_installments i
+    SET attempts = i.attempts + 1,
+        status = CASE WHEN i.attempts + 1 >= :max_attempts THEN 'FAILED' ELSE 'PENDING' END,
+        next_attempt_at = now() + make_interval(secs => least(:base * power(2, i.attempts), :cap)),
+        last_error = r.error, claim_token = NULL
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:errors AS text[])) AS r(id, error)
+    WHERE i.id = r.id AND i.claim_token = :token
+    RETURNING i.status
+""")
+
+_DEFERRED_SQL = text("""
+    UPDATE emi_installments
+    SET status = 'PENDING', next_attempt_at = now() + make_interval(secs => :delay), claim_token = NULL
+    WHERE id = ANY(CAST(:ids AS uuid[])) AND claim_token = :token
+""")
+
+
+async def claim_batch(batch_size: int) -> tuple:
+    """Claim up to `batch_size` due installments. Returns (claim token, rows)."""
+    token = uuid4()
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_CLAIM_SQL, {
+            "batch_size": batch_size,
+            "token": token,
+            "lease": float(settings.EMI_CLAIM_LEASE_SECONDS)
+        })).all()
+        await db.commit()
+    return token, rows
+
+
+async def _charge(installment, limit: asyncio.Semaphore):
+    """Charge one installment. Returns the gateway result or the exception."""
+    async with limit:
+        try:
+            return await stripe_client.create_payment_intent(
+                float(installment.amount), "USD",
+                idempotency_key=f"emi-{installment.id}-{installment.attempts}"
+            )
+        except Exception as e:
+            return e
+
+
+async def process_batch(batch_size: int) -> int:
+    """Claim, charge and record one batch. Returns the number of installments claimed."""
+    start = time.perf_counter()
+    token, installments = await claim_batch(batch_size)
+    if not installments:
+        return 0
+
+    limit = asyncio.Semaphore(settings.EMI_CHARGE_CONCURRENCY)
+    results = await asyncio.gather(*[_charge(i, limit) for i in installments])
+
+    paid, failed, deferred = [], [], []
+    for installment, result in zip(installments, results):
+        if isinstance(result, GatewayUnavailableError):
+            deferred.append(installment)
+        elif isinstance(result, Exception):
+            failed.append((installment, str(result)))
+        else:
+            paid.append((installment, result["id"]))
+
+    async with AsyncSessionLocal() as db:
+        if paid:
+            recorded = set((await db.execute(_PAID_SQL, {
+                "ids": [i.id for i, _ in paid],
+                "transaction_ids": [txn for _, txn in paid],
+                "token": token
+            })).scalars().all())
+            payments = [
+                {
+                    "id": uuid4(),
+                    "booking_id": i.booking_id,
+                    "amount": i.amount,
+                    "currency": "USD",
+                    "status": "SUCCEEDED",
+                    "transaction_id": txn
+                }
+                for i, txn in paid if i.id in recorded and i.booking_id is not None
+            ]
+            if payments:
+                await db.execute(insert(Payment), payments)
+            EMI_CHARGES.labels("paid").inc(len(recorded))
+        if failed:
+            statuses = (await db.execute(_FAILED_SQL, {
+                "ids": [i.id for i, _ in failed],
+                "errors": [error for _, error in failed],
+                "token": token,
+                "max_attempts": settings.EMI_MAX_ATTEMPTS,
+                "base": float(settings.EMI_RETRY_BASE_SECONDS),
+                "cap": float(settings.EMI_RETRY_MAX_SECONDS)
+            })).scalars().all()
+            for status in statuses:
+                EMI_CHARGES.labels("failed" if status == "FAILED" else "retry").inc()
+        if deferred:
+            await db.execute(_DEFERRED_SQL, {
+                "ids": [i.id for i in deferred],
+                "token": token,
+                "delay": float(settings.EMI_RETRY_UNAVAILABLE_SECONDS)
+            })
+            EMI_CHARGES.labels("deferred").inc(len(deferred))
+        await db.commit()
+
+    EMI_BATCH_LATENCY.observe(time.perf_counter() - start)
+    return len(installments)
+
+
+async def run_once() -> int:
+    """
+    Drain due installments until a short batch comes back, capped at
+    EMI_MAX_BATCHES per tick. Returns the number processed.
+    """
+    batch_size = settings.EMI_CLAIM_BATCH_SIZE
+    total = 0
+    for _ in range(settings.EMI_MAX_BATCHES):
+        claimed = await process_batch(batch_size)
+        total += claimed
+        if claimed < batch_size:
+            break
+    if total:
+        logger.info(f"Processed {total} due EMI installments")
+    return total
+
+
+async def run_emi_scheduler() -> None:
+    """Scheduler loop; runs until cancelled."""
+    interval = settings.EMI_SCHEDULER_INTERVAL_SECONDS
+    logger.info(f"EMI scheduler started (interval={interval}s, batch={settings.EMI_CLAIM_BATCH_SIZE})")
+    while True:
+        try:
+            await run_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"EMI scheduler run failed: {e}")
+        await asyncio.sleep(interval)
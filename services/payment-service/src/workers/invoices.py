@@ -0,0 +1,271 @@
+"""
+Month-end invoice generation.
+
+For a billing period (YYYY-MM) every SUCCEEDED payment on a CONFIRMED
+booking without an invoice is:
+
+1. Streamed from a server-side cursor, INVOICE_CHUNK_SIZE rows at a time,
+   so memory stays flat however large the month is.
+2. Rendered to PDF in a ProcessPoolExecutor (INVOICE_WORKERS processes,
+   spawn context). At most two chunks per worker are in flight; reading
+   the cursor pauses until one finishes (backpressure).
+3. Written by the worker to INVOICE_STORAGE_DIR, a local stand-in for
+   the object store, under `invoices/{period}/{invoice_number}.pdf`.
+4. Recorded in `invoices` with one multi-row insert per chunk.
+
+Invoice numbers are derived from the period and payment id and inserted
+with ON CONFLICT DO NOTHING, so a re-run only fills the gaps. Per-worker
+throughput (invoices, bytes, busy seconds) is kept on the run row.
+
+The scheduled run checks for an existing run and records its own under a
+transaction-level advisory lock, so only one replica starts each period.
+A RUNNING run refreshes `heartbeat_at` with every chunk it records; one
+silent for INVOICE_RUN_STALE_SECONDS is taken to have died with its
+replica, is marked FAILED and no longer blocks the period. The scheduler
+re-checks the last period when it starts, so a restart resumes it.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import and_, exists, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.invoice_render import render_chunk
+from src.metrics import INVOICE_CHUNK_LATENCY, INVOICES_RENDERED
+from src.models import Booking, Invoice, InvoiceRun, Payment
+
+logger = logging.getLogger(__name__)
+
+_START_LOCK_SQL = text("SELECT pg_try_advisory_xact_lock(hashtext('invoice-run'))")
+
+
+def period_bounds(period: str) -> tuple:
+    """'2026-09' -> (2026-09-01T00:00Z, 2026-10-01T00:00Z)."""
+    start = datetime.strptime(period, "%Y-%m").replace(tzinfo=timezone.utc)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def previous_period(now: datetime) -> str:
+    return (now.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+
+def invoice_number(period: str, payment_id) -> str:
+    # The full payment id: a truncated one could collide and overwrite another invoice's PDF
+    return f"INV-{period.replace('-', '')}-{payment_id.hex.upper()}"
+
+
+async def start_run(period: str) -> str:
+    """Record a new RUNNING run and return its id."""
+    period_bounds(period)  # Validate
+    run_id = str(uuid4())
+    async with AsyncSessionLocal() as db:
+        db.add(InvoiceRun(id=run_id, period=period, status="RUNNING"))
+        await db.commit()
+    return run_id
+
+
+async def start_scheduled_run(period: str) -> Optional[str]:
+    """
+    Record a RUNNING run unless the period already has a live RUNNING or a
+    COMPLETED one, or another replica is starting it right now. Returns the
+    run id or None.
+    """
+    period_bounds(period)  # Validate
+    async with AsyncSessionLocal() as db:
+        if not (await db.execute(_START_LOCK_SQL)).scalar():
+            return None
+        stale_before = func.now() - timedelta(seconds=settings.INVOICE_RUN_STALE_SECONDS)
+        await db.execute(
+            update(InvoiceRun)
+            .where(InvoiceRun.period == period, InvoiceRun.status == "RUNNING", InvoiceRun.heartbeat_at < stale_before)
+            .values(status="FAILED", error="Abandoned: no progress (replica stopped?)", finished_at=func.now())
+        )
+        already = (await db.execute(
+            select(InvoiceRun.id)
+            .where(and_(InvoiceRun.period == period, InvoiceRun.status.in_(["RUNNING", "COMPLETED"])))
+            .limit(1)
+        )).scalar()
+        if already is not None:
+            await db.commit()
+            return None
+        run_id = str(uuid4())
+        db.add(InvoiceRun(id=run_id, period=period, status="RUNNING"))
+        await db.commit()  # Releases the lock with the run row visible
+    return run_id
+
+
+def _uninvoiced_query(period: str):
+    start, end = period_bounds(period)
+    return (
+        select(
+            Payment.id.label("payment_id"), Payment.amount, Payment.currency, Payment.transaction_id,
+            Booking.id.label("booking_id"), Booking.user_id, Booking.resource_type, Booking.resource_id
+        )
+        .join(Booking, Booking.id == Payment.booking_id)
+        .where(Payment.status == "SUCCEEDED", Booking.status == "CONFIRMED")
+        .where(Payment.created_at >= start, Payment.created_at < end)
+        .where(~exists().where(Invoice.payment_id == Payment.id))
+        .order_by(Payment.id)
+    )
+
+
+def _invoice_payload(row, period: str, invoice_date: str) -> Dict:
+    number = invoice_number(period, row.payment_id)
+    return {
+        "invoice_number": number,
+        "key": f"invoices/{period}/{number}.pdf",
+        "invoice_date": invoice_date,
+        "period": period,
+        "payment_id": str(row.payment_id),
+        "transaction_id": row.transaction_id,
+        "booking_id": str(row.booking_id),
+        "user_id": str(row.user_id),
+        "resource_type": row.resource_type,
+        "resource_id": str(row.resource_id),
+        "amount": float(row.amount),
+        "currency": row.currency
+    }
+
+
+async def generate(run_id: str, period: str) -> Dict:
+    """Generate all missing invoices for `period`. Returns the run summary."""
+    started = time.perf_counter()
+    storage_dir = settings.INVOICE_STORAGE_DIR
+    Path(storage_dir).mkdir(parents=True, exist_ok=True)
+    invoice_date = datetime.utcnow().date().isoformat()
+    workers: Dict[str, Dict] = {}
+    totals = {"invoices": 0, "bytes": 0}
+
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(
+        max_workers=settings.INVOICE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    in_flight: Dict[asyncio.Future, List[Dict]] = {}
+
+    async def drain(writer, return_when) -> None:
+        """Wait for rendered chunks and record them (one writer, so strictly sequential)."""
+        done, _ = await asyncio.wait(in_flight, return_when=return_when)
+        for future in done:
+            chunk = in_flight.pop(future)
+            result = future.result()
+            INVOICE_CHUNK_LATENCY.observe(result["seconds"])
+            stats = workers.setdefault(str(result["pid"]), {"invoices": 0, "bytes": 0, "seconds": 0.0})
+            stats["invoices"] += len(result["keys"])
+            stats["bytes"] += result["bytes"]
+            stats["seconds"] += result["seconds"]
+            INVOICES_RENDERED.inc(len(result["keys"]))
+            totals["invoices"] += len(result["keys"])
+            totals["bytes"] += result["bytes"]
+            await writer.execute(
+                insert(Invoice)
+                .values([
+                    {
+                        "id": uuid4(),
+                        "payment_id": item["payment_id"],
+                        "invoice_number": item["invoice_number"],
+                        "pdf_url": Path(storage_dir, item["key"]).resolve().as_uri()
+                    }
+                    for item in chunk
+                ])
+                .on_conflict_do_nothing()
+            )
+            await writer.execute(update(InvoiceRun).where(InvoiceRun.id == run_id).values(heartbeat_at=func.now()))
+            await writer.commit()
+
+    try:
+        async with AsyncSessionLocal() as reader, AsyncSessionLocal() as writer:
+            result = await reader.stream(
+                _uninvoiced_query(period).execution_options(yield_per=settings.INVOICE_CHUNK_SIZE)
+            )
+            async for rows in result.partitions():
+                chunk = [_invoice_payload(row, period, invoice_date) for row in rows]
+                in_flight[loop.run_in_executor(pool, render_chunk, chunk, storage_dir)] = chunk
+                if len(in_flight) >= settings.INVOICE_WORKERS * 2:
+                    await drain(writer, asyncio.FIRST_COMPLETED)
+            while in_flight:
+                await drain(writer, asyncio.FIRST_COMPLETED)
+
+        elapsed = time.perf_counter() - started
+        summary = _summary(totals, workers, elapsed)
+        await _finish(run_id, "COMPLETED", summary)
+        logger.info(
+            f"Invoice run {run_id} ({period}): {totals['invoices']} invoices in {elapsed:.1f}s "
+            f"({summary['invoices_per_second']} /s across {len(workers)} workers)"
+        )
+        return summary
+    except Exception as e:
+        logger.error(f"Invoice run {run_id} ({period}) failed: {e}")
+        await _finish(run_id, "FAILED", _summary(totals, workers, time.perf_counter() - started), error=str(e))
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _summary(totals: Dict, workers: Dict, elapsed: float) -> Dict:
+    return {
+        "invoices": totals["invoices"],
+        "bytes": totals["bytes"],
+        "seconds": round(elapsed, 3),
+        "invoices_per_second": round(totals["invoices"] / elapsed, 1) if elapsed else 0.0,
+        "workers": {
+            pid: {**stats, "seconds": round(stats["seconds"], 3),
+                  "invoices_per_second": round(stats["invoices"] / stats["seconds"], 1) if stats["seconds"] else 0.0}
+            for pid, stats in workers.items()
+        }
+    }
+
+
+async def _finish(run_id: str, status: str, summary: Dict, error: str = None) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(InvoiceRun)
+            .where(InvoiceRun.id == run_id)
+            .values(
+                status=status,
+                invoices=summary["invoices"],
+                bytes=summary["bytes"],
+                seconds=summary["seconds"],
+                worker_stats=summary["workers"],
+                error=error,
+                finished_at=func.now()
+            )
+        )
+        await db.commit()
+
+
+async def run_invoice_scheduler() -> None:
+    """Invoice the previous month shortly after each month starts; runs until cancelled."""
+    logger.info(f"Month-end invoicing scheduled on day 1 at {settings.INVOICE_RUN_HOUR_UTC:02d}:00 UTC")
+    catch_up = True  # On startup, finish the last period if its run died with a previous replica
+    while True:
+        now = datetime.now(timezone.utc)
+        next_run = (now.replace(day=1) + timedelta(days=32)).replace(day=1, hour=settings.INVOICE_RUN_HOUR_UTC, minute=0, second=0, microsecond=0)
+        this_month = now.replace(day=1, hour=settings.INVOICE_RUN_HOUR_UTC, minute=0, second=0, microsecond=0)
+        if this_month > now:
+            next_run = this_month
+        elif catch_up:
+            next_run = now
+        catch_up = False
+        await asyncio.sleep((next_run - now).total_seconds())
+        period = previous_period(next_run)
+        try:
+            run_id = await start_scheduled_run(period)
+            if run_id is None:
+                logger.info(f"Month-end invoicing for {period} already started elsewhere, skipping")
+            else:
+                await generate(run_id, period)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Month-end invoicing for {period} failed: {e}")
@@ -0,0 +1,242 @@
+"""
+Asynchronous payment jobs.
+
+`POST /payments/async` inserts a PENDING payment row and returns 202; the
+row itself is the job, so nothing is lost if the process dies. This
+module drives those rows through the gateway:
+
+    PENDING -> PROCESSING -> SUCCEEDED | FAILED | REFUNDED
+
+- Accepted jobs go on a bounded in-process queue served by
+  PAYMENT_ASYNC_WORKERS workers, so at most that many gateway calls are
+  in flight per replica however many requests arrive.
+- A job is claimed with a conditional PENDING -> PROCESSING update, so
+  when several replicas (or the requeue loop) see the same row only one
+  charges it. The payment id is the gateway idempotency key.
+- The requeue loop picks up PENDING rows this replica never queued (full
+  queue, restart, other replica's backlog) and resets PROCESSING rows
+  that outlived PAYMENT_PROCESSING_TIMEOUT_SECONDS.
+- Final statuses publish payment.succeeded / payment.failed and wake
+  any long-polling `GET /payments/{id}/status?wait=...` on this replica.
+- Jobs the gateway adapter refuses without attempting (circuit open, no
+  concurrency slot) go back to PENDING and are retried by the requeue loop.
+- A charge whose booking was cancelled while it was in flight is refunded
+  at the gateway (`refund_lost_race`) before the payment becomes
+  REFUNDED. If that refund fails the payment stays SUCCEEDED with a
+  REFUND_PENDING error, and reconciliation reports it as
+  PAID_BOOKING_CANCELLED.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import func, select, update
+
+from shared.transitions import TransitionError, transition_status
+from src.adapters.stripe import stripe_client, GatewayError, GatewayUnavailableError
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.events import PAYMENT_TOPIC, payment_failed_event, payment_succeeded_event, producer
+from src.metrics import PAYMENT_JOB_LATENCY, PAYMENT_JOBS_PROCESSED, PAYMENT_QUEUE_DEPTH
+from src.models import Booking, Payment
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("PENDING", "PROCESSING")
+
+# Error prefix for charges that must be refunded but could not be yet
+REFUND_PENDING = "REFUND_PENDING"
+
+
+async def refund_lost_race(payment_id: str, transaction_id: str, amount: float, reason: str) -> tuple:
+    """
+    Refund a charge whose booking changed while it was in flight.
+
+    Uses the same `refund-{payment_id}` idempotency key as batch refunds,
+    so retries never refund twice. Returns (payment status, error).
+    """
+    try:
+        await stripe_client.create_refund(transaction_id, amount, idempotency_key=f"refund-{payment_id}")
+    except GatewayError as e:
+        logger.error(f"Refund of {payment_id} after lost booking race failed: {e}")
+        return "SUCCEEDED", f"{REFUND_PENDING}: booking changed during payment ({reason}); refund failed: {e}"
+    return "REFUNDED", f"Booking changed during payment: {reason}"
+
+
+class PaymentJobQueue:
+    """Bounded worker pool for asynchronous payments; one instance per process."""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=settings.PAYMENT_QUEUE_MAX_SIZE)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(settings.PAYMENT_ASYNC_WORKERS)]
+        self._tasks.append(asyncio.create_task(self._requeue_loop()))
+        logger.info(f"Payment job workers started (workers={settings.PAYMENT_ASYNC_WORKERS}, queue={settings.PAYMENT_QUEUE_MAX_SIZE})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, payment_id: str) -> bool:
+        """
+        Queue a committed PENDING payment. Returns False if the queue is full
+        (or workers are not running); the requeue loop then picks it up later.
+        """
+        if self._queue is None or payment_id in self._queued:
+            return False
+        try:
+            self._queue.put_nowait(payment_id)
+        except asyncio.QueueFull:
+            logger.warning(f"Payment job queue full, {payment_id} deferred to requeue")
+            return False
+        self._queued.add(payment_id)
+        PAYMENT_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    async def wait_for_update(self, payment_id: str, timeout: float) -> None:
+        """Sleep until this replica finishes `payment_id` or `timeout` passes."""
+        event = asyncio.Event()
+        self._waiters.setdefault(payment_id, set()).add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(payment_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[payment_id]
+
+    def _notify(self, payment_id: str) -> None:
+        for event in self._waiters.get(payment_id, ()):
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            payment_id = await self._queue.get()
+            self._queued.discard(payment_id)
+            PAYMENT_QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                await self.process(payment_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Left PROCESSING; the requeue loop retries it after the timeout
+                logger.error(f"Payment job {payment_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def process(self, payment_id: str) -> Optional[str]:
+        """Claim, charge and settle one payment. Returns its final status (None if not claimed)."""
+        async with AsyncSessionLocal() as db:
+            try:
+                job = await transition_status(
+                    db, Payment, payment_id, "PROCESSING", ["PENDING"],
+                    returning=[Payment.booking_id, Payment.amount, Payment.currency],
+                    updated_at=func.now()
+                )
+            except TransitionError:
+                PAYMENT_JOBS_PROCESSED.labels("skipped").inc()
+                return None  # Another worker or replica owns it
+            await db.commit()
+
+        start = time.perf_counter()
+        booking_id = str(job.booking_id)
+        try:
+            intent = await stripe_client.create_payment_intent(
+                float(job.amount), job.currency, idempotency_key=str(payment_id)
+            )
+        except GatewayUnavailableError as e:
+            # Not attempted (circuit open / saturated): hand it back for the requeue loop
+            status = await self._settle(payment_id, "PENDING", error=str(e))
+            PAYMENT_JOBS_PROCESSED.labels("deferred").inc()
+            return status
+        except Exception as e:
+            status = await self._settle(payment_id, "FAILED", error=str(e))
+            await producer.publish(PAYMENT_TOPIC, payment_failed_event(str(payment_id), booking_id, str(e)), ordering_key=booking_id)
+        else:
+            status = await self._settle(
+                payment_id, "SUCCEEDED", booking_id=booking_id, amount=float(job.amount), transaction_id=intent["id"]
+            )
+            if status == "SUCCEEDED":
+                event = payment_succeeded_event(str(payment_id), booking_id, float(job.amount), job.currency, intent["id"])
+            elif status == "REFUNDED":
+                event = payment_failed_event(str(payment_id), booking_id, "Booking changed during payment, charge refunded")
+            else:
+                event = payment_failed_event(str(payment_id), booking_id, "Booking changed during payment, refund pending")
+            await producer.publish(PAYMENT_TOPIC, event, ordering_key=booking_id)
+
+        PAYMENT_JOB_LATENCY.observe(time.perf_counter() - start)
+        PAYMENT_JOBS_PROCESSED.labels(status.lower()).inc()
+        self._notify(str(payment_id))
+        return status
+
+    async def _settle(self, payment_id: str, status: str, booking_id: str = None, amount: float = None, **values) -> str:
+        """
+        Record the gateway result; a successful charge also confirms the booking.
+        Returns the outcome: the payment status, or REFUND_PENDING.
+        """
+        outcome = None
+        async with AsyncSessionLocal() as db:
+            if booking_id:
+                try:
+                    await transition_status(db, Booking, booking_id, "CONFIRMED", ["PENDING"])
+                except TransitionError as e:
+                    # Same rule as the synchronous path: never resurrect a cancelled booking
+                    await db.rollback()  # No transaction open across the gateway call
+                    status, values["error"] = await refund_lost_race(payment_id, values["transaction_id"], amount, str(e))
+                    outcome = "REFUNDED" if status == "REFUNDED" else REFUND_PENDING
+            await transition_status(
+                db, Payment, payment_id, status, ["PROCESSING"],
+                updated_at=func.now(), **values
+            )
+            await db.commit()
+        return outcome or status
+
+    async def requeue_stale(self) -> int:
+        """Reset timed-out PROCESSING jobs and queue unowned PENDING ones. Returns the number queued."""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Payment)
+                .where(Payment.status == "PROCESSING")
+                .where(Payment.updated_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, settings.PAYMENT_PROCESSING_TIMEOUT_SECONDS))
+                .values(status="PENDING", version=Payment.version + 1, updated_at=func.now())
+            )
+            await db.commit()
+            free = settings.PAYMENT_QUEUE_MAX_SIZE - self._queue.qsize()
+            if free <= 0:
+                return 0
+            # Skip fresh rows: the replica that accepted them is about to run them
+            pending = (await db.execute(
+                select(Payment.id)
+                .where(Payment.status == "PENDING")
+                .where(Payment.updated_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, settings.PAYMENT_REQUEUE_INTERVAL_SECONDS))
+                .order_by(Payment.updated_at)
+                .limit(free)
+            )).scalars().all()
+        queued = sum(self.submit(str(payment_id)) for payment_id in pending)
+        if queued:
+            logger.info(f"Requeued {queued} pending payment jobs")
+        return queued
+
+    async def _requeue_loop(self) -> None:
+        while True:
+            try:
+                await self.requeue_stale()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Payment job requeue failed: {e}")
+            await asyncio.sleep(settings.PAYMENT_REQUEUE_INTERVAL_SECONDS)
+
+
+payment_jobs = PaymentJobQueue()
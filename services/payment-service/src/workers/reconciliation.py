@@ -0,0 +1,233 @@
+"""
+Nightly payment/booking reconciliation.
+
+Both tables are streamed in booking id order through server-side cursors
+and compared with a sorted merge, so memory stays constant (one booking
+and its payments at a time) however many rows there are. The two
+cursors run on separate connections that share one exported snapshot
+(`pg_export_snapshot()` / `SET TRANSACTION SNAPSHOT`), so a payment and
+its booking are never seen at different points in time.
+
+Discrepancies are written to `payment_reconciliation_discrepancies` in
+batches:
+
+    PAID_BOOKING_PENDING       SUCCEEDED payment, booking still PENDING
+    PAID_BOOKING_CANCELLED     SUCCEEDED payment, booking CANCELLED (refund owed)
+    CONFIRMED_WITHOUT_PAYMENT  CONFIRMED booking with no SUCCEEDED or REFUNDED payment
+    REFUND_ON_ACTIVE_BOOKING   REFUNDED payment, booking not CANCELLED
+    PAYMENT_WITHOUT_BOOKING    SUCCEEDED/REFUNDED payment whose booking does not exist
+
+A transaction-level advisory lock keeps runs from overlapping across
+replicas.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import func, insert, select, text, update
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.metrics import RECONCILIATION_DISCREPANCIES, RECONCILIATION_DURATION, RECONCILIATION_ROWS
+from src.models import Booking, Payment, ReconciliationDiscrepancy, ReconciliationRun
+
+logger = logging.getLogger(__name__)
+
+_LOCK_SQL = text("SELECT pg_try_advisory_xact_lock(hashtext('payment-reconciliation'))")
+
+SETTLED_STATUSES = ("SUCCEEDED", "REFUNDED")
+
+
+class ReconciliationRunningError(Exception):
+    """Another reconciliation run holds the lock."""
+
+
+def compare(booking, payments: List) -> List[Dict]:
+    """Discrepancies for one booking (None if it does not exist) and its payments."""
+    found = []
+
+    def report(kind: str, payment=None):
+        found.append({
+            "kind": kind,
+            "booking_id": booking.id if booking else payment.booking_id,
+            "payment_id": payment.id if payment else None,
+            "booking_status": booking.status if booking else None,
+            "payment_status": payment.status if payment else None,
+            "amount": payment.amount if payment else None
+        })
+
+    if booking is None:
+        for payment in payments:
+            if payment.status in SETTLED_STATUSES:
+                report("PAYMENT_WITHOUT_BOOKING", payment)
+        return found
+
+    for payment in payments:
+        if payment.status == "SUCCEEDED" and booking.status == "PENDING":
+            report("PAID_BOOKING_PENDING", payment)
+        elif payment.status == "SUCCEEDED" and booking.status == "CANCELLED":
+            report("PAID_BOOKING_CANCELLED", payment)
+        elif payment.status == "REFUNDED" and booking.status != "CANCELLED":
+            report("REFUND_ON_ACTIVE_BOOKING", payment)
+    if booking.status == "CONFIRMED" and not any(p.status in SETTLED_STATUSES for p in payments):
+        report("CONFIRMED_WITHOUT_PAYMENT")
+    return found
+
+
+async def merge(bookings: AsyncIterator, payments: AsyncIterator, counts: Dict[str, int]) -> AsyncIterator[Dict]:
+    """
+    Sorted merge of bookings (by id) and payments (by booking_id).
+
+    UUIDs compare the same way in Python as in Postgres (big-endian bytes),
+    so both streams can be advanced in lockstep.
+    """
+    payment = await anext(payments, None)
+
+    async def take_group(booking_id) -> List:
+        nonlocal payment
+        group = []
+        while payment is not None and payment.booking_id == booking_id:
+            group.append(payment)
+            counts["payments"] += 1
+            payment = await anext(payments, None)
+        return group
+
+    async for booking in bookings:
+        counts["bookings"] += 1
+        while payment is not None and payment.booking_id < booking.id:
+            for discrepancy in compare(None, await take_group(payment.booking_id)):
+                yield discrepancy
+        for discrepancy in compare(booking, await take_group(booking.id)):
+            yield discrepancy
+
+    while payment is not None:
+        for discrepancy in compare(None, await take_group(payment.booking_id)):
+            yield discrepancy
+
+
+async def _stream(db, stmt) -> AsyncIterator:
+    result = await db.stream(stmt.execution_options(yield_per=settings.RECONCILIATION_FETCH_SIZE))
+    async for row in result:
+        yield row
+
+
+async def start_run() -> str:
+    """Record a new RUNNING run and return its id."""
+    run_id = str(uuid4())
+    async with AsyncSessionLocal() as db:
+        db.add(ReconciliationRun(id=run_id, status="RUNNING"))
+        await db.commit()
+    return run_id
+
+
+async def reconcile(run_id: str) -> Dict[str, int]:
+    """Run a full reconciliation for an existing run row. Returns the row counts."""
+    start = time.perf_counter()
+    counts = {"bookings": 0, "payments": 0, "discrepancies": 0}
+    try:
+        async with AsyncSessionLocal() as bookings_db, AsyncSessionLocal() as payments_db, AsyncSessionLocal() as writer:
+            await bookings_db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            if not (await bookings_db.execute(_LOCK_SQL)).scalar():
+                raise ReconciliationRunningError("Another reconciliation run is in progress")
+            snapshot = (await bookings_db.execute(text("SELECT pg_export_snapshot()"))).scalar()
+            await payments_db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            await payments_db.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot}'"))
+
+            bookings = _stream(bookings_db, select(Booking.id, Booking.status).order_by(Booking.id))
+            payments = _stream(payments_db, select(
+                Payment.id, Payment.booking_id, Payment.status, Payment.amount
+            ).order_by(Payment.booking_id, Payment.id))
+
+            batch = []
+            async for discrepancy in merge(bookings, payments, counts):
+                batch.append({"run_id": run_id, **discrepancy})
+                RECONCILIATION_DISCREPANCIES.labels(discrepancy["kind"]).inc()
+                if len(batch) >= settings.RECONCILIATION_WRITE_BATCH:
+                    await _flush(writer, run_id, batch, counts)
+            await _flush(writer, run_id, batch, counts)
+
+        await _finish(run_id, "COMPLETED", counts)
+        logger.info(
+            f"Reconciliation {run_id} completed: {counts['bookings']} bookings, "
+            f"{counts['payments']} payments, {counts['discrepancies']} discrepancies"
+        )
+    except ReconciliationRunningError as e:
+        await _finish(run_id, "SKIPPED", counts, error=str(e))
+        raise
+    except Exception as e:
+        logger.error(f"Reconciliation {run_id} failed: {e}")
+        await _finish(run_id, "FAILED", counts, error=str(e))
+        raise
+    finally:
+        RECONCILIATION_ROWS.labels("bookings").inc(counts["bookings"])
+        RECONCILIATION_ROWS.labels("payments").inc(counts["payments"])
+        RECONCILIATION_DURATION.observe(time.perf_counter() - start)
+    return counts
+
+
+async def _flush(writer, run_id: str, batch: List[Dict], counts: Dict[str, int]) -> None:
+    """Insert buffered discrepancies and publish progress on the run row."""
+    if batch:
+        await writer.execute(insert(ReconciliationDiscrepancy), batch)
+        counts["discrepancies"] += len(batch)
+        batch.clear()
+    await writer.execute(
+        update(ReconciliationRun)
+        .where(ReconciliationRun.id == run_id)
+        .values(
+            bookings_scanned=counts["bookings"],
+            payments_scanned=counts["payments"],
+            discrepancies=counts["discrepancies"]
+        )
+    )
+    await writer.commit()
+
+
+async def _finish(run_id: str, status: str, counts: Dict[str, int], error: Optional[str] = None) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(ReconciliationRun)
+            .where(ReconciliationRun.id == run_id)
+            .values(
+                status=status,
+                finished_at=func.now(),
+                bookings_scanned=counts["bookings"],
+                payments_scanned=counts["payments"],
+                discrepancies=counts["discrepancies"],
+                error=error
+            )
+        )
+        await db.commit()
+
+
+def _seconds_until_next_run(now: datetime) -> float:
+    next_run = now.replace(hour=settings.RECONCILIATION_HOUR_UTC, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def run_reconciliation() -> None:
+    """Nightly loop; runs until cancelled. Replicas that lose the lock skip the night."""
+    logger.info(f"Payment reconciliation scheduled daily at {settings.RECONCILIATION_HOUR_UTC:02d}:00 UTC")
+    while True:
+        await asyncio.sleep(_seconds_until_next_run(datetime.now(timezone.utc)))
+        try:
+            async with AsyncSessionLocal() as db:
+                recent = (await db.execute(
+                    select(ReconciliationRun.id)
+                    .where(ReconciliationRun.status.in_(["RUNNING", "COMPLETED"]))
+                    .where(ReconciliationRun.started_at > func.now() - text("interval '12 hours'"))
+                    .limit(1)
+                )).scalar()
+            if recent is None:
+                await reconcile(await start_run())
+        except asyncio.CancelledError:
+            raise
+        except ReconciliationRunningError:
+            logger.info("Nightly reconciliation already running on another replica")
+        except Exception as e:
+            logger.error(f"Nightly reconciliation failed: {e}")
@@ -0,0 +1,518 @@
+"""
+Unit tests for Payment Service
+"""
+import asyncio
+import functools
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import pubsub_v1
+from google.pubsub_v1.types import PublishResponse
+
+from main import app
+from src import events
+from src.adapters.stripe import GatewayError, GatewayUnavailableError, StripeAdapter
+from src.database import get_db
+from src.workers.payment_jobs import REFUND_PENDING, refund_lost_race
+from shared.transitions import InvalidTransitionError, VersionConflictError
+
+client = TestClient(app)
+
+BOOKING_ID = str(uuid4())
+PAYMENT_REQUEST = {
+    "booking_id": BOOKING_ID,
+    "amount": 250.0,
+    "currency": "USD",
+    "payment_method": {"type": "credit_card", "card_number": "4242424242424242"}
+}
+
+
+class FakeSession:
+    """Returns `row` from every SELECT and records what is added."""
+
+    def __init__(self, row=None):
+        self.row = row
+        self.added = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, stmt):
+        return Mock(scalar_one_or_none=Mock(return_value=self.row), first=Mock(return_value=self.row))
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def override_db(session):
+    async def get_fake_db():
+        yield session
+    app.dependency_overrides[get_db] = get_fake_db
+
+
+class TestHealthEndpoint:
+    """Test health check endpoint"""
+
+    def test_health_check_returns_200(self):
+        """Health endpoint should return 200 OK"""
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "healthy"
+
+
+class TestRefundLostRace:
+    """Charges whose booking changed while the gateway call was in flight"""
+
+    @patch("src.workers.payment_jobs.stripe_client")
+    def test_refunds_at_gateway(self, mock_stripe):
+        """The charge is refunded with the per-payment idempotency key"""
+        mock_stripe.create_refund = AsyncMock(return_value={"id": "re_1"})
+        status, error = asyncio.run(refund_lost_race("pay-1", "pi_1", 250.0, "booking cancelled"))
+        assert status == "REFUNDED"
+        mock_stripe.create_refund.assert_awaited_once_with("pi_1", 250.0, idempotency_key="refund-pay-1")
+
+    @patch("src.workers.payment_jobs.stripe_client")
+    def test_failed_refund_stays_succeeded(self, mock_stripe):
+        """A failed refund keeps the payment SUCCEEDED and flags it for reconciliation"""
+        mock_stripe.create_refund = AsyncMock(side_effect=GatewayError("timeout"))
+        status, error = asyncio.run(refund_lost_race("pay-1", "pi_1", 250.0, "booking cancelled"))
+        assert status == "SUCCEEDED"
+        assert error.startswith(REFUND_PENDING)
+
+
+class TestProcessPayment:
+    """POST /payments/"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    @patch("src.routes.payments.producer")
+    @patch("src.routes.payments.transition_status", new_callable=AsyncMock)
+    @patch("src.workers.payment_jobs.stripe_client")
+    @patch("src.routes.payments.stripe_client")
+    def test_lost_race_refunds_charge(self, mock_stripe, mock_jobs_stripe, mock_transition, mock_producer):
+        """A booking cancelled mid-charge gets the charge refunded, not a fake REFUNDED row"""
+        db = FakeSession(SimpleNamespace(id=BOOKING_ID, status="PENDING"))
+        override_db(db)
+        mock_stripe.create_payment_intent = AsyncMock(return_value={"id": "pi_race"})
+        mock_jobs_stripe.create_refund = AsyncMock(return_value={"id": "re_race"})
+        mock_transition.side_effect = InvalidTransitionError("CANCELLED", "CONFIRMED")
+        mock_producer.publish = AsyncMock()
+
+        response = client.post("/payments/", json=PAYMENT_REQUEST)
+
+        assert response.status_code == 409
+        assert "charge refunded" in response.json()["detail"]
+        payment = db.added[-1]
+        mock_jobs_stripe.create_refund.assert_awaited_once_with(
+            "pi_race", 250.0, idempotency_key=f"refund-{payment.id}"
+        )
+        assert payment.status == "REFUNDED"
+        assert payment.transaction_id == "pi_race"
+        assert mock_producer.publish.await_args.args[1]["event_type"] == "payment.failed"
+
+    @patch("src.routes.payments.producer")
+    @patch("src.routes.payments.transition_status", new_callable=AsyncMock)
+    @patch("src.workers.payment_jobs.stripe_client")
+    @patch("src.routes.payments.stripe_client")
+    def test_lost_race_refund_failure_is_flagged(self, mock_stripe, mock_jobs_stripe, mock_transition, mock_producer):
+        """If the refund fails the payment stays SUCCEEDED with REFUND_PENDING"""
+        db = FakeSession(SimpleNamespace(id=BOOKING_ID, status="PENDING"))
+        override_db(db)
+        mock_stripe.create_payment_intent = AsyncMock(return_value={"id": "pi_race"})
+        mock_jobs_stripe.create_refund = AsyncMock(side_effect=GatewayError("gateway timeout"))
+        mock_transition.side_effect = InvalidTransitionError("CANCELLED", "CONFIRMED")
+        mock_producer.publish = AsyncMock()
+
+        response = client.post("/payments/", json=PAYMENT_REQUEST)
+
+        assert response.status_code == 409
+        assert "refund pending" in response.json()["detail"]
+        payment = db.added[-1]
+        assert payment.status == "SUCCEEDED"
+        assert payment.error.startswith(REFUND_PENDING)
+
+    @patch("src.routes.payments.producer")
+    @patch("src.routes.payments.transition_status", new_callable=AsyncMock)
+    @patch("src.routes.payments.stripe_client")
+    def test_success_confirms_and_publishes(self, mock_stripe, mock_transition, mock_producer):
+        """A won race records SUCCEEDED and publishes payment.succeeded"""
+        db = FakeSession(SimpleNamespace(id=BOOKING_ID, status="PENDING"))
+        override_db(db)
+        mock_stripe.create_payment_intent = AsyncMock(return_value={"id": "pi_ok"})
+        mock_producer.publish = AsyncMock()
+
+        response = client.post("/payments/", json=PAYMENT_REQUEST)
+
+        assert response.status_code == 201
+        assert response.json()["status"] == "SUCCEEDED"
+        assert db.added[-1].status == "SUCCEEDED"
+        assert mock_producer.publish.await_args.args[1]["event_type"] == "payment.succeeded"
+
+
+class TestRefundPayment:
+    """POST /payments/{id}/refund"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def _payment(self):
+        return SimpleNamespace(
+            id=uuid4(), booking_id=uuid4(), status="SUCCEEDED", amount=250.0,
+            currency="USD", transaction_id="pi_paid", version=1
+        )
+
+    @patch("src.routes.payments.producer")
+    @patch("src.routes.payments.transition_status", new_callable=AsyncMock)
+    @patch("src.routes.payments.stripe_client")
+    def test_refund_goes_through_gateway(self, mock_stripe, mock_transition, mock_producer):
+        """The gateway refund happens before the payment is marked REFUNDED"""
+        payment = self._payment()
+        override_db(FakeSession(payment))
+        mock_stripe.create_refund = AsyncMock(return_value={"id": "re_1"})
+        mock_producer.publish = AsyncMock()
+
+        response = client.post(f"/payments/{payment.id}/refund")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "REFUNDED"
+        mock_stripe.create_refund.assert_awaited_once_with("pi_paid", 250.0, idempotency_key=f"refund-{payment.id}")
+        assert mock_transition.await_args_list[0].args[3] == "REFUNDED"
+
+    @patch("src.routes.payments.transition_status", new_callable=AsyncMock)
+    @patch("src.routes.payments.stripe_client")
+    def test_gateway_unavailable_keeps_payment(self, mock_stripe, mock_transition):
+        """No refund at the gateway means no status change"""
+        payment = self._payment()
+        override_db(FakeSession(payment))
+        mock_stripe.create_refund = AsyncMock(side_effect=GatewayUnavailableError("circuit open"))
+
+        response = client.post(f"/payments/{payment.id}/refund")
+
+        assert response.status_code == 503
+        mock_transition.assert_not_awaited()
+
+    @patch("src.routes.payments.stripe_client")
+    def test_refund_exceeding_amount(self, mock_stripe):
+        """Should reject refunds above the paid amount without calling the gateway"""
+        payment = self._payment()
+        override_db(FakeSession(payment))
+        mock_stripe.create_refund = AsyncMock()
+
+        response = client.post(f"/payments/{payment.id}/refund", params={"amount": 999.0})
+
+        assert response.status_code == 400
+        mock_stripe.create_refund.assert_not_awaited()
+
+    @patch("src.routes.payments.producer")
+    @patch("src.routes.payments.transition_status", new_callable=AsyncMock)
+    @patch("src.routes.payments.stripe_client")
+    def test_refund_is_conditional_on_version_read(self, mock_stripe, mock_transition, mock_producer):
+        """The REFUNDED update expects the version read before the gateway call, and re-reads it after a conflict"""
+        payment = self._payment()
+        override_db(FakeSession(payment))
+        mock_stripe.create_refund = AsyncMock(return_value={"id": "re_1"})
+        mock_producer.publish = AsyncMock()
+
+        async def transition(db, model, row_id, status, from_statuses, **kwargs):
+            if status == "REFUNDED" and payment.version == 1:
+                payment.version = 2  # Changed while the gateway call was in flight
+                raise VersionConflictError("changed")
+
+        mock_transition.side_effect = transition
+
+        response = client.post(f"/payments/{payment.id}/refund")
+
+        assert response.status_code == 200
+        payment_calls = [call for call in mock_transition.await_args_list if call.args[3] == "REFUNDED"]
+        assert [call.kwargs["expected_version"] for call in payment_calls] == [1, 2]
+
+
+class TestEventProducer:
+    """Publishing payment events through a real Pub/Sub client"""
+
+    def test_ordered_publish_reaches_transport(self):
+        """Events keyed by booking are sent, not rejected by a client without message ordering"""
+        client_factory = functools.partial(pubsub_v1.PublisherClient, credentials=AnonymousCredentials())
+        with patch.object(events.pubsub_v1, "PublisherClient", client_factory):
+            producer = events.EventProducer()
+        producer.client._gapic_publish = Mock(return_value=PublishResponse(message_ids=["msg-1"]))
+        try:
+            message_id = asyncio.run(producer.publish(events.PAYMENT_TOPIC, {"event_type": "payment.succeeded"}, ordering_key=BOOKING_ID))
+        finally:
+            producer.client.stop()
+
+        assert message_id == "msg-1"
+        (message,) = producer.client._gapic_publish.call_args.kwargs["messages"]
+        assert message.ordering_key == BOOKING_ID
+
+
+class TestStripeAdapter:
+    """Idempotency and circuit breaking in the gateway adapter"""
+
+    def _adapter(self):
+        adapter = StripeAdapter(api_key="sk_test")
+        adapter.latency_range = (0.01, 0.01)
+        adapter.error_rate = 0.0
+        adapter.decline_rate = 0.0
+        return adapter
+
+    def test_same_key_charges_once(self):
+        """Concurrent and later calls with one key share a single gateway request"""
+        adapter = self._adapter()
+
+        async def charge_three_times():
+            first, second = await asyncio.gather(
+                adapter.create_payment_intent(100.0, "USD", "pay-1"),
+                adapter.create_payment_intent(100.0, "USD", "pay-1")
+            )
+            third = await adapter.create_payment_intent(100.0, "USD", "pay-1")
+            return first, second, third
+
+        first, second, third = asyncio.run(charge_three_times())
+        assert first["id"] == second["id"] == third["id"]
+
+    def test_breaker_fails_fast_after_errors(self):
+        """Consecutive API errors open the circuit; later calls are not attempted"""
+        adapter = self._adapter()
+        adapter.error_rate = 1.0
+        for i in range(adapter.breaker.failure_threshold):
+            with pytest.raises(GatewayError):
+                asyncio.run(adapter.create_refund("pi_1", 10.0, f"refund-{i}"))
+        with pytest.raises(GatewayUnavailableError):
+            asyncio.run(adapter.create_refund("pi_1", 10.0, "refund-next"))
+
+
+class TestReconciliation:
+    """Sorted-merge payment/booking reconciliation"""
+
+    def _row(self, **fields):
+        return SimpleNamespace(**fields)
+
+    def test_compare_kinds(self):
+        """Each mismatch between a booking and its payments is reported once"""
+        from src.workers.reconciliation import compare
+
+        booking_id = uuid4()
+        paid = self._row(id=uuid4(), booking_id=booking_id, status="SUCCEEDED", amount=100)
+        refunded = self._row(id=uuid4(), booking_id=booking_id, status="REFUNDED", amount=100)
+
+        def kinds(status, payments):
+            return [d["kind"] for d in compare(self._row(id=booking_id, status=status), payments)]
+
+        assert kinds("PENDING", [paid]) == ["PAID_BOOKING_PENDING"]
+        assert kinds("CANCELLED", [paid]) == ["PAID_BOOKING_CANCELLED"]
+        assert kinds("CONFIRMED", [refunded]) == ["REFUND_ON_ACTIVE_BOOKING"]
+        assert kinds("CONFIRMED", []) == ["CONFIRMED_WITHOUT_PAYMENT"]
+        assert kinds("CONFIRMED", [paid]) == []
+        assert [d["kind"] for d in compare(None, [paid])] == ["PAYMENT_WITHOUT_BOOKING"]
+
+    def test_merge_pairs_streams_by_booking(self):
+        """Payments are grouped with their booking; orphans before, between and after are caught"""
+        from uuid import UUID
+        from src.workers.reconciliation import merge
+
+        ids = [UUID(int=n) for n in range(1, 6)]
+        bookings = [self._row(id=ids[1], status="CONFIRMED"), self._row(id=ids[3], status="PENDING")]
+        payments = [
+            self._row(id=uuid4(), booking_id=ids[0], status="SUCCEEDED", amount=10),  # Orphan before
+            self._row(id=uuid4(), booking_id=ids[1], status="SUCCEEDED", amount=20),
+            self._row(id=uuid4(), booking_id=ids[2], status="REFUNDED", amount=30),  # Orphan between
+            self._row(id=uuid4(), booking_id=ids[3], status="SUCCEEDED", amount=40),
+            self._row(id=uuid4(), booking_id=ids[4], status="SUCCEEDED", amount=50),  # Orphan after
+        ]
+
+        async def stream(rows):
+            for row in rows:
+                yield row
+
+        async def run():
+            counts = {"bookings": 0, "payments": 0}
+            found = [d async for d in merge(stream(bookings), stream(payments), counts)]
+            return found, counts
+
+        found, counts = asyncio.run(run())
+        assert [(d["kind"], d["amount"]) for d in found] == [
+            ("PAYMENT_WITHOUT_BOOKING", 10),
+            ("PAYMENT_WITHOUT_BOOKING", 30),
+            ("PAID_BOOKING_PENDING", 40),
+            ("PAYMENT_WITHOUT_BOOKING", 50),
+        ]
+        assert counts == {"bookings": 2, "payments": 5}
+
+
+class TestBatchRefunds:
+    """Batch refund jobs and their recovery"""
+
+    class Session:
+        def __init__(self, job=None, rows=()):
+            self.job = job
+            self.rows = list(rows)
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, stmt, params=None):
+            if "UPDATE payment_refund_jobs" in str(stmt):
+                return self.rows
+            return Mock(scalar_one=Mock(return_value=self.job))
+
+        async def commit(self):
+            pass
+
+    def test_resumed_job_continues_from_recorded_progress(self):
+        """Only payments still SUCCEEDED are refunded, with the per-payment key; earlier progress is kept"""
+        from src.workers import batch_refunds
+
+        job = SimpleNamespace(flight_id=uuid4(), payment_ids=None, reason="flight cancelled", refunded=3, skipped=0)
+        remaining = SimpleNamespace(id=uuid4(), booking_id=uuid4(), amount=80.0, currency="USD", transaction_id="pi_4")
+        progress = []
+
+        async def record(db, job_id, counts, **kwargs):
+            progress.append((dict(counts), kwargs.get("status")))
+
+        with patch.object(batch_refunds, "AsyncSessionLocal", lambda: self.Session(job)), \
+             patch.object(batch_refunds, "_eligible_payments", AsyncMock(return_value=[remaining])), \
+             patch.object(batch_refunds, "_apply", AsyncMock(return_value={remaining.id})), \
+             patch.object(batch_refunds, "_progress", record), \
+             patch.object(batch_refunds, "stripe_client") as mock_stripe, \
+             patch.object(batch_refunds, "producer") as mock_producer:
+            mock_stripe.create_refund = AsyncMock(return_value={"id": "re_4"})
+            mock_producer.publish = AsyncMock()
+            counts = asyncio.run(batch_refunds.run_job("job-1"))
+
+        assert counts == {"total": 4, "refunded": 4, "failed": 0, "skipped": 0}
+        mock_stripe.create_refund.assert_awaited_once_with("pi_4", 80.0, idempotency_key=f"refund-{remaining.id}")
+        assert progress[-1] == (counts, "COMPLETED")
+
+    def test_stale_jobs_are_resumed(self):
+        """Jobs claimed by the recovery sweep are started on this replica"""
+        from src.workers import batch_refunds
+
+        rows = [SimpleNamespace(id="job-1"), SimpleNamespace(id="job-2")]
+        with patch.object(batch_refunds, "AsyncSessionLocal", lambda: self.Session(rows=rows)), \
+             patch.object(batch_refunds, "start_job") as start_job:
+            resumed = asyncio.run(batch_refunds.resume_stale_jobs())
+
+        assert resumed == ["job-1", "job-2"]
+        assert [call.args[0] for call in start_job.call_args_list] == ["job-1", "job-2"]
+
+
+class TestEmiScheduler:
+    """EMI installment claiming and charging"""
+
+    def test_claim_includes_new_installments_on_due_date(self):
+        """Installments inserted without next_attempt_at become due on their due_date"""
+        from src.workers.emi_scheduler import _CLAIM_SQL
+
+        sql = str(_CLAIM_SQL)
+        assert "next_attempt_at IS NULL AND due_date <= CURRENT_DATE" in sql
+        assert "FOR UPDATE SKIP LOCKED" in sql
+
+    def test_batch_outcomes_are_recorded_per_kind(self):
+        """Paid, failed and gateway-unavailable charges take separate set-based updates fenced by the claim token"""
+        from src.workers import emi_scheduler
+
+        paid, declined, unavailable = (
+            SimpleNamespace(id=uuid4(), amount=100, attempts=n, booking_id=uuid4()) for n in (0, 1, 0)
+        )
+        statements = []
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, stmt, params=None):
+                statements.append((str(stmt), params))
+                if "status = 'PAID'" in str(stmt):
+                    return Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=[paid.id]))))
+                return Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=["PENDING"]))))
+
+            async def commit(self):
+                pass
+
+        async def charge(amount, currency, idempotency_key):
+            if idempotency_key == f"emi-{paid.id}-0":
+                return {"id": "pi_emi"}
+            if idempotency_key == f"emi-{declined.id}-1":
+                raise GatewayError("card declined")
+            raise GatewayUnavailableError("circuit open")
+
+        with patch.object(emi_scheduler, "claim_batch", AsyncMock(return_value=("token", [paid, declined, unavailable]))), \
+             patch.object(emi_scheduler, "AsyncSessionLocal", Session), \
+             patch.object(emi_scheduler.stripe_client, "create_payment_intent", charge):
+            claimed = asyncio.run(emi_scheduler.process_batch(10))
+
+        assert claimed == 3
+        updates = {sql: params for sql, params in statements if "UPDATE emi_installments" in sql}
+        paid_update, failed_update, deferred_update = (
+            next(params for sql, params in updates.items() if marker in sql)
+            for marker in ("status = 'PAID'", "attempts = i.attempts + 1", "make_interval(secs => :delay)")
+        )
+        assert paid_update["ids"] == [paid.id]
+        assert failed_update["ids"] == [declined.id]  # Backoff
+        assert deferred_update["ids"] == [unavailable.id]  # No attempt used
+        assert any("INSERT INTO payments" in sql for sql, _ in statements)
+        assert {params["token"] for params in updates.values()} == {"token"}
+
+
+class TestInvoices:
+    """Month-end invoice numbering and run start-up"""
+
+    def test_invoice_number_uses_whole_payment_id(self):
+        """Payment ids sharing a prefix still get distinct invoice numbers"""
+        from uuid import UUID
+        from src.workers.invoices import invoice_number
+
+        first = UUID("12345678-9abc-4def-8000-000000000001")
+        second = UUID("12345678-9abc-4def-8000-000000000002")
+        assert invoice_number("2026-09", first) != invoice_number("2026-09", second)
+        assert invoice_number("2026-09", first) == f"INV-202609-{first.hex.upper()}"
+
+    def test_scheduled_run_abandons_stale_running_run(self):
+        """A RUNNING run with no recent heartbeat is failed under the lock, then a new run is recorded"""
+        from src.workers import invoices
+
+        statements = []
+        added = []
+
+        class Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def execute(self, stmt):
+                statements.append(stmt)
+                return Mock(scalar=Mock(return_value=True if "advisory" in str(stmt) else None))
+
+            def add(self, obj):
+                added.append(obj)
+
+            async def commit(self):
+                pass
+
+        with patch.object(invoices, "AsyncSessionLocal", Session):
+            run_id = asyncio.run(invoices.start_scheduled_run("2026-09"))
+
+        abandon = str(statements[1])
+        assert "UPDATE invoice_runs" in abandon and "invoice_runs.heartbeat_at <" in abandon
+        assert statements[1].compile().params["status"] == "FAILED"
+        assert run_id == added[0].id and added[0].status == "RUNNING"
+
@@ -1,8 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
+import asyncio
 import logging
-from src.routes import calculate
+from contextlib import asynccontextmanager
+from src.database import AsyncSessionLocal, engine
+from src.promotions import load_promotion_index, run_counter_sync
+from src.routes import calculate, promotions
 
 # Configure logging
 logging.basicConfig(
@@ -12,11 +16,28 @@ logging.basicConfig(
 
 logger = logging.getLogger("pricing-service")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: Compile promotion rules once so the first quotes don't pay for it,
+    # and provision redemption counters in the background (first run is immediate)
+    try:
+        async with AsyncSessionLocal() as session:
+            await load_promotion_index(session)
+    except Exception as e:
+        logger.warning(f"Promotion index warm-up failed, will compile on first use: {e}")
+    counter_sync = asyncio.create_task(run_counter_sync())
+    yield
+    # Shutdown
+    counter_sync.cancel()
+    await asyncio.gather(counter_sync, return_exceptions=True)
+    await engine.dispose()
+
 # Create FastAPI app
 app = FastAPI(
     title="JourneyIQ Pricing Service",
     description="Dynamic pricing calculation with taxes, fees, and add-ons",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -33,6 +54,7 @@ Instrumentator().instrument(app).expose(app)
 
 # Include routers
 app.include_router(calculate.router)
+app.include_router(promotions.router, prefix="/promotions")
 
 @app.get("/health")
 async def health_check():
@@ -49,6 +71,8 @@ async def root():
             "calculate": "/pricing/calculate",
             "add_ons": "/pricing/add-ons",
             "class_types": "/pricing/class-types",
+            "applicable_promotions": "GET /promotions/applicable",
+            "redeem_promotion": "POST /promotions/redeem",
             "health": "/health"
         }
     }
@@ -31,4 +31,12 @@ class Settings(BaseSettings):
         "extra_legroom": 40.00
     }
 
+    # Promotions
+    PROMOTION_REFRESH_SECONDS: int = 60  # Rebuild compiled promotion index after this age
+    PROMOTION_COUNTER_SHARDS: int = 8  # Usage counter rows per promotion
+    PROMOTION_COUNTER_SYNC_SECONDS: int = 60  # Shard provisioning and current_uses roll-up interval
+
+    # Batch pricing
+    MAX_BATCH_ITEMS: int = 200
+
 settings = Settings()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, TIMESTAMP, DECIMAL
+from sqlalchemy import Column, String, TIMESTAMP, DECIMAL, Integer, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -23,3 +23,38 @@ class Hotel(Base):
     name = Column(String(255), nullable=False)
     location = Column(String(255), nullable=False)
     rating = Column(DECIMAL(2, 1))
+
+class Promotion(Base):
+    __tablename__ = "promotions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    code = Column(String(50), unique=True, nullable=False)
+    discount_type = Column(String(20))  # fixed_amount, percentage
+    discount_value = Column(DECIMAL(10, 2))
+    valid_from = Column(TIMESTAMP(timezone=True))
+    valid_until = Column(TIMESTAMP(timezone=True))
+    max_uses = Column(Integer)
+    current_uses = Column(Integer, default=0)
+    is_active = Column(Boolean, default=True)
+    # Targeting (NULL matches any route / class)
+    origin = Column(String(3))
+    destination = Column(String(3))
+    class_type = Column(String(20))
+
+class PromotionUsage(Base):
+    __tablename__ = "promotion_usage"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    promotion_id = Column(UUID(as_uuid=True), nullable=False)
+    user_id = Column(UUID(as_uuid=True))
+    booking_id = Column(UUID(as_uuid=True))
+    credit_applied = Column(DECIMAL(10, 2))
+    used_at = Column(TIMESTAMP(timezone=True))
+
+class PromotionUsageCounter(Base):
+    __tablename__ = "promotion_usage_counters"
+
+    promotion_id = Column(UUID(as_uuid=True), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    uses = Column(Integer, nullable=False, default=0)
+    capacity = Column(Integer)  # NULL = unlimited
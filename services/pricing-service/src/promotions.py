@@ -0,0 +1,366 @@
+"""
+Promotion evaluation for pricing quotes.
+
+Active promotions are compiled once into an in-memory index keyed by
+(origin, destination, class_type), with NULL targeting stored under a
+wildcard key. A quote probes at most 8 buckets and bisects each bucket
+by valid_from, so lookup cost does not grow with the number of rules.
+
+Redemptions are counted in sharded rows (promotion_usage_counters) so
+concurrent checkouts for the same promotion don't serialize on one lock.
+A background sync (run_counter_sync) provisions and rebalances the shards
+and rolls their uses up into promotions.current_uses, off the quote path.
+A promotion redeemed before the sync has seen it gets its shards on demand.
+"""
+import asyncio
+import bisect
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.models import Promotion, PromotionUsage
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+
+_SYNC_LOCK_SQL = text("SELECT pg_try_advisory_xact_lock(hashtext('promotion-counters'))")
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+_FOREVER = datetime.max.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class CompiledPromotion:
+    """Immutable snapshot of a promotion rule used for quote-time evaluation."""
+    id: UUID
+    code: str
+    discount_type: str
+    discount_value: float
+    valid_from: datetime
+    valid_until: datetime
+    max_uses: Optional[int]
+
+    def discount_for(self, amount: float) -> float:
+        """Discount this promotion grants on `amount` (never more than amount)."""
+        if self.discount_type == "percentage":
+            discount = amount * self.discount_value / 100.0
+        else:
+            discount = self.discount_value
+        return round(min(max(discount, 0.0), amount), 2)
+
+
+@dataclass
+class _Bucket:
+    starts: List[datetime] = field(default_factory=list)
+    rules: List[CompiledPromotion] = field(default_factory=list)
+
+
+def _aware(value: Optional[datetime], default: datetime) -> datetime:
+    if value is None:
+        return default
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _key_part(value: Optional[str]) -> str:
+    return value.upper() if value else WILDCARD
+
+
+class PromotionIndex:
+    """
+    Route/class/date index over compiled promotions.
+
+    Usage:
+        index = PromotionIndex.compile(promotions)
+        rules = index.lookup("JFK", "LHR", "economy", departure_time)
+    """
+
+    def __init__(self, buckets: Dict[Tuple[str, str, str], _Bucket], by_code: Dict[str, CompiledPromotion]):
+        self._buckets = buckets
+        self._by_code = by_code
+        self.compiled_at = time.monotonic()
+
+    @classmethod
+    def compile(cls, promotions: List[Promotion]) -> "PromotionIndex":
+        """Build the index from promotion rows (inactive rows are skipped)."""
+        staged: Dict[Tuple[str, str, str], List[CompiledPromotion]] = {}
+        by_code: Dict[str, CompiledPromotion] = {}
+
+        for promo in promotions:
+            if not promo.is_active:
+                continue
+            rule = CompiledPromotion(
+                id=promo.id,
+                code=promo.code.upper(),
+                discount_type=(promo.discount_type or "fixed_amount").lower(),
+                discount_value=float(promo.discount_value or 0),
+                valid_from=_aware(promo.valid_from, _EPOCH),
+                valid_until=_aware(promo.valid_until, _FOREVER),
+                max_uses=promo.max_uses,
+            )
+            key = (_key_part(promo.origin), _key_part(promo.destination), _key_part(promo.class_type))
+            staged.setdefault(key, []).append(rule)
+            by_code[rule.code] = rule
+
+        buckets = {}
+        for key, rules in staged.items():
+            rules.sort(key=lambda r: r.valid_from)
+            buckets[key] = _Bucket(starts=[r.valid_from for r in rules], rules=rules)
+
+        return cls(buckets, by_code)
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        return time.monotonic() - self.compiled_at > max_age_seconds
+
+    def lookup(self, origin: str, destination: str, class_type: str, when: datetime) -> List[CompiledPromotion]:
+        """Return all promotions applicable to a route/class on a given date."""
+        when = _aware(when, _EPOCH)
+        matches = []
+        for key in product(
+            (origin.upper(), WILDCARD),
+            (destination.upper(), WILDCARD),
+            (class_type.upper(), WILDCARD),
+        ):
+            bucket = self._buckets.get(key)
+            if not bucket:
+                continue
+            # Rules that have started by `when`; only their end date needs checking
+            end = bisect.bisect_right(bucket.starts, when)
+            matches.extend(r for r in bucket.rules[:end] if r.valid_until >= when)
+        return matches
+
+    def find(self, code: str, origin: str, destination: str, class_type: str, when: datetime) -> Optional[CompiledPromotion]:
+        """Return the promotion for `code` if it applies to this quote."""
+        rule = self._by_code.get(code.upper())
+        if not rule:
+            return None
+        for candidate in self.lookup(origin, destination, class_type, when):
+            if candidate.id == rule.id:
+                return rule
+        return None
+
+    def get(self, code: str) -> Optional[CompiledPromotion]:
+        return self._by_code.get(code.upper())
+
+
+_index: Optional[PromotionIndex] = None
+_index_lock = asyncio.Lock()
+
+
+async def load_promotion_index(db: AsyncSession) -> PromotionIndex:
+    """Compile active promotions from the database (read-only)."""
+    global _index
+    result = await db.execute(select(Promotion).where(Promotion.is_active.is_(True)))
+    index = PromotionIndex.compile(result.scalars().all())
+
+    _index = index
+    logger.info(f"Compiled promotion index with {len(index)} active promotions")
+    return index
+
+
+async def get_promotion_index(db: AsyncSession) -> PromotionIndex:
+    """Return the compiled index, rebuilding it when older than the refresh window."""
+    if _index is not None and not _index.is_stale(settings.PROMOTION_REFRESH_SECONDS):
+        return _index
+    async with _index_lock:
+        # Another request may have refreshed it while we waited
+        if _index is not None and not _index.is_stale(settings.PROMOTION_REFRESH_SECONDS):
+            return _index
+        return await load_promotion_index(db)
+
+
+def invalidate_promotion_index():
+    """Force the next quote to recompile the index (after rule changes)."""
+    global _index
+    _index = None
+
+
+def shard_capacities(max_uses: Optional[int], uses: Dict[int, int], shards: int) -> Dict[int, Optional[int]]:
+    """
+    Capacity for each counter shard of a promotion.
+
+    Shards in the redemption ring keep what they have used plus an even
+    split of the uses left under max_uses, so capacities always sum to
+    max_uses. Shards outside the ring (after PROMOTION_COUNTER_SHARDS
+    shrinks) are frozen at their current uses.
+    """
+    remaining = None if max_uses is None else max(max_uses - sum(uses.values()), 0)
+    capacities = {}
+    for shard in sorted(set(range(shards)) | set(uses)):
+        used = uses.get(shard, 0)
+        if shard >= shards:
+            capacities[shard] = used
+        elif remaining is None:
+            capacities[shard] = None
+        else:
+            capacities[shard] = used + remaining // shards + (1 if shard < remaining % shards else 0)
+    return capacities
+
+
+async def sync_counter_shards(db: AsyncSession) -> bool:
+    """
+    Provision and rebalance counter shards for active promotions, then roll
+    shard uses up into promotions.current_uses. Commits.
+
+    Only missing shards and shards whose capacity changed (max_uses or
+    PROMOTION_COUNTER_SHARDS edits) are written. Uses recorded before a
+    promotion was sharded are carried over onto its shard 0. Returns False
+    when another replica holds the sync lock.
+    """
+    if not (await db.execute(_SYNC_LOCK_SQL)).scalar():
+        await db.rollback()
+        return False
+
+    result = await db.execute(select(Promotion).where(Promotion.is_active.is_(True)))
+    promotions = result.scalars().all()
+    counters: Dict[UUID, Dict[int, Tuple[int, Optional[int]]]] = {}
+    for row in await db.execute(text("SELECT promotion_id, shard, uses, capacity FROM promotion_usage_counters")):
+        counters.setdefault(row.promotion_id, {})[row.shard] = (row.uses, row.capacity)
+
+    rows = []
+    for promo in promotions:
+        existing = counters.get(promo.id)
+        if existing is None:
+            existing = {}
+            uses = {0: promo.current_uses or 0}
+        else:
+            uses = {shard: used for shard, (used, _) in existing.items()}
+        for shard, capacity in shard_capacities(promo.max_uses, uses, settings.PROMOTION_COUNTER_SHARDS).items():
+            if shard in existing and existing[shard][1] == capacity:
+                continue
+            rows.append({"promotion_id": promo.id, "shard": shard, "uses": uses.get(shard, 0), "capacity": capacity})
+
+    if rows:
+        await db.execute(
+            text(
+                "INSERT INTO promotion_usage_counters (promotion_id, shard, uses, capacity) "
+                "VALUES (:promotion_id, :shard, :uses, :capacity) "
+                "ON CONFLICT (promotion_id, shard) DO UPDATE SET capacity = EXCLUDED.capacity"
+            ),
+            rows,
+        )
+    await db.execute(text(
+        "UPDATE promotions p SET current_uses = c.total "
+        "FROM (SELECT promotion_id, SUM(uses) AS total FROM promotion_usage_counters GROUP BY promotion_id) c "
+        "WHERE p.id = c.promotion_id AND p.current_uses IS DISTINCT FROM c.total"
+    ))
+    await db.commit()
+    if rows:
+        logger.info(f"Synced {len(rows)} promotion counter shards")
+    return True
+
+
+async def run_counter_sync() -> None:
+    """Counter sync loop; runs until cancelled."""
+    interval = settings.PROMOTION_COUNTER_SYNC_SECONDS
+    logger.info(f"Promotion counter sync started (interval={interval}s)")
+    while True:
+        try:
+            async with AsyncSessionLocal() as session:
+                await sync_counter_shards(session)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Promotion counter sync failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def _provision_missing_shards(db: AsyncSession, promotion: CompiledPromotion) -> bool:
+    """
+    Create the counter shards of a promotion that has none yet (created or
+    activated since the last sync). Returns False if it already had shards.
+    """
+    existing = await db.execute(
+        text("SELECT 1 FROM promotion_usage_counters WHERE promotion_id = :promotion_id LIMIT 1"),
+        {"promotion_id": promotion.id},
+    )
+    if existing.first() is not None:
+        return False
+
+    # Uses recorded before sharding land on shard 0, as in sync_counter_shards
+    current_uses = (await db.execute(
+        select(Promotion.current_uses).where(Promotion.id == promotion.id)
+    )).scalar() or 0
+    uses = {0: current_uses}
+    rows = [
+        {"promotion_id": promotion.id, "shard": shard, "uses": uses.get(shard, 0), "capacity": capacity}
+        for shard, capacity in shard_capacities(promotion.max_uses, uses, settings.PROMOTION_COUNTER_SHARDS).items()
+    ]
+    # A concurrent redemption or the sync may have created them first
+    await db.execute(
+        text(
+            "INSERT INTO promotion_usage_counters (promotion_id, shard, uses, capacity) "
+            "VALUES (:promotion_id, :shard, :uses, :capacity) "
+            "ON CONFLICT (promotion_id, shard) DO NOTHING"
+        ),
+        rows,
+    )
+    logger.info(f"Provisioned counter shards for promotion {promotion.code} on first redemption")
+    return True
+
+
+async def redeem_promotion(
+    db: AsyncSession,
+    promotion: CompiledPromotion,
+    credit_applied: float,
+    user_id: Optional[str] = None,
+    booking_id: Optional[str] = None,
+) -> bool:
+    """
+    Atomically consume one use of a promotion.
+
+    Starts at a random shard and walks the ring until a shard with spare
+    capacity accepts the conditional increment. Returns False when every
+    shard is exhausted. Missing shards are provisioned once and the ring is
+    walked again. The caller owns the transaction.
+    """
+    shards = settings.PROMOTION_COUNTER_SHARDS
+    start = random.randrange(shards)
+
+    for offset in range(shards):
+        shard = (start + offset) % shards
+        result = await db.execute(
+            text(
+                "UPDATE promotion_usage_counters SET uses = uses + 1 "
+                "WHERE promotion_id = :promotion_id AND shard = :shard "
+                "AND (capacity IS NULL OR uses < capacity) "
+                "RETURNING uses"
+            ),
+            {"promotion_id": promotion.id, "shard": shard},
+        )
+        if result.first() is not None:
+            db.add(PromotionUsage(
+                id=uuid4(),
+                promotion_id=promotion.id,
+                user_id=user_id,
+                booking_id=booking_id,
+                credit_applied=credit_applied,
+                used_at=datetime.utcnow(),
+            ))
+            return True
+
+    if await _provision_missing_shards(db, promotion):
+        return await redeem_promotion(db, promotion, credit_applied, user_id, booking_id)
+    return False
+
+
+async def get_usage_count(db: AsyncSession, promotion_id: UUID) -> int:
+    """Total redemptions across all shards (promotions.current_uses lags by one sync)."""
+    result = await db.execute(
+        text("SELECT COALESCE(SUM(uses), 0) FROM promotion_usage_counters WHERE promotion_id = :promotion_id"),
+        {"promotion_id": promotion_id},
+    )
+    return int(result.scalar_one())
@@ -7,6 +7,7 @@ from decimal import Decimal
 from src.database import get_db
 from src.models import Flight
 from src.config import settings
+from src.promotions import get_promotion_index
 
 router = APIRouter(tags=["pricing"])
 
@@ -16,6 +17,7 @@ class PricingRequest(BaseModel):
     passengers: int = 1
     class_type: str = "economy"  # economy, premium, business, first
     add_ons: List[str] = []  # baggage, seat_selection, priority_boarding, meal, wifi
+    promo_code: Optional[str] = None
 
 class PriceBreakdown(BaseModel):
     base_price: float
@@ -24,6 +26,7 @@ class PriceBreakdown(BaseModel):
     taxes: float
     fees: float
     add_ons_total: float
+    discount: float = 0.0
     total: float
     per_passenger: float
 
@@ -34,25 +37,18 @@ class PricingResponse(BaseModel):
     currency: str = "USD"
     breakdown: PriceBreakdown
     add_ons_detail: dict
+    promotion: Optional[dict] = None
 
-@router.post("/calculate", response_model=PricingResponse)
-async def calculate_pricing(
-    request: PricingRequest,
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Calculate total price for a flight booking.
-    Includes base price, class multiplier, taxes, fees, and add-ons.
-    """
-    # Get flight from database
-    result = await db.execute(
-        select(Flight).where(Flight.id == request.flight_id)
-    )
-    flight = result.scalar_one_or_none()
-    
-    if not flight:
-        raise HTTPException(status_code=404, detail="Flight not found")
-    
+class BatchPricingRequest(BaseModel):
+    items: List[PricingRequest]
+
+class BatchPricingResponse(BaseModel):
+    results: List[PricingResponse]
+    total: float
+    currency: str = "USD"
+
+def _quote(request: PricingRequest, flight: Flight, promotion_index=None) -> PricingResponse:
+    """Price one request against an already-loaded flight."""
     # Base price from database
     base_price = float(flight.base_price)
     
@@ -79,8 +75,30 @@ async def calculate_pricing(
             }
             add_ons_total += addon_total
     
-    # Calculate total
+    # Apply promotion (compiled index lookup by route/class/departure date)
     total = subtotal + taxes + fees + add_ons_total
+    discount = 0.0
+    promotion_detail = None
+    if request.promo_code:
+        promotion = promotion_index.find(
+            request.promo_code,
+            flight.origin,
+            flight.destination,
+            request.class_type,
+            flight.departure_time
+        )
+        if not promotion:
+            raise HTTPException(status_code=400, detail="Promotion code not applicable to this flight")
+        discount = promotion.discount_for(total)
+        promotion_detail = {
+            "code": promotion.code,
+            "discount_type": promotion.discount_type,
+            "discount_value": promotion.discount_value,
+            "discount": discount
+        }
+    
+    # Calculate total
+    total -= discount
     per_passenger = total / request.passengers
     
     breakdown = PriceBreakdown(
@@ -90,6 +108,7 @@ async def calculate_pricing(
         taxes=round(taxes, 2),
         fees=round(fees, 2),
         add_ons_total=round(add_ons_total, 2),
+        discount=round(discount, 2),
         total=round(total, 2),
         per_passenger=round(per_passenger, 2)
     )
@@ -100,7 +119,68 @@ async def calculate_pricing(
         class_type=request.class_type,
         currency="USD",
         breakdown=breakdown,
-        add_ons_detail=add_ons_detail
+        add_ons_detail=add_ons_detail,
+        promotion=promotion_detail
+    )
+
+@router.post("/calculate", response_model=PricingResponse)
+async def calculate_pricing(
+    request: PricingRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Calculate total price for a flight booking.
+    Includes base price, class multiplier, taxes, fees, and add-ons.
+    """
+    # Get flight from database
+    result = await db.execute(
+        select(Flight).where(Flight.id == request.flight_id)
+    )
+    flight = result.scalar_one_or_none()
+    
+    if not flight:
+        raise HTTPException(status_code=404, detail="Flight not found")
+    
+    promotion_index = await get_promotion_index(db) if request.promo_code else None
+    return _quote(request, flight, promotion_index)
+
+@router.post("/calculate/batch", response_model=BatchPricingResponse)
+async def calculate_pricing_batch(
+    request: BatchPricingRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Price many bookings in one call (group / corporate bookings).
+    All flights are loaded with a single query; results are returned in
+    request order. Any unknown flight or inapplicable promotion fails the
+    whole batch, naming the offending item.
+    """
+    if not request.items:
+        return BatchPricingResponse(results=[], total=0.0)
+    if len(request.items) > settings.MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.MAX_BATCH_ITEMS} items per batch")
+    
+    flight_ids = {item.flight_id for item in request.items}
+    result = await db.execute(select(Flight).where(Flight.id.in_(flight_ids)))
+    flights = {str(flight.id): flight for flight in result.scalars().all()}
+    
+    promotion_index = None
+    if any(item.promo_code for item in request.items):
+        promotion_index = await get_promotion_index(db)
+    
+    results = []
+    for i, item in enumerate(request.items):
+        flight = flights.get(item.flight_id.lower())
+        if not flight:
+            raise HTTPException(status_code=404, detail=f"Item {i}: Flight not found")
+        try:
+            results.append(_quote(item, flight, promotion_index))
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Item {i}: {e.detail}")
+    
+    return BatchPricingResponse(
+        results=results,
+        total=round(sum(r.breakdown.total for r in results), 2)
     )
 
 @router.get("/add-ons")
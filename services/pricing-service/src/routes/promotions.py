@@ -0,0 +1,127 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional
+from pydantic import BaseModel
+from src.database import get_db
+from src.models import Flight
+from src.promotions import (
+    get_promotion_index,
+    load_promotion_index,
+    redeem_promotion,
+    get_usage_count,
+    sync_counter_shards,
+)
+
+router = APIRouter(tags=["promotions"])
+
+# Request/Response Models
+class RedeemRequest(BaseModel):
+    code: str
+    flight_id: str
+    class_type: str = "economy"
+    credit_applied: float
+    user_id: Optional[str] = None
+    booking_id: Optional[str] = None
+
+@router.get("/applicable")
+async def list_applicable_promotions(
+    flight_id: str,
+    class_type: str = "economy",
+    db: AsyncSession = Depends(get_db)
+):
+    """List promotions that apply to a flight and cabin class."""
+    result = await db.execute(
+        select(Flight).where(Flight.id == flight_id)
+    )
+    flight = result.scalar_one_or_none()
+
+    if not flight:
+        raise HTTPException(status_code=404, detail="Flight not found")
+
+    index = await get_promotion_index(db)
+    promotions = index.lookup(flight.origin, flight.destination, class_type, flight.departure_time)
+
+    return {
+        "flight_id": flight_id,
+        "class_type": class_type,
+        "promotions": [
+            {
+                "code": p.code,
+                "discount_type": p.discount_type,
+                "discount_value": p.discount_value,
+                "valid_until": p.valid_until.isoformat()
+            }
+            for p in promotions
+        ]
+    }
+
+@router.post("/redeem")
+async def redeem(
+    request: RedeemRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Record a promotion use at checkout.
+    The code must apply to the flight's route, class and departure date, as at quote time.
+    Uses a sharded counter so concurrent redemptions don't contend on one row.
+    """
+    result = await db.execute(
+        select(Flight).where(Flight.id == request.flight_id)
+    )
+    flight = result.scalar_one_or_none()
+
+    if not flight:
+        raise HTTPException(status_code=404, detail="Flight not found")
+
+    index = await get_promotion_index(db)
+    if not index.get(request.code):
+        raise HTTPException(status_code=404, detail="Promotion not found")
+
+    promotion = index.find(request.code, flight.origin, flight.destination, request.class_type, flight.departure_time)
+    if not promotion:
+        raise HTTPException(status_code=400, detail="Promotion code not applicable to this flight")
+
+    redeemed = await redeem_promotion(
+        db,
+        promotion,
+        credit_applied=request.credit_applied,
+        user_id=request.user_id,
+        booking_id=request.booking_id
+    )
+    if not redeemed:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Promotion usage limit reached")
+
+    await db.commit()
+
+    return {
+        "code": promotion.code,
+        "redeemed": True,
+        "credit_applied": request.credit_applied
+    }
+
+@router.get("/{code}/usage")
+async def get_promotion_usage(
+    code: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get total redemptions for a promotion."""
+    index = await get_promotion_index(db)
+    promotion = index.get(code)
+
+    if not promotion:
+        raise HTTPException(status_code=404, detail="Promotion not found")
+
+    return {
+        "code": promotion.code,
+        "uses": await get_usage_count(db, promotion.id),
+        "max_uses": promotion.max_uses
+    }
+
+@router.post("/refresh")
+async def refresh_promotions(db: AsyncSession = Depends(get_db)):
+    """Resize counter shards and recompile the promotion index (admin endpoint, after rule changes)."""
+    await sync_counter_shards(db)
+    index = await load_promotion_index(db)
+    return {"status": "refreshed", "active_promotions": len(index)}
@@ -0,0 +1,179 @@
+"""
+Unit tests for Pricing Service
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, patch
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+from main import app
+from src.database import get_db
+from src.config import settings
+from src.promotions import PromotionIndex, redeem_promotion, shard_capacities
+
+client = TestClient(app)
+
+NOW = datetime.now(timezone.utc)
+
+
+def promotion(code, valid_from, valid_until, origin=None, destination=None, class_type=None, max_uses=None):
+    return SimpleNamespace(
+        id=uuid4(), code=code, discount_type="percentage", discount_value=10, is_active=True,
+        valid_from=valid_from, valid_until=valid_until, max_uses=max_uses,
+        origin=origin, destination=destination, class_type=class_type
+    )
+
+
+INDEX = PromotionIndex.compile([
+    promotion("SUMMER", NOW - timedelta(days=10), NOW + timedelta(days=30)),
+    promotion("EXPIRED", NOW - timedelta(days=60), NOW - timedelta(days=1)),
+    promotion("LATER", NOW + timedelta(days=100), NOW + timedelta(days=200)),
+    promotion("JFKLHR", NOW - timedelta(days=1), NOW + timedelta(days=30), origin="JFK", destination="LHR"),
+])
+
+
+class TestHealthEndpoint:
+    """Test health check endpoint"""
+
+    def test_health_check_returns_200(self):
+        """Health endpoint should return 200 OK"""
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "healthy"
+
+
+class TestPromotionIndex:
+    """Compiled promotion lookup"""
+
+    def test_find_checks_dates_and_route(self):
+        """A code applies only inside its window and on its route"""
+        departure = NOW + timedelta(days=5)
+        assert INDEX.find("summer", "JFK", "CDG", "economy", departure).code == "SUMMER"
+        assert INDEX.find("EXPIRED", "JFK", "CDG", "economy", departure) is None
+        assert INDEX.find("LATER", "JFK", "CDG", "economy", departure) is None
+        assert INDEX.find("JFKLHR", "JFK", "LHR", "business", departure) is not None
+        assert INDEX.find("JFKLHR", "JFK", "CDG", "business", departure) is None
+
+    def test_get_ignores_dates(self):
+        """get() is a plain code lookup (usage reporting only)"""
+        assert INDEX.get("expired").code == "EXPIRED"
+
+
+class TestRedeem:
+    """POST /promotions/redeem"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def redeem(self, code, departure):
+        flight = SimpleNamespace(id=uuid4(), origin="JFK", destination="CDG", departure_time=departure)
+        db = Mock(
+            execute=AsyncMock(return_value=Mock(scalar_one_or_none=Mock(return_value=flight))),
+            commit=AsyncMock(), rollback=AsyncMock()
+        )
+
+        async def get_fake_db():
+            yield db
+        app.dependency_overrides[get_db] = get_fake_db
+        with patch("src.routes.promotions.get_promotion_index", AsyncMock(return_value=INDEX)), \
+                patch("src.routes.promotions.redeem_promotion", AsyncMock(return_value=True)) as redeem:
+            response = client.post("/promotions/redeem", json={
+                "code": code, "flight_id": str(flight.id), "class_type": "economy", "credit_applied": 25.0
+            })
+        return response, redeem
+
+    def test_redeems_valid_code(self):
+        response, redeem = self.redeem("SUMMER", NOW + timedelta(days=5))
+        assert response.status_code == 200
+        redeem.assert_awaited_once()
+
+    def test_expired_code_is_not_redeemed(self):
+        """Redemption applies the same date check as quoting"""
+        response, redeem = self.redeem("EXPIRED", NOW + timedelta(days=5))
+        assert response.status_code == 400
+        redeem.assert_not_awaited()
+
+    def test_unknown_code(self):
+        response, redeem = self.redeem("NOPE", NOW + timedelta(days=5))
+        assert response.status_code == 404
+
+
+class TestShardCapacities:
+    """Splitting max_uses across counter shards"""
+
+    def test_capacities_sum_to_max_uses(self):
+        capacities = shard_capacities(100, {}, 8)
+        assert sum(capacities.values()) == 100
+        assert max(capacities.values()) - min(capacities.values()) <= 1
+
+    def test_uses_are_kept_when_rebalancing(self):
+        """A raised max_uses adds capacity on top of what each shard used"""
+        capacities = shard_capacities(200, {0: 30, 1: 10}, 2)
+        assert capacities == {0: 30 + 80, 1: 10 + 80}
+
+    def test_exhausted_promotion(self):
+        """A lowered max_uses never hands out more uses"""
+        assert shard_capacities(5, {0: 4, 1: 3}, 2) == {0: 4, 1: 3}
+
+    def test_shards_outside_ring_are_frozen(self):
+        """Shrinking PROMOTION_COUNTER_SHARDS freezes the dropped shards"""
+        capacities = shard_capacities(100, {0: 5, 1: 5, 2: 5, 3: 5}, 2)
+        assert capacities[2] == 5 and capacities[3] == 5
+        assert sum(capacities.values()) == 100
+
+    def test_unlimited(self):
+        assert shard_capacities(None, {0: 7}, 2) == {0: None, 1: None}
+
+
+class FakeCounters:
+    """promotion_usage_counters in memory: (promotion_id, shard) -> [uses, capacity]."""
+
+    def __init__(self, current_uses=0):
+        self.shards = {}
+        self.current_uses = current_uses
+        self.added = []
+
+    async def execute(self, stmt, params=None):
+        sql = str(stmt)
+        if sql.startswith("UPDATE promotion_usage_counters"):
+            counter = self.shards.get((params["promotion_id"], params["shard"]))
+            if counter is None or (counter[1] is not None and counter[0] >= counter[1]):
+                return Mock(first=Mock(return_value=None))
+            counter[0] += 1
+            return Mock(first=Mock(return_value=(counter[0],)))
+        if sql.startswith("SELECT 1 FROM promotion_usage_counters"):
+            found = any(pid == params["promotion_id"] for pid, _ in self.shards)
+            return Mock(first=Mock(return_value=(1,) if found else None))
+        if sql.startswith("INSERT INTO promotion_usage_counters"):
+            for row in params:
+                self.shards.setdefault((row["promotion_id"], row["shard"]), [row["uses"], row["capacity"]])
+            return Mock()
+        return Mock(scalar=Mock(return_value=self.current_uses))  # SELECT promotions.current_uses
+
+    def add(self, obj):
+        self.added.append(obj)
+
+
+class TestRedeemPromotion:
+    """Sharded redemption counters"""
+
+    def test_new_promotion_gets_shards_on_demand(self):
+        """A promotion the sync has not provisioned yet is still redeemable"""
+        promo = INDEX.get("SUMMER")
+        db = FakeCounters()
+        assert asyncio.run(redeem_promotion(db, promo, credit_applied=10.0))
+        assert len(db.shards) == settings.PROMOTION_COUNTER_SHARDS
+        assert len(db.added) == 1
+
+    def test_limit_is_enforced_across_shards(self):
+        """max_uses counts uses recorded before sharding, and is never exceeded"""
+        promo = PromotionIndex.compile([
+            promotion("LIMITED", NOW - timedelta(days=1), NOW + timedelta(days=1), max_uses=5)
+        ]).get("LIMITED")
+        db = FakeCounters(current_uses=2)
+        results = [asyncio.run(redeem_promotion(db, promo, credit_applied=1.0)) for _ in range(5)]
+        assert results == [True, True, True, False, False]
+        assert sum(uses for uses, _ in db.shards.values()) == 5
@@ -1,8 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
+from contextlib import asynccontextmanager
 import logging
 from src.routes import tickets
+from src.renderer import render_pool
+from src.signing import check_signing_keys
 
 # Configure logging
 logging.basicConfig(
@@ -12,11 +15,22 @@ logging.basicConfig(
 
 logger = logging.getLogger("ticketing-service")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: Refuse unusable QR signing keys, then the boarding pass render pool
+    # (worker processes spawn on first use)
+    check_signing_keys()
+    render_pool.start()
+    yield
+    # Shutdown: Finish in-flight renders and stop worker processes
+    render_pool.stop()
+
 # Create FastAPI app
 app = FastAPI(
     title="JourneyIQ Ticketing Service",
     description="E-ticket generation with PDF and QR code support",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -47,10 +61,14 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "generate_ticket": "POST /ticketing/generate",
+            "generate_tickets_batch": "POST /ticketing/generate/batch",
             "get_ticket": "GET /ticketing/{id}",
             "download_pdf": "GET /ticketing/{id}/download",
+            "download_booking_zip": "GET /ticketing/bookings/{booking_id}/download",
+            "download_flight_zip": "GET /ticketing/flights/{flight_id}/download",
             "validate_ticket": "POST /ticketing/{id}/validate",
             "use_ticket": "POST /ticketing/{id}/use",
+            "gate_scans": "POST /ticketing/scans",
             "health": "/health"
         }
     }
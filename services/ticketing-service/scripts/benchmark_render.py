@@ -0,0 +1,92 @@
+"""
+Per-PDF boarding pass render time, before and after the static template.
+
+    cd services/ticketing-service && python -m scripts.benchmark_render [--iterations 200]
+
+"before" reproduces the previous renderer: the whole page drawn inline
+and the QR code rasterized with PIL and embedded as a PNG image.
+"after" is src.boarding_pass.render_boarding_pass: static layer as a
+form XObject, dynamic fields and a vector QR code on top.
+"""
+import argparse
+import io
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import qrcode
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from src.boarding_pass import PAGE_SIZE, _draw_dynamic, _draw_static, render_boarding_pass
+
+
+def render_before(ticket: dict) -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+    _draw_static(c)
+    _draw_dynamic(c, ticket)
+    
+    qr = qrcode.QRCode(version=1, box_size=10, border=1)
+    qr.add_data(ticket['qr_code_data'])
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+    qr_buffer = io.BytesIO()
+    qr_img.save(qr_buffer, format='PNG')
+    qr_buffer.seek(0)
+    c.drawImage(ImageReader(qr_buffer), 6.15*inch, 0.3*inch, width=1.3*inch, height=1.3*inch)
+    
+    c.save()
+    return buffer.getvalue()
+
+
+def sample_ticket(i: int) -> dict:
+    ticket_id = f"{i:08x}-4f6b-4c1a-9d0e-5b7f3c2a1e90"
+    departure = datetime(2026, 12, 1, 9, 30, tzinfo=timezone.utc) + timedelta(hours=i)
+    return {
+        "ticket_id": ticket_id,
+        "passenger_name": f"Passenger {i}",
+        "flight_number": f"JQ{100 + i % 900}",
+        "origin": "LHR",
+        "destination": "JFK",
+        "departure_time": departure,
+        "seat_number": f"{1 + i % 40}{'ABCDEF'[i % 6]}",
+        "qr_code_data": f"TICKET:{ticket_id}|BOOKING:{ticket_id}|FLIGHT:JQ{100 + i % 900}"
+    }
+
+
+def measure(render, iterations: int) -> dict:
+    render(sample_ticket(0))  # Warm up imports and font metrics
+    timings, sizes = [], []
+    for i in range(iterations):
+        start = time.perf_counter()
+        pdf = render(sample_ticket(i))
+        timings.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(pdf))
+    timings.sort()
+    return {
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "bytes": int(statistics.mean(sizes))
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    
+    results = {
+        "before": measure(render_before, args.iterations),
+        "after": measure(render_boarding_pass, args.iterations)
+    }
+    print(f"{'':8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'bytes':>10}")
+    for name, r in results.items():
+        print(f"{name:8}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['bytes']:>10}")
+    print(f"speedup: {results['before']['mean_ms'] / results['after']['mean_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Reissue unsigned (pre-signing) QR payloads on VALID tickets.
+
+    cd services/ticketing-service && python -m scripts.resign_legacy_qr [--batch-size 500]
+
+Walks VALID tickets whose qr_code_data has no signature in id order and
+replaces it with a payload signed by the active key, one committed batch
+at a time, so the script can be stopped and re-run. Cached tickets and
+PDFs on running replicas expire on their own (TICKET_CACHE_TTL_SECONDS;
+the PDF cache is keyed by content version). Once it reports nothing left,
+TICKET_QR_ACCEPT_LEGACY can be turned off.
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import func, select, update
+
+from src.database import AsyncSessionLocal, engine
+from src.models import Ticket
+from src.signing import check_signing_keys, sign_qr
+
+
+async def resign(batch_size: int) -> int:
+    resigned = 0
+    after = None
+    while True:
+        async with AsyncSessionLocal() as db:
+            query = (
+                select(Ticket.id, Ticket.booking_id, Ticket.flight_number, Ticket.departure_time)
+                .where(Ticket.status == "VALID", Ticket.qr_code_data.not_like("%|SIG:%"))
+                .where(Ticket.flight_number.is_not(None), Ticket.departure_time.is_not(None))
+                .order_by(Ticket.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                query = query.where(Ticket.id > after)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                return resigned
+            for row in rows:
+                await db.execute(
+                    update(Ticket)
+                    .where(Ticket.id == row.id, Ticket.status == "VALID")
+                    .values(
+                        qr_code_data=sign_qr(row.id, row.booking_id, row.flight_number, row.departure_time),
+                        updated_at=func.now()
+                    )
+                )
+            await db.commit()
+        resigned += len(rows)
+        after = rows[-1].id
+        print(f"Re-signed {resigned} tickets")
+
+
+async def main(batch_size: int) -> None:
+    check_signing_keys()
+    try:
+        print(f"Done: {await resign(batch_size)} tickets re-signed")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    asyncio.run(main(parser.parse_args().batch_size))
@@ -0,0 +1,215 @@
+"""
+Boarding pass PDF rendering, run inside ProcessPoolExecutor workers.
+
+reportlab and qrcode are pure-Python and CPU-bound, so each PDF holds
+the GIL for tens of milliseconds; rendered on the event loop it stalls
+every concurrent request. Workers receive a plain ticket dict and
+return the PDF bytes plus the time spent rendering.
+
+The page is drawn in two layers:
+
+- static: header strips, labels, divider, route arrow and fixed values,
+  drawn once per document into a form XObject ("BoardingPassStatic")
+- dynamic: the handful of per-ticket fields and the QR code, drawn on top
+
+The QR code is drawn as vector modules straight from the qrcode matrix
+(one rectangle per run of dark modules) instead of being rasterized with
+PIL, encoded as PNG and embedded as an image, which dominated render
+time. See scripts/benchmark_render.py for before/after numbers.
+
+This module must stay importable without the app: no database, config
+or FastAPI imports, since every worker process imports it on start-up.
+"""
+import hashlib
+import io
+import json
+import time
+from typing import Dict, Tuple
+
+import qrcode
+from reportlab.pdfgen import canvas
+from reportlab.lib.units import inch
+
+# Bump whenever the layout changes, so cached PDFs and ETags are invalidated
+TEMPLATE_VERSION = 2
+
+# --- DESIGN SETTINGS ---
+PAGE_SIZE = (8*inch, 3.5*inch)  # Landscape, roughly boarding pass sized
+PRIMARY_COLOR = (0.1, 0.4, 0.8)  # JourneyIQ Blue
+TEXT_COLOR = (0.2, 0.2, 0.2)
+STATIC_FORM = "BoardingPassStatic"
+
+# Every ticket field that affects the PDF (status included, so a cancelled
+# or used ticket never serves a stale pass)
+RENDERED_FIELDS = (
+    "ticket_id", "passenger_name", "flight_number", "origin", "destination",
+    "departure_time", "seat_number", "qr_code_data", "status"
+)
+
+
+def content_version(ticket: Dict) -> str:
+    """Stable digest of everything the rendered PDF depends on."""
+    fields = {name: ticket.get(name) for name in RENDERED_FIELDS}
+    payload = json.dumps([TEMPLATE_VERSION, fields], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _draw_static(c: canvas.Canvas) -> None:
+    """Everything that is identical on every boarding pass."""
+    width, height = PAGE_SIZE
+    
+    # --- LEFT SECTION (Main Pass) ---
+    # Header Strip - Vertically centered text
+    c.setFillColorRGB(*PRIMARY_COLOR)
+    c.rect(0, height - 0.8*inch, 5.7*inch, 0.8*inch, fill=1, stroke=0)
+    
+    c.setFillColorRGB(1, 1, 1) # White text
+    c.setFont("Helvetica-Bold", 24)
+    c.drawString(0.3*inch, height - 0.5*inch, "JourneyIQ")
+    c.setFont("Helvetica", 10)
+    c.drawString(4.2*inch, height - 0.5*inch, "BOARDING PASS")
+    
+    # Flight Info Row 1 labels
+    c.setFillColorRGB(*TEXT_COLOR)
+    c.setFont("Helvetica", 8)
+    y_row1_label = height - 1.2*inch
+    c.drawString(0.3*inch, y_row1_label, "PASSENGER NAME")
+    c.drawString(3.0*inch, y_row1_label, "FLIGHT")
+    c.drawString(4.3*inch, y_row1_label, "DATE")
+    
+    # Route Row labels
+    y_route_label = height - 1.9*inch
+    y_route_val = height - 2.25*inch
+    c.drawString(0.3*inch, y_route_label, "FROM")
+    c.drawString(2.5*inch, y_route_label, "TO")
+    
+    # Plane Icon
+    c.setLineWidth(2.5)
+    c.setStrokeColorRGB(*PRIMARY_COLOR)
+    # Draw arrow path
+    p = c.beginPath()
+    p.moveTo(1.5*inch, y_route_val + 0.15*inch)
+    p.lineTo(2.1*inch, y_route_val + 0.15*inch) # Main line
+    # Arrow head
+    p.moveTo(2.0*inch, y_route_val + 0.22*inch) 
+    p.lineTo(2.15*inch, y_route_val + 0.15*inch)
+    p.lineTo(2.0*inch, y_route_val + 0.08*inch)
+    c.drawPath(p, stroke=1, fill=0)
+    
+    # Bottom Details Row labels and fixed values
+    y_bottom_label = 0.8*inch
+    y_bottom_val = 0.5*inch
+    c.setFillColorRGB(*TEXT_COLOR)
+    c.setFont("Helvetica", 8)
+    c.drawString(0.3*inch, y_bottom_label, "GATE")
+    c.drawString(1.3*inch, y_bottom_label, "BOARDING TIME")
+    c.drawString(3.0*inch, y_bottom_label, "SEAT")
+    c.drawString(4.3*inch, y_bottom_label, "CLASS")
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(0.3*inch, y_bottom_val, "D4") 
+    c.drawString(4.3*inch, y_bottom_val, "ECONOMY")
+    
+    # --- DIVIDER ---
+    c.setDash(4, 4)
+    c.setStrokeColorRGB(0.6, 0.6, 0.6)
+    c.line(5.7*inch, 0, 5.7*inch, height)
+    c.setDash(1, 0) # Reset dash
+    
+    # --- RIGHT SECTION (Stub) ---
+    c.setFillColorRGB(*PRIMARY_COLOR)
+    c.rect(5.7*inch, height - 0.8*inch, 2.3*inch, 0.8*inch, fill=1, stroke=0)
+    c.setFillColorRGB(1, 1, 1)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(5.9*inch, height - 0.5*inch, "JourneyIQ")
+    
+    c.setFillColorRGB(*TEXT_COLOR)
+    st_x = 5.9*inch
+    c.setFont("Helvetica", 7)
+    c.drawString(st_x, height - 1.1*inch, "PASSENGER")
+    c.drawString(st_x, height - 1.5*inch, "FLIGHT")
+    c.drawString(st_x + 1.2*inch, height - 1.5*inch, "SEAT")
+
+
+def _draw_dynamic(c: canvas.Canvas, ticket: Dict) -> None:
+    """Per-ticket fields, drawn over the static layer."""
+    width, height = PAGE_SIZE
+    c.setFillColorRGB(*TEXT_COLOR)
+    
+    # Flight Info Row 1 values
+    y_row1_value = height - 1.4*inch
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(0.3*inch, y_row1_value, ticket['passenger_name'].upper())
+    c.drawString(3.0*inch, y_row1_value, ticket['flight_number'])
+    c.drawString(4.3*inch, y_row1_value, ticket['departure_time'].strftime('%d %b %Y'))
+    
+    # Route values
+    y_route_val = height - 2.25*inch
+    c.setFont("Helvetica-Bold", 28)
+    c.drawString(0.3*inch, y_route_val, ticket['origin'])
+    c.drawString(2.5*inch, y_route_val, ticket['destination'])
+    
+    # Bottom Details Row values
+    y_bottom_val = 0.5*inch
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(1.3*inch, y_bottom_val, ticket['departure_time'].strftime('%H:%M'))
+    c.drawString(3.0*inch, y_bottom_val, ticket['seat_number'])
+    
+    # Stub values
+    st_x = 5.9*inch
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(st_x, height - 1.25*inch, ticket['passenger_name'].upper()[:16])
+    c.drawString(st_x, height - 1.65*inch, ticket['flight_number'])
+    c.drawString(st_x + 1.2*inch, height - 1.65*inch, ticket['seat_number'])
+    c.setFont("Helvetica", 7)
+    c.drawString(st_x, height - 1.9*inch, f"{ticket['origin']}    {ticket['destination']}")
+
+
+def _draw_qr(c: canvas.Canvas, data: str, x: float, y: float, size: float) -> None:
+    """Draw a QR code as vector modules (white quiet zone included)."""
+    qr = qrcode.QRCode(version=1, border=1)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    module = size / len(matrix)
+    
+    c.setFillColorRGB(1, 1, 1)
+    c.rect(x, y, size, size, fill=1, stroke=0)
+    c.setFillColorRGB(0, 0, 0)
+    p = c.beginPath()
+    for row_index, row in enumerate(matrix):
+        top = y + size - (row_index + 1) * module
+        col = 0
+        while col < len(row):
+            if not row[col]:
+                col += 1
+                continue
+            run_start = col
+            while col < len(row) and row[col]:
+                col += 1
+            p.rect(x + run_start * module, top, (col - run_start) * module, module)
+    c.drawPath(p, stroke=0, fill=1)
+
+
+def render_boarding_pass(ticket: Dict) -> bytes:
+    """Render one boarding pass as PDF bytes."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+    
+    c.beginForm(STATIC_FORM)
+    _draw_static(c)
+    c.endForm()
+    
+    c.doForm(STATIC_FORM)
+    _draw_dynamic(c, ticket)
+    # QR code at bottom of stub without overlap
+    _draw_qr(c, ticket['qr_code_data'], 6.15*inch, 0.3*inch, 1.3*inch)
+    
+    c.save()
+    return buffer.getvalue()
+
+
+def render_timed(ticket: Dict) -> Tuple[bytes, float]:
+    """Worker entry point: (PDF bytes, seconds spent rendering)."""
+    start = time.perf_counter()
+    pdf = render_boarding_pass(ticket)
+    return pdf, time.perf_counter() - start
@@ -0,0 +1,87 @@
+"""
+In-process caches for tickets and rendered boarding passes.
+
+Tickets are read far more often than they change (every view, download
+and gate scan), and a ticket only ever changes status. Entries are
+invalidated locally on every status change; the TTL bounds how long a
+change made on another replica can go unseen. Anything that must be
+exact (marking a ticket used) goes to the database with a conditional
+update instead of trusting the cache.
+
+Rendered PDFs are cached by ticket id together with the content version
+they were rendered from; a lookup with any other version misses, so a
+change to any rendered field invalidates the entry on every replica.
+That cache is bounded by total bytes rather than entry count.
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from src.config import settings
+from src.metrics import PDF_CACHE_BYTES
+
+
+class TicketCache:
+    """Small LRU of serialized tickets by id, with a short TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        entry = self._entries.get(ticket_id)
+        if entry is None:
+            return None
+        expires_at, ticket = entry
+        if expires_at < time.monotonic():
+            del self._entries[ticket_id]
+            return None
+        self._entries.move_to_end(ticket_id)
+        return ticket
+
+    def put(self, ticket_id: str, ticket: dict) -> None:
+        self._entries[ticket_id] = (time.monotonic() + self.ttl_seconds, ticket)
+        self._entries.move_to_end(ticket_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, ticket_id: str) -> None:
+        self._entries.pop(ticket_id, None)
+
+
+class PdfCache:
+    """LRU of rendered PDFs by ticket id, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, ticket_id: str, version: str) -> Optional[bytes]:
+        entry = self._entries.get(ticket_id)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(ticket_id)
+        return entry[1]
+
+    def put(self, ticket_id: str, version: str, pdf: bytes) -> None:
+        self.invalidate(ticket_id)
+        if len(pdf) > self.max_bytes:
+            return
+        self._entries[ticket_id] = (version, pdf)
+        self.size += len(pdf)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+        PDF_CACHE_BYTES.set(self.size)
+
+    def invalidate(self, ticket_id: str) -> None:
+        entry = self._entries.pop(ticket_id, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+            PDF_CACHE_BYTES.set(self.size)
+
+
+ticket_cache = TicketCache(settings.TICKET_CACHE_MAX_ENTRIES, settings.TICKET_CACHE_TTL_SECONDS)
+pdf_cache = PdfCache(settings.TICKET_PDF_CACHE_MAX_BYTES)
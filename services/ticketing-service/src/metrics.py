@@ -0,0 +1,47 @@
+"""
+Custom Prometheus metrics for ticketing-service.
+
+HTTP request metrics come from prometheus-fastapi-instrumentator; these
+cover boarding pass rendering in the process pool, the PDF cache and
+gate scanning.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+RENDER_QUEUE_DEPTH = Gauge(
+    "ticket_render_queue_depth",
+    "Boarding pass renders submitted to the process pool and not yet finished"
+)
+
+RENDER_SECONDS = Histogram(
+    "ticket_render_seconds",
+    "Time a worker process spends rendering one boarding pass",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+RENDER_WAIT_SECONDS = Histogram(
+    "ticket_render_wait_seconds",
+    "Time a render spends queued for a worker (plus IPC)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+RENDER_REJECTED = Counter(
+    "ticket_render_rejected_total",
+    "Renders rejected because the queue was full"
+)
+
+PDF_CACHE_REQUESTS = Counter(
+    "ticket_pdf_cache_requests_total",
+    "Boarding pass downloads by cache outcome",
+    ["result"]  # hit, miss, not_modified
+)
+
+PDF_CACHE_BYTES = Gauge(
+    "ticket_pdf_cache_bytes",
+    "Size of rendered PDFs held in this replica's cache"
+)
+
+GATE_SCANS = Counter(
+    "ticket_gate_scans_total",
+    "Boarding pass scans processed by the bulk gate endpoint",
+    ["result"]  # BOARDED, VALID, INVALID_SIGNATURE, WRONG_FLIGHT, DEPARTED, DUPLICATE_SCAN, ALREADY_USED, CANCELLED, NOT_FOUND
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, TIMESTAMP, DECIMAL, Boolean
+from sqlalchemy import Column, String, TIMESTAMP, DECIMAL, Boolean, Text, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -25,3 +25,22 @@ class Flight(Base):
     arrival_time = Column(TIMESTAMP(timezone=True), nullable=False)
     base_price = Column(DECIMAL(10, 2), nullable=False)
     status = Column(String(20), default='SCHEDULED')
+
+class Ticket(Base):
+    __tablename__ = "tickets"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    booking_id = Column(UUID(as_uuid=True), nullable=False)
+    ticket_number = Column(String(50), unique=True)
+    passenger_name = Column(String(255), nullable=False)
+    flight_id = Column(UUID(as_uuid=True))
+    flight_number = Column(String(20), nullable=False)
+    origin = Column(String(3), nullable=False)
+    destination = Column(String(3), nullable=False)
+    departure_time = Column(TIMESTAMP(timezone=True), nullable=False)
+    arrival_time = Column(TIMESTAMP(timezone=True), nullable=False)
+    seat_number = Column(String(10))
+    qr_code_data = Column(Text)
+    status = Column(String(20), nullable=False, default="VALID")  # VALID, USED, CANCELLED
+    issued_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
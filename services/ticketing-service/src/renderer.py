@@ -0,0 +1,67 @@
+"""
+Process pool for boarding pass rendering.
+
+Renders run in TICKET_RENDER_WORKERS spawned processes so the event loop
+only awaits a future. Admission is bounded: at most one render per worker
+plus TICKET_RENDER_QUEUE_SIZE waiting. Beyond that `render` fails fast
+with RenderQueueFullError (503 to the client) instead of letting latency
+grow without limit.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from src.boarding_pass import render_timed
+from src.config import settings
+from src.metrics import RENDER_QUEUE_DEPTH, RENDER_REJECTED, RENDER_SECONDS, RENDER_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFullError(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+class RenderPool:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Boarding pass render pool started ({self.workers} workers, capacity {self.capacity})")
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, ticket: Dict) -> bytes:
+        """Render a boarding pass in the pool. Raises RenderQueueFullError when saturated."""
+        if self._pending >= self.capacity:
+            RENDER_REJECTED.inc()
+            raise RenderQueueFullError(f"{self._pending} renders pending")
+        self.start()
+        self._pending += 1
+        RENDER_QUEUE_DEPTH.set(self._pending)
+        submitted = time.perf_counter()
+        try:
+            pdf, seconds = await asyncio.get_running_loop().run_in_executor(self._executor, render_timed, ticket)
+        finally:
+            self._pending -= 1
+            RENDER_QUEUE_DEPTH.set(self._pending)
+        RENDER_SECONDS.observe(seconds)
+        RENDER_WAIT_SECONDS.observe(max(time.perf_counter() - submitted - seconds, 0.0))
+        return pdf
+
+
+render_pool = RenderPool(settings.TICKET_RENDER_WORKERS, settings.TICKET_RENDER_QUEUE_SIZE)
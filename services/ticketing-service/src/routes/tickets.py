@@ -1,25 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Optional
-from pydantic import BaseModel
-from datetime import datetime
-from uuid import uuid4
-import qrcode
-import io
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
+from sqlalchemy import select, update, insert, func
+from typing import AsyncIterator, List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+from collections import deque
+import asyncio
+import zipfile
+from src.config import settings
 from src.database import get_db
-from src.models import Booking, Flight
+from src.models import Booking, Flight, Ticket
+from src.cache import ticket_cache, pdf_cache
+from src.boarding_pass import content_version
+from src.metrics import PDF_CACHE_REQUESTS, GATE_SCANS
+from src.signing import sign_qr, verify_qr, parse_legacy_qr, departed, InvalidQrError, UnsignedQrError
+from src.renderer import render_pool, RenderQueueFullError
 
 router = APIRouter(tags=["ticketing"])
 
-# In-memory ticket storage (in production, use database)
-tickets_db = {}
-
 # Request/Response Models
 class TicketGenerateRequest(BaseModel):
     booking_id: str
@@ -29,6 +29,15 @@ class PassengerInfo(BaseModel):
     last_name: str
     seat_number: Optional[str] = "TBA"
 
+class BatchTicketGenerateRequest(BaseModel):
+    booking_id: str
+    passengers: List[PassengerInfo] = Field(..., min_length=1, max_length=settings.TICKET_BATCH_MAX_PASSENGERS)
+
+class GateScanRequest(BaseModel):
+    scans: List[str] = Field(..., min_length=1, max_length=settings.TICKET_SCAN_BATCH_MAX)  # Raw QR payloads
+    use: bool = True  # Board the passengers, or only validate
+    flight_number: Optional[str] = None  # Reject passes for other flights at this gate
+
 class TicketResponse(BaseModel):
     ticket_id: str
     booking_id: str
@@ -43,19 +52,49 @@ class TicketResponse(BaseModel):
     status: str
     generated_at: datetime
 
-@router.post("/generate", response_model=TicketResponse, status_code=201)
-async def generate_ticket(
-    request: TicketGenerateRequest,
-    passenger: PassengerInfo,
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Generate an e-ticket for a confirmed booking.
-    Creates ticket with QR code for validation.
-    """
+def _serialize(ticket: Ticket) -> dict:
+    return {
+        "ticket_id": str(ticket.id),
+        "booking_id": str(ticket.booking_id),
+        "passenger_name": ticket.passenger_name,
+        "flight_number": ticket.flight_number,
+        "origin": ticket.origin,
+        "destination": ticket.destination,
+        "departure_time": ticket.departure_time,
+        "arrival_time": ticket.arrival_time,
+        "seat_number": ticket.seat_number,
+        "qr_code_data": ticket.qr_code_data,
+        "status": ticket.status,
+        "generated_at": ticket.issued_at
+    }
+
+def _parse_ticket_id(ticket_id: str) -> UUID:
+    try:
+        return UUID(ticket_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+
+async def _load_ticket(ticket_id: str, db: AsyncSession) -> dict:
+    """Read-through: serve from the cache, fall back to the tickets table."""
+    ticket = ticket_cache.get(ticket_id)
+    if ticket is not None:
+        return ticket
+    
+    row = (await db.execute(
+        select(Ticket).where(Ticket.id == _parse_ticket_id(ticket_id))
+    )).scalar_one_or_none()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    
+    ticket = _serialize(row)
+    ticket_cache.put(ticket_id, ticket)
+    return ticket
+
+async def _confirmed_booking_and_flight(booking_id: str, db: AsyncSession) -> tuple:
     # Verify booking exists and is confirmed
     booking_result = await db.execute(
-        select(Booking).where(Booking.id == request.booking_id)
+        select(Booking).where(Booking.id == booking_id)
     )
     booking = booking_result.scalar_one_or_none()
     
@@ -74,208 +113,237 @@ async def generate_ticket(
     if not flight:
         raise HTTPException(status_code=404, detail="Flight not found")
     
-    # Generate ticket
-    ticket_id = str(uuid4())
-    generated_at = datetime.utcnow()
-    
-    # QR code data (contains ticket verification info)
-    qr_data = f"TICKET:{ticket_id}|BOOKING:{request.booking_id}|FLIGHT:{flight.flight_number}"
+    return booking, flight
+
+def _new_ticket(booking: Booking, flight: Flight, passenger: PassengerInfo) -> dict:
+    """Column values for a new VALID ticket."""
+    ticket_id = uuid4()
+    
+    # QR code data (signed, so gates can verify it without a lookup)
+    qr_data = sign_qr(ticket_id, booking.id, flight.flight_number, flight.departure_time)
+    
+    return dict(
+        id=ticket_id,
+        booking_id=booking.id,
+        passenger_name=f"{passenger.first_name} {passenger.last_name}",
+        flight_id=flight.id,
+        flight_number=flight.flight_number,
+        origin=flight.origin,
+        destination=flight.destination,
+        departure_time=flight.departure_time,
+        arrival_time=flight.arrival_time,
+        seat_number=passenger.seat_number,
+        qr_code_data=qr_data,
+        status="VALID"
+    )
+
+@router.post("/generate", response_model=TicketResponse, status_code=201)
+async def generate_ticket(
+    request: TicketGenerateRequest,
+    passenger: PassengerInfo,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Generate an e-ticket for a confirmed booking.
+    Creates ticket with QR code for validation.
+    """
+    booking, flight = await _confirmed_booking_and_flight(request.booking_id, db)
     
     # Store ticket
-    ticket = {
-        "ticket_id": ticket_id,
-        "booking_id": request.booking_id,
-        "passenger_name": f"{passenger.first_name} {passenger.last_name}",
-        "flight_number": flight.flight_number,
-        "origin": flight.origin,
-        "destination": flight.destination,
-        "departure_time": flight.departure_time,
-        "arrival_time": flight.arrival_time,
-        "seat_number": passenger.seat_number,
-        "qr_code_data": qr_data,
-        "status": "VALID",
-        "generated_at": generated_at
-    }
+    ticket = Ticket(**_new_ticket(booking, flight, passenger))
+    db.add(ticket)
+    await db.commit()
+    await db.refresh(ticket)
     
-    tickets_db[ticket_id] = ticket
+    return TicketResponse(**_serialize(ticket))
+
+@router.post("/generate/batch", response_model=List[TicketResponse], status_code=201)
+async def generate_tickets_batch(
+    request: BatchTicketGenerateRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Generate e-tickets for every passenger of a confirmed booking.
+    All tickets are written with one multi-row insert.
+    """
+    booking, flight = await _confirmed_booking_and_flight(request.booking_id, db)
     
-    return TicketResponse(**ticket)
+    tickets = (await db.scalars(
+        insert(Ticket).returning(Ticket),
+        [_new_ticket(booking, flight, passenger) for passenger in request.passengers]
+    )).all()
+    await db.commit()
+    
+    return [TicketResponse(**_serialize(ticket)) for ticket in tickets]
 
 @router.get("/{ticket_id}", response_model=TicketResponse)
-async def get_ticket(ticket_id: str):
+async def get_ticket(ticket_id: str, db: AsyncSession = Depends(get_db)):
     """Retrieve ticket details by ID."""
-    ticket = tickets_db.get(ticket_id)
-    
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
+    ticket = await _load_ticket(ticket_id, db)
     
     return TicketResponse(**ticket)
 
+async def _boarding_pass_pdf(ticket: dict, version: str, wait: bool = False) -> bytes:
+    """
+    Cached PDF for `ticket`, rendering on a miss. With wait=True a full
+    render queue is waited out instead of raising RenderQueueFullError.
+    """
+    pdf = pdf_cache.get(ticket['ticket_id'], version)
+    if pdf is not None:
+        PDF_CACHE_REQUESTS.labels("hit").inc()
+        return pdf
+    
+    PDF_CACHE_REQUESTS.labels("miss").inc()
+    while True:
+        try:
+            pdf = await render_pool.render(ticket)
+            break
+        except RenderQueueFullError:
+            if not wait:
+                raise
+            await asyncio.sleep(0.05)
+    pdf_cache.put(ticket['ticket_id'], version, pdf)
+    return pdf
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
 @router.get("/{ticket_id}/download")
-async def download_ticket_pdf(ticket_id: str):
+async def download_ticket_pdf(
+    ticket_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Download ticket as PDF with QR code.
     Generates a professional e-ticket PDF.
+    
+    The ETag is the ticket's content version, so clients re-opening an
+    unchanged pass get a 304 without anything being rendered.
     """
-    ticket = tickets_db.get(ticket_id)
+    ticket = await _load_ticket(ticket_id, db)
+    version = content_version(ticket)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if _etag_matches(if_none_match, etag):
+        PDF_CACHE_REQUESTS.labels("not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        pdf = await _boarding_pass_pdf(ticket, version)
+    except RenderQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Boarding pass renderer is busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+    
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={**headers, "Content-Disposition": f"attachment; filename=boarding_pass_{ticket_id[:8]}.pdf"}
+    )
+
+class _ZipSink:
+    """Write-only file object collecting zipfile output until it is drained."""
     
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
+    def __init__(self):
+        self._chunks: List[bytes] = []
     
-    # Create PDF in memory - Landscape mode for Boarding Pass look
-    buffer = io.BytesIO()
-    # Use standard credit card size roughly or landscape letter clipped
-    c = canvas.Canvas(buffer, pagesize=(8*inch, 3.5*inch))
-    width, height = (8*inch, 3.5*inch)
-    
-    # --- DESIGN SETTINGS ---
-    primary_color = (0.1, 0.4, 0.8)  # JourneyIQ Blue
-    text_color = (0.2, 0.2, 0.2)
-    
-    # --- LEFT SECTION (Main Pass) ---
-    # Header Strip - Vertically centered text
-    c.setFillColorRGB(*primary_color)
-    c.rect(0, height - 0.8*inch, 5.7*inch, 0.8*inch, fill=1, stroke=0)
-    
-    c.setFillColorRGB(1, 1, 1) # White text
-    c.setFont("Helvetica-Bold", 24)
-    # Centered vertically in 0.8 inch strip: height - 0.4 - (font_height/2)
-    c.drawString(0.3*inch, height - 0.5*inch, "JourneyIQ")
-    c.setFont("Helvetica", 10)
-    c.drawString(4.2*inch, height - 0.5*inch, "BOARDING PASS")
-    
-    # Flight Info Row 1 - Improved spacing
-    c.setFillColorRGB(*text_color)
-    c.setFont("Helvetica", 8)
-    y_row1_label = height - 1.2*inch
-    y_row1_value = height - 1.4*inch
-    
-    # Column 1: Passenger
-    c.drawString(0.3*inch, y_row1_label, "PASSENGER NAME")
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(0.3*inch, y_row1_value, ticket['passenger_name'].upper())
-    
-    # Column 2: Flight
-    c.setFont("Helvetica", 8)
-    c.drawString(3.0*inch, y_row1_label, "FLIGHT")
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(3.0*inch, y_row1_value, ticket['flight_number'])
-    
-    # Column 3: Date
-    c.setFont("Helvetica", 8)
-    c.drawString(4.3*inch, y_row1_label, "DATE")
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(4.3*inch, y_row1_value, ticket['departure_time'].strftime('%d %b %Y'))
-
-    # Route Row (Center Section)
-    y_route_label = height - 1.9*inch
-    y_route_val = height - 2.25*inch
-    
-    c.setFont("Helvetica", 8)
-    c.drawString(0.3*inch, y_route_label, "FROM")
-    c.drawString(2.5*inch, y_route_label, "TO")
-    
-    c.setFont("Helvetica-Bold", 28)
-    c.drawString(0.3*inch, y_route_val, ticket['origin'])
-    c.drawString(2.5*inch, y_route_val, ticket['destination'])
-    
-    # Plane Icon (Better looking)
-    c.setLineWidth(2.5)
-    c.setStrokeColorRGB(*primary_color)
-    # Draw arrow path
-    p = c.beginPath()
-    p.moveTo(1.5*inch, y_route_val + 0.15*inch)
-    p.lineTo(2.1*inch, y_route_val + 0.15*inch) # Main line
-    # Arrow head
-    p.moveTo(2.0*inch, y_route_val + 0.22*inch) 
-    p.lineTo(2.15*inch, y_route_val + 0.15*inch)
-    p.lineTo(2.0*inch, y_route_val + 0.08*inch)
-    c.drawPath(p, stroke=1, fill=0)
-    
-    # Bottom Details Row
-    y_bottom_label = 0.8*inch
-    y_bottom_val = 0.5*inch
-    
-    c.setFillColorRGB(*text_color)
-    c.setFont("Helvetica", 8)
-    c.drawString(0.3*inch, y_bottom_label, "GATE")
-    c.drawString(1.3*inch, y_bottom_label, "BOARDING TIME")
-    c.drawString(3.0*inch, y_bottom_label, "SEAT")
-    c.drawString(4.3*inch, y_bottom_label, "CLASS")
-    
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(0.3*inch, y_bottom_val, "D4") 
-    c.drawString(1.3*inch, y_bottom_val, ticket['departure_time'].strftime('%H:%M'))
-    c.drawString(3.0*inch, y_bottom_val, ticket['seat_number'])
-    c.drawString(4.3*inch, y_bottom_val, "ECONOMY")
-
-    # --- DIVIDER ---
-    c.setDash(4, 4)
-    c.setStrokeColorRGB(0.6, 0.6, 0.6)
-    c.line(5.7*inch, 0, 5.7*inch, height)
-    c.setDash(1, 0) # Reset dash
-
-    # --- RIGHT SECTION (Stub) ---
-    c.setFillColorRGB(*primary_color)
-    c.rect(5.7*inch, height - 0.8*inch, 2.3*inch, 0.8*inch, fill=1, stroke=0)
-    c.setFillColorRGB(1, 1, 1)
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(5.9*inch, height - 0.5*inch, "JourneyIQ")
-    
-    c.setFillColorRGB(*text_color)
-    st_x = 5.9*inch
-    
-    # Stub Details
-    c.setFont("Helvetica", 7)
-    c.drawString(st_x, height - 1.1*inch, "PASSENGER")
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(st_x, height - 1.25*inch, ticket['passenger_name'].upper()[:16])
-    
-    c.setFont("Helvetica", 7)
-    c.drawString(st_x, height - 1.5*inch, "FLIGHT")
-    c.drawString(st_x + 1.2*inch, height - 1.5*inch, "SEAT")
-    
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(st_x, height - 1.65*inch, ticket['flight_number'])
-    c.drawString(st_x + 1.2*inch, height - 1.65*inch, ticket['seat_number'])
-    
-    c.setFont("Helvetica", 7)
-    c.drawString(st_x, height - 1.9*inch, f"{ticket['origin']}    {ticket['destination']}")
-
-    # --- QR CODE ON STUB (Fixed positioning) ---
-    # Generate QR code
-    qr = qrcode.QRCode(version=1, box_size=10, border=1)
-    qr.add_data(ticket['qr_code_data'])
-    qr.make(fit=True)
-    qr_img = qr.make_image(fill_color="black", back_color="white")
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
     
-    # Save QR code to buffer
-    qr_buffer = io.BytesIO()
-    qr_img.save(qr_buffer, format='PNG')
-    qr_buffer.seek(0)
+    def flush(self) -> None:
+        pass
     
-    # Draw QR code at bottom of stub without overlap
-    c.drawImage(ImageReader(qr_buffer), 6.15*inch, 0.3*inch, width=1.3*inch, height=1.3*inch)
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def _stream_boarding_passes_zip(tickets: List[dict]) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP of boarding passes, one entry per ticket, while they render.
     
-    c.save()
-    buffer.seek(0)
+    Up to TICKET_ZIP_RENDER_AHEAD renders run ahead of the entry being
+    written, so the pool stays busy while memory holds only that window.
+    The sink is unseekable, so zipfile writes data descriptors and each
+    entry can be sent as soon as it is added. PDFs are already compressed,
+    so entries are stored rather than deflated.
+    """
+    sink = _ZipSink()
+    remaining = iter(tickets)
+    pending = deque()
+    
+    def schedule() -> None:
+        ticket = next(remaining, None)
+        if ticket is not None:
+            pending.append((ticket, asyncio.ensure_future(
+                _boarding_pass_pdf(ticket, content_version(ticket), wait=True)
+            )))
+    
+    for _ in range(settings.TICKET_ZIP_RENDER_AHEAD):
+        schedule()
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            while pending:
+                ticket, render = pending.popleft()
+                pdf = await render
+                schedule()
+                archive.writestr(f"boarding_pass_{ticket['flight_number']}_{ticket['ticket_id']}.pdf", pdf)
+                yield sink.drain()
+        yield sink.drain()
+    finally:
+        # Client went away mid-download: drop renders nobody will read
+        for _, render in pending:
+            render.cancel()
+
+async def _zip_response(query, filename: str, db: AsyncSession) -> StreamingResponse:
+    # Tickets are loaded up front: the session closes before the body streams
+    tickets = [
+        _serialize(ticket)
+        for ticket in (await db.scalars(query.where(Ticket.status != "CANCELLED"))).all()
+    ]
+    
+    if not tickets:
+        raise HTTPException(status_code=404, detail="No tickets found")
     
     return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=boarding_pass_{ticket_id[:8]}.pdf"}
+        _stream_boarding_passes_zip(tickets),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@router.get("/bookings/{booking_id}/download")
+async def download_booking_boarding_passes(booking_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Download every boarding pass of a booking as a streamed ZIP."""
+    return await _zip_response(
+        select(Ticket).where(Ticket.booking_id == booking_id).order_by(Ticket.passenger_name, Ticket.id),
+        f"boarding_passes_{str(booking_id)[:8]}.zip",
+        db
+    )
+
+@router.get("/flights/{flight_id}/download")
+async def download_flight_boarding_passes(flight_id: UUID, db: AsyncSession = Depends(get_db)):
+    """Download every boarding pass on a flight as a streamed ZIP (airport ops manifests)."""
+    return await _zip_response(
+        select(Ticket).where(Ticket.flight_id == flight_id).order_by(Ticket.seat_number, Ticket.id),
+        f"boarding_passes_flight_{str(flight_id)[:8]}.zip",
+        db
     )
 
 @router.post("/{ticket_id}/validate")
-async def validate_ticket(ticket_id: str):
+async def validate_ticket(ticket_id: str, db: AsyncSession = Depends(get_db)):
     """
     Validate a ticket for boarding.
     Checks if ticket is valid and not already used.
     """
-    ticket = tickets_db.get(ticket_id)
-    
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
+    ticket = await _load_ticket(ticket_id, db)
     
     if ticket['status'] == "USED":
         return {
@@ -316,18 +384,134 @@ async def validate_ticket(ticket_id: str):
         "seat_number": ticket['seat_number']
     }
 
+_SCAN_MESSAGES = {
+    "BOARDED": "Ticket marked as used",
+    "VALID": "Ticket is valid",
+    "INVALID_SIGNATURE": "QR code is not authentic",
+    "WRONG_FLIGHT": "Ticket is for a different flight",
+    "DEPARTED": "Flight has already departed",
+    "DUPLICATE_SCAN": "Ticket scanned more than once in this batch",
+    "ALREADY_USED": "Ticket already used",
+    "CANCELLED": "Ticket cancelled",
+    "NOT_FOUND": "Ticket not found"
+}
+
+@router.post("/scans")
+async def process_gate_scans(request: GateScanRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Validate (and by default board) a batch of scanned boarding passes.
+    
+    Signatures, flight and departure are checked locally from the signed
+    payload; the surviving tickets are then marked used with a single
+    conditional UPDATE (VALID -> USED), so a ticket scanned at two gates
+    boards only once. One SELECT explains the rows that were not updated.
+    Unsigned pre-signing passes are looked up in one more SELECT and
+    accepted only if they match the stored ticket's payload exactly.
+    """
+    results = [None] * len(request.scans)
+    scanned = []  # (index, ticket id, fields) of authentic payloads
+    legacy = []  # Same, for unsigned payloads still to be matched
+    candidates = {}  # ticket id -> index of its first scan
+    now = datetime.now(timezone.utc)
+    
+    for index, payload in enumerate(request.scans):
+        try:
+            try:
+                fields = verify_qr(payload)
+                found = scanned
+            except UnsignedQrError:
+                if not settings.TICKET_QR_ACCEPT_LEGACY:
+                    raise
+                fields = parse_legacy_qr(payload)
+                found = legacy
+            found.append((index, UUID(fields["TICKET"]), fields))
+        except (InvalidQrError, ValueError):
+            results[index] = {"result": "INVALID_SIGNATURE", "ticket_id": None}
+    
+    if legacy:
+        stored = {row.id: row for row in (await db.execute(
+            select(Ticket.id, Ticket.qr_code_data, Ticket.departure_time)
+            .where(Ticket.id.in_({ticket_id for _, ticket_id, _ in legacy}))
+        )).all()}
+        for index, ticket_id, fields in legacy:
+            row = stored.get(ticket_id)
+            if row is None or row.departure_time is None or row.qr_code_data != request.scans[index]:
+                results[index] = {"result": "INVALID_SIGNATURE", "ticket_id": None}
+                continue
+            fields["DEP"] = str(int(row.departure_time.timestamp()))
+            scanned.append((index, ticket_id, fields))
+        scanned.sort(key=lambda scan: scan[0])  # First scan of a ticket wins
+    
+    for index, ticket_id, fields in scanned:
+        if request.flight_number and fields["FLIGHT"] != request.flight_number:
+            result = "WRONG_FLIGHT"
+        elif departed(fields, now):
+            result = "DEPARTED"
+        elif ticket_id in candidates:
+            result = "DUPLICATE_SCAN"
+        else:
+            candidates[ticket_id] = index
+            continue
+        results[index] = {"result": result, "ticket_id": str(ticket_id)}
+    
+    accepted = set()
+    if candidates:
+        if request.use:
+            accepted = set((await db.scalars(
+                update(Ticket)
+                .where(Ticket.id.in_(list(candidates)), Ticket.status == "VALID")
+                .values(status="USED", updated_at=func.now())
+                .returning(Ticket.id)
+            )).all())
+            await db.commit()
+            for ticket_id in accepted:
+                ticket_cache.invalidate(str(ticket_id))
+                pdf_cache.invalidate(str(ticket_id))
+        
+        rejected = [ticket_id for ticket_id in candidates if ticket_id not in accepted]
+        statuses = dict((await db.execute(
+            select(Ticket.id, Ticket.status).where(Ticket.id.in_(rejected))
+        )).all()) if rejected else {}
+        
+        for ticket_id, index in candidates.items():
+            if ticket_id in accepted:
+                result = "BOARDED"
+            else:
+                status = statuses.get(ticket_id)
+                result = {None: "NOT_FOUND", "VALID": "VALID", "USED": "ALREADY_USED"}.get(status, "CANCELLED")
+            results[index] = {"result": result, "ticket_id": str(ticket_id)}
+    
+    summary = {}
+    for entry in results:
+        GATE_SCANS.labels(entry["result"]).inc()
+        summary[entry["result"]] = summary.get(entry["result"], 0) + 1
+        entry["valid"] = entry["result"] in ("BOARDED", "VALID")
+        entry["message"] = _SCAN_MESSAGES[entry["result"]]
+    
+    return {
+        "results": results,
+        "summary": summary
+    }
+
 @router.post("/{ticket_id}/use")
-async def use_ticket(ticket_id: str):
+async def use_ticket(ticket_id: str, db: AsyncSession = Depends(get_db)):
     """Mark ticket as used (for boarding)."""
-    ticket = tickets_db.get(ticket_id)
-    
-    if not ticket:
-        raise HTTPException(status_code=404, detail="Ticket not found")
-    
-    if ticket['status'] == "USED":
-        raise HTTPException(status_code=400, detail="Ticket already used")
-    
-    ticket['status'] = "USED"
+    # Conditional update, so two gates scanning the same ticket cannot both board it
+    used = (await db.execute(
+        update(Ticket)
+        .where(Ticket.id == _parse_ticket_id(ticket_id), Ticket.status == "VALID")
+        .values(status="USED", updated_at=func.now())
+        .returning(Ticket.id)
+    )).scalar_one_or_none()
+    await db.commit()
+    ticket_cache.invalidate(ticket_id)
+    pdf_cache.invalidate(ticket_id)
+    
+    if used is None:
+        ticket = await _load_ticket(ticket_id, db)
+        if ticket['status'] == "USED":
+            raise HTTPException(status_code=400, detail="Ticket already used")
+        raise HTTPException(status_code=400, detail="Ticket cancelled")
     
     return {
         "message": "Ticket marked as used",
@@ -336,17 +520,33 @@ async def use_ticket(ticket_id: str):
     }
 
 @router.get("/")
-async def list_tickets():
-    """List all tickets (admin endpoint)."""
+async def list_tickets(
+    status: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_db)
+):
+    """List tickets, optionally by status (admin endpoint)."""
+    query = select(Ticket.id, Ticket.passenger_name, Ticket.flight_number, Ticket.status)
+    count_query = select(func.count()).select_from(Ticket)
+    if status:
+        query = query.where(Ticket.status == status)
+        count_query = count_query.where(Ticket.status == status)
+    
+    rows = (await db.execute(
+        query.order_by(Ticket.issued_at.desc()).limit(min(limit, 1000)).offset(offset)
+    )).all()
+    total = (await db.execute(count_query)).scalar()
+    
     return {
         "tickets": [
             {
-                "ticket_id": t['ticket_id'],
-                "passenger_name": t['passenger_name'],
-                "flight_number": t['flight_number'],
-                "status": t['status']
+                "ticket_id": str(t.id),
+                "passenger_name": t.passenger_name,
+                "flight_number": t.flight_number,
+                "status": t.status
             }
-            for t in tickets_db.values()
+            for t in rows
         ],
-        "total": len(tickets_db)
+        "total": total
     }
@@ -0,0 +1,96 @@
+"""
+Signed boarding pass QR payloads.
+
+The payload keeps the original fields and appends the departure time,
+the signing key id and an HMAC-SHA256 over everything before it:
+
+    TICKET:<id>|BOOKING:<id>|FLIGHT:<number>|DEP:<unix ts>|KID:<key id>|SIG:<base64url>
+
+A gate scanner holding the keys can check authenticity and departure
+offline, without a ticket lookup. The key id selects the verification
+key, so keys rotate by adding a new one to TICKET_QR_SIGNING_KEYS,
+switching TICKET_QR_ACTIVE_KEY_ID, and removing the old key once its
+passes have flown. The tag is truncated to 128 bits to keep the QR small.
+
+Passes issued before signing carry only TICKET|BOOKING|FLIGHT. They are
+accepted at the gate only when they match the stored ticket exactly
+(TICKET_QR_ACCEPT_LEGACY), until scripts.resign_legacy_qr has reissued them.
+"""
+import base64
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from typing import Dict
+
+from src.config import DEV_QR_SIGNING_KEY, settings
+
+SIGNATURE_BYTES = 16
+
+
+class InvalidQrError(ValueError):
+    """The QR payload is malformed, signed with an unknown key or tampered with."""
+
+
+class UnsignedQrError(InvalidQrError):
+    """The QR payload has no signature (possibly a pre-signing pass)."""
+
+
+def check_signing_keys() -> None:
+    """Refuse to start with a missing active key, or with the dev key outside local."""
+    if settings.TICKET_QR_ACTIVE_KEY_ID not in settings.TICKET_QR_SIGNING_KEYS:
+        raise RuntimeError(f"TICKET_QR_ACTIVE_KEY_ID {settings.TICKET_QR_ACTIVE_KEY_ID!r} has no signing key")
+    if settings.ENVIRONMENT != "local" and DEV_QR_SIGNING_KEY in settings.TICKET_QR_SIGNING_KEYS.values():
+        raise RuntimeError(f"The development QR signing key cannot be used in {settings.ENVIRONMENT!r}; set TICKET_QR_SIGNING_KEYS")
+
+
+def _signature(key_id: str, message: str) -> str:
+    key = settings.TICKET_QR_SIGNING_KEYS.get(key_id)
+    if key is None:
+        raise InvalidQrError(f"Unknown signing key {key_id!r}")
+    digest = hmac.new(key.encode(), message.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign_qr(ticket_id, booking_id, flight_number: str, departure_time: datetime) -> str:
+    """QR payload for a ticket, signed with the active key."""
+    key_id = settings.TICKET_QR_ACTIVE_KEY_ID
+    message = (
+        f"TICKET:{ticket_id}|BOOKING:{booking_id}|FLIGHT:{flight_number}"
+        f"|DEP:{int(departure_time.timestamp())}|KID:{key_id}"
+    )
+    return f"{message}|SIG:{_signature(key_id, message)}"
+
+
+def verify_qr(payload: str) -> Dict[str, str]:
+    """
+    Check a scanned payload's signature and return its fields
+    (TICKET, BOOKING, FLIGHT, DEP, KID). Raises InvalidQrError.
+    """
+    message, separator, signature = payload.rpartition("|SIG:")
+    if not separator:
+        raise UnsignedQrError("Unsigned QR payload")
+    try:
+        fields = dict(part.split(":", 1) for part in message.split("|"))
+    except ValueError:
+        raise InvalidQrError("Malformed QR payload")
+    if not {"TICKET", "BOOKING", "FLIGHT", "DEP", "KID"} <= fields.keys():
+        raise InvalidQrError("Malformed QR payload")
+    if not hmac.compare_digest(_signature(fields["KID"], message), signature):
+        raise InvalidQrError("Invalid QR signature")
+    return fields
+
+
+def parse_legacy_qr(payload: str) -> Dict[str, str]:
+    """Fields of a pre-signing payload (TICKET, BOOKING, FLIGHT). Raises InvalidQrError."""
+    try:
+        fields = dict(part.split(":", 1) for part in payload.split("|"))
+    except ValueError:
+        raise InvalidQrError("Malformed QR payload")
+    if fields.keys() != {"TICKET", "BOOKING", "FLIGHT"}:
+        raise InvalidQrError("Malformed QR payload")
+    return fields
+
+
+def departed(fields: Dict[str, str], now: datetime = None) -> bool:
+    now = now or datetime.now(timezone.utc)
+    return int(fields["DEP"]) < now.timestamp()
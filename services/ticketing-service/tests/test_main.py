@@ -0,0 +1,450 @@
+"""
+Unit tests for Ticketing Service
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.config import settings
+from src.database import get_db
+from src.signing import InvalidQrError, UnsignedQrError, check_signing_keys, departed, sign_qr, verify_qr
+
+client = TestClient(app)
+
+DEPARTURE = datetime.now(timezone.utc) + timedelta(hours=3)
+
+
+def tamper(payload: str, field: str, value: str) -> str:
+    return "|".join(
+        f"{field}:{value}" if part.startswith(f"{field}:") else part
+        for part in payload.split("|")
+    )
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Tickets by id; the conditional VALID -> USED update is applied in memory."""
+
+    def __init__(self, tickets):
+        self.tickets = tickets  # id -> SimpleNamespace(status, qr_code_data, departure_time)
+        self.commits = 0
+
+    async def scalars(self, stmt):
+        ids = stmt.compile().params["id_1"]
+        boarded = [i for i in ids if i in self.tickets and self.tickets[i].status == "VALID"]
+        for ticket_id in boarded:
+            self.tickets[ticket_id].status = "USED"
+        return _Rows(boarded)
+
+    async def execute(self, stmt):
+        ids = stmt.compile().params["id_1"]
+        found = [i for i in ids if i in self.tickets]
+        if "qr_code_data" in str(stmt):
+            return _Rows([
+                SimpleNamespace(id=i, qr_code_data=self.tickets[i].qr_code_data, departure_time=self.tickets[i].departure_time)
+                for i in found
+            ])
+        return _Rows([(i, self.tickets[i].status) for i in found])
+
+    async def commit(self):
+        self.commits += 1
+
+
+def ticket(status="VALID", flight="JQ101", departure=DEPARTURE, legacy=False):
+    ticket_id, booking_id = uuid4(), uuid4()
+    if legacy:
+        qr = f"TICKET:{ticket_id}|BOOKING:{booking_id}|FLIGHT:{flight}"
+    else:
+        qr = sign_qr(ticket_id, booking_id, flight, departure)
+    return ticket_id, SimpleNamespace(status=status, qr_code_data=qr, departure_time=departure)
+
+
+class TestHealthEndpoint:
+    """Test health check endpoint"""
+
+    def test_health_check_returns_200(self):
+        """Health endpoint should return 200 OK"""
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "healthy"
+
+
+class TestSignedQr:
+    """Signed boarding pass payloads"""
+
+    def test_verify_round_trip(self):
+        """A signed payload verifies and exposes its fields"""
+        ticket_id, booking_id = uuid4(), uuid4()
+        fields = verify_qr(sign_qr(ticket_id, booking_id, "JQ101", DEPARTURE))
+        assert fields["TICKET"] == str(ticket_id)
+        assert fields["BOOKING"] == str(booking_id)
+        assert fields["FLIGHT"] == "JQ101"
+        assert fields["KID"] == settings.TICKET_QR_ACTIVE_KEY_ID
+        assert not departed(fields)
+
+    @pytest.mark.parametrize("field,value", [
+        ("FLIGHT", "JQ999"),
+        ("TICKET", "00000000-0000-0000-0000-000000000000"),
+        ("DEP", "4102444800"),
+        ("SIG", "AAAAAAAAAAAAAAAAAAAAAA"),
+    ])
+    def test_tampered_payload_is_rejected(self, field, value):
+        """Changing any field invalidates the signature"""
+        payload = sign_qr(uuid4(), uuid4(), "JQ101", DEPARTURE)
+        with pytest.raises(InvalidQrError):
+            verify_qr(tamper(payload, field, value))
+
+    def test_unknown_key_is_rejected(self):
+        """A key id that is not configured cannot verify"""
+        payload = sign_qr(uuid4(), uuid4(), "JQ101", DEPARTURE)
+        with pytest.raises(InvalidQrError):
+            verify_qr(tamper(payload, "KID", "retired-key"))
+
+    def test_unsigned_payload(self):
+        """Pre-signing payloads are reported as unsigned"""
+        with pytest.raises(UnsignedQrError):
+            verify_qr(f"TICKET:{uuid4()}|BOOKING:{uuid4()}|FLIGHT:JQ101")
+
+    def test_dev_key_refused_outside_local(self):
+        """Startup fails with the built-in key outside local"""
+        check_signing_keys()
+        with patch.object(settings, "ENVIRONMENT", "production"):
+            with pytest.raises(RuntimeError):
+                check_signing_keys()
+        with patch.object(settings, "ENVIRONMENT", "production"), \
+                patch.object(settings, "TICKET_QR_SIGNING_KEYS", {"prod-1": "a-real-secret"}), \
+                patch.object(settings, "TICKET_QR_ACTIVE_KEY_ID", "prod-1"):
+            check_signing_keys()
+
+
+class TestGateScans:
+    """POST /scans (/ticketing/scans behind the gateway)"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def scan(self, tickets, scans, **options):
+        db = FakeSession(tickets)
+
+        async def get_fake_db():
+            yield db
+        app.dependency_overrides[get_db] = get_fake_db
+        response = client.post("/scans", json={"scans": scans, **options})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_batch_results(self):
+        """Each scan gets its own outcome, in request order"""
+        valid_id, valid = ticket()
+        used_id, used = ticket(status="USED")
+        cancelled_id, cancelled = ticket(status="CANCELLED")
+        other_id, other = ticket(flight="JQ202")
+        gone_id, gone = ticket(departure=DEPARTURE - timedelta(days=1))
+        missing_id, missing = ticket()
+        tickets = {valid_id: valid, used_id: used, cancelled_id: cancelled, other_id: other, gone_id: gone}
+
+        body = self.scan(tickets, [
+            valid.qr_code_data,
+            valid.qr_code_data,
+            used.qr_code_data,
+            cancelled.qr_code_data,
+            other.qr_code_data,
+            gone.qr_code_data,
+            missing.qr_code_data,
+            tamper(valid.qr_code_data, "FLIGHT", "JQ101X"),
+        ], flight_number="JQ101")
+
+        assert [r["result"] for r in body["results"]] == [
+            "BOARDED", "DUPLICATE_SCAN", "ALREADY_USED", "CANCELLED",
+            "WRONG_FLIGHT", "DEPARTED", "NOT_FOUND", "INVALID_SIGNATURE",
+        ]
+        assert body["results"][0]["valid"] is True
+        assert body["results"][0]["ticket_id"] == str(valid_id)
+        assert body["summary"]["BOARDED"] == 1
+        assert tickets[valid_id].status == "USED"
+
+    def test_validate_only(self):
+        """use=false reports VALID without boarding"""
+        ticket_id, valid = ticket()
+        tickets = {ticket_id: valid}
+        body = self.scan(tickets, [valid.qr_code_data], use=False)
+        assert body["results"][0]["result"] == "VALID"
+        assert tickets[ticket_id].status == "VALID"
+
+    def test_legacy_pass_matching_stored_ticket(self):
+        """An unsigned pre-signing pass boards if it matches the stored payload"""
+        legacy_id, legacy = ticket(legacy=True)
+        forged = f"TICKET:{legacy_id}|BOOKING:{uuid4()}|FLIGHT:JQ101"
+        body = self.scan({legacy_id: legacy}, [forged, legacy.qr_code_data])
+        assert [r["result"] for r in body["results"]] == ["INVALID_SIGNATURE", "BOARDED"]
+
+    def test_legacy_pass_rejected_when_disabled(self):
+        """With TICKET_QR_ACCEPT_LEGACY off unsigned passes are invalid"""
+        legacy_id, legacy = ticket(legacy=True)
+        with patch.object(settings, "TICKET_QR_ACCEPT_LEGACY", False):
+            body = self.scan({legacy_id: legacy}, [legacy.qr_code_data])
+        assert body["results"][0]["result"] == "INVALID_SIGNATURE"
+
+
+def stored_ticket(status="VALID"):
+    ticket_id = uuid4()
+    return SimpleNamespace(
+        id=ticket_id, booking_id=uuid4(), passenger_name="Ada Lovelace", flight_number="JQ101",
+        origin="LHR", destination="JFK", departure_time=DEPARTURE, arrival_time=DEPARTURE + timedelta(hours=8),
+        seat_number="12A", qr_code_data=sign_qr(ticket_id, uuid4(), "JQ101", DEPARTURE),
+        status=status, issued_at=DEPARTURE - timedelta(days=7)
+    )
+
+
+class _Row:
+    def __init__(self, row):
+        self.row = row
+
+    def scalar_one_or_none(self):
+        return self.row
+
+
+class TicketStore:
+    """Answers the single-ticket SELECT and counts round trips."""
+
+    def __init__(self, *tickets):
+        self.tickets = {t.id: t for t in tickets}
+        self.executes = 0
+
+    async def execute(self, stmt):
+        self.executes += 1
+        return _Row(self.tickets.get(stmt.compile().params["id_1"]))
+
+
+class TestTicketStore:
+    """Read-through ticket lookups"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def use(self, db):
+        async def get_fake_db():
+            yield db
+        app.dependency_overrides[get_db] = get_fake_db
+
+    def test_second_read_is_served_from_cache(self):
+        """Only the first GET reaches the database"""
+        from src.cache import ticket_cache
+        stored = stored_ticket()
+        db = TicketStore(stored)
+        self.use(db)
+        first = client.get(f"/{stored.id}")
+        second = client.get(f"/{stored.id}")
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert first.json()["seat_number"] == "12A"
+        assert db.executes == 1
+        ticket_cache.invalidate(str(stored.id))
+
+    def test_unknown_ticket(self):
+        """Missing and malformed ids are 404s, and misses are not cached"""
+        db = TicketStore()
+        self.use(db)
+        missing = uuid4()
+        assert client.get(f"/{missing}").status_code == 404
+        assert client.get(f"/{missing}").status_code == 404
+        assert client.get("/not-a-uuid").status_code == 404
+        assert db.executes == 2
+
+    def test_cache_bounds(self):
+        """Entries expire after the TTL and the least recently used is evicted"""
+        from src.cache import TicketCache
+        expired = TicketCache(max_entries=10, ttl_seconds=-1)
+        expired.put("a", {"status": "VALID"})
+        assert expired.get("a") is None
+
+        cache = TicketCache(max_entries=2, ttl_seconds=30)
+        cache.put("a", {"status": "VALID"})
+        cache.put("b", {"status": "VALID"})
+        cache.get("a")
+        cache.put("c", {"status": "VALID"})
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+
+
+class TestRenderPool:
+    """Boarding pass rendering off the event loop"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def test_renders_in_worker_process(self):
+        """A render runs in the pool and returns PDF bytes"""
+        import asyncio
+        from src.renderer import RenderPool
+        from src.routes.tickets import _serialize
+        pool = RenderPool(workers=1, queue_size=0)
+        try:
+            pdf = asyncio.run(pool.render(_serialize(stored_ticket())))
+        finally:
+            pool.stop()
+        assert pdf.startswith(b"%PDF")
+        assert pool._pending == 0
+
+    def test_saturated_pool_fails_fast(self):
+        """With every slot taken a render is rejected without being queued"""
+        import asyncio
+        from src.renderer import RenderPool, RenderQueueFullError
+        pool = RenderPool(workers=1, queue_size=1)
+        pool._pending = pool.capacity
+        with pytest.raises(RenderQueueFullError):
+            asyncio.run(pool.render({}))
+        assert pool._executor is None
+
+    def test_busy_renderer_is_503(self):
+        """Download answers 503 with Retry-After when the queue is full"""
+        from src.renderer import RenderQueueFullError, render_pool
+        stored = stored_ticket()
+
+        async def get_fake_db():
+            yield TicketStore(stored)
+        app.dependency_overrides[get_db] = get_fake_db
+        with patch.object(render_pool, "render", side_effect=RenderQueueFullError("full")):
+            response = client.get(f"/{stored.id}/download")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+class TestPdfCache:
+    """Cached boarding passes and conditional downloads"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def test_etag_and_cached_pdf(self):
+        """A matching If-None-Match is a 304 and repeat downloads skip the renderer"""
+        from src.cache import pdf_cache, ticket_cache
+        from src.renderer import render_pool
+        stored = stored_ticket()
+
+        async def get_fake_db():
+            yield TicketStore(stored)
+        app.dependency_overrides[get_db] = get_fake_db
+        with patch.object(render_pool, "render", return_value=b"%PDF-rendered") as render:
+            first = client.get(f"/{stored.id}/download")
+            etag = first.headers["ETag"]
+            not_modified = client.get(f"/{stored.id}/download", headers={"If-None-Match": f"W/{etag}"})
+            again = client.get(f"/{stored.id}/download")
+        assert first.status_code == again.status_code == 200
+        assert again.content == b"%PDF-rendered"
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == etag
+        assert render.await_count == 1
+        ticket_cache.invalidate(str(stored.id))
+        pdf_cache.invalidate(str(stored.id))
+
+    def test_version_follows_rendered_fields(self):
+        """A status change gives a new content version"""
+        from src.boarding_pass import content_version
+        from src.routes.tickets import _serialize
+        stored = stored_ticket()
+        valid = _serialize(stored)
+        assert content_version(valid) == content_version(dict(valid))
+        assert content_version(valid) != content_version({**valid, "status": "CANCELLED"})
+
+    def test_byte_bound(self):
+        """Other versions miss and the cache evicts down to its byte budget"""
+        from src.cache import PdfCache
+        cache = PdfCache(max_bytes=10)
+        cache.put("a", "v1", b"12345")
+        assert cache.get("a", "v2") is None
+        cache.put("b", "v1", b"12345")
+        cache.put("c", "v1", b"123")
+        assert cache.get("a", "v1") is None
+        assert cache.size == 8
+        cache.put("big", "v1", b"x" * 11)
+        assert cache.get("big", "v1") is None
+
+
+class TestBoardingPassTemplate:
+    """Static layer drawn once as a form, per-ticket fields over it"""
+
+    def test_static_layer_is_a_form(self):
+        """The page uses one form XObject and a vector QR code, no raster image"""
+        from src.boarding_pass import render_boarding_pass
+        from src.routes.tickets import _serialize
+        pdf = render_boarding_pass(_serialize(stored_ticket()))
+        assert pdf.startswith(b"%PDF")
+        assert pdf.count(b"/Subtype /Form") == 1
+        assert b"/Subtype /Image" not in pdf
+
+    def test_dynamic_fields_differ(self):
+        """Different tickets render different passes"""
+        from src.boarding_pass import render_boarding_pass
+        from src.routes.tickets import _serialize
+        first, second = _serialize(stored_ticket()), _serialize(stored_ticket())
+        second["seat_number"] = "31F"
+        assert render_boarding_pass(first) != render_boarding_pass(second)
+
+
+class TestBoardingPassZip:
+    """Batch generation and streamed ZIP downloads"""
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def test_zip_has_one_entry_per_ticket_in_order(self):
+        """Entries follow ticket order while renders run ahead"""
+        import asyncio
+        import io
+        import zipfile
+        from src.cache import pdf_cache
+        from src.renderer import render_pool
+        from src.routes.tickets import _serialize, _stream_boarding_passes_zip
+        tickets = [_serialize(stored_ticket()) for _ in range(5)]
+
+        async def render(ticket):
+            # Later tickets finish first
+            await asyncio.sleep(0.01 * (len(tickets) - tickets.index(ticket)))
+            return f"%PDF-{ticket['ticket_id']}".encode()
+
+        async def download():
+            return [chunk async for chunk in _stream_boarding_passes_zip(tickets)]
+
+        with patch.object(settings, "TICKET_ZIP_RENDER_AHEAD", 2), \
+                patch.object(render_pool, "render", side_effect=render):
+            chunks = asyncio.run(download())
+        assert len(chunks) == len(tickets) + 1
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        assert [info.filename for info in archive.infolist()] == [
+            f"boarding_pass_JQ101_{t['ticket_id']}.pdf" for t in tickets
+        ]
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+        assert archive.read(archive.infolist()[2]) == f"%PDF-{tickets[2]['ticket_id']}".encode()
+        for t in tickets:
+            pdf_cache.invalidate(t["ticket_id"])
+
+    def test_no_tickets_is_404(self):
+        """A booking without tickets has nothing to download"""
+        class Empty:
+            async def scalars(self, stmt):
+                return _Rows([])
+
+        async def get_fake_db():
+            yield Empty()
+        app.dependency_overrides[get_db] = get_fake_db
+        assert client.get(f"/bookings/{uuid4()}/download").status_code == 404
+        assert client.get(f"/flights/{uuid4()}/download").status_code == 404
+
+    def test_batch_size_is_capped(self):
+        """More passengers than TICKET_BATCH_MAX_PASSENGERS is rejected"""
+        passengers = [{"first_name": "Ada", "last_name": f"L{i}"} for i in range(settings.TICKET_BATCH_MAX_PASSENGERS + 1)]
+        response = client.post("/generate/batch", json={"booking_id": str(uuid4()), "passengers": passengers})
+        assert response.status_code == 422
@@ -0,0 +1,31 @@
+"""
+Shared HTTP Client Utilities
+
+Pooled, instrumented httpx clients for service-to-service calls,
+with optional request hedging for idempotent calls.
+"""
+
+from .client import (
+    UpstreamConfig,
+    configure_upstream,
+    get_client,
+    close_clients,
+)
+
+from .hedging import (
+    HedgeConfig,
+    configure_hedging,
+    hedge_delay,
+    hedged_request,
+)
+
+__all__ = [
+    "UpstreamConfig",
+    "configure_upstream",
+    "get_client",
+    "close_clients",
+    "HedgeConfig",
+    "configure_hedging",
+    "hedge_delay",
+    "hedged_request",
+]
@@ -0,0 +1,156 @@
+"""
+Pooled HTTP Client for Inter-Service Calls
+
+One application-lifetime httpx.AsyncClient per upstream service, with
+keep-alive connection pooling, optional HTTP/2, per-upstream limits and
+timeouts, and Prometheus metrics per upstream.
+"""
+import os
+import time
+import logging
+import importlib.util
+from dataclasses import dataclass, replace
+from typing import Dict
+
+import httpx
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Configuration (defaults for every upstream, override per upstream with configure_upstream)
+HTTP_CLIENT_HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "false").lower() == "true"
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "100"))
+HTTP_CLIENT_MAX_KEEPALIVE = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "20"))
+HTTP_CLIENT_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "30"))
+HTTP_CLIENT_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", "10"))
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "2"))
+
+# Metrics
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Outbound requests to other services",
+    ["upstream", "method", "status"]
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Outbound request latency to other services",
+    ["upstream", "method"]
+)
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Connection pool and timeout settings for one upstream service."""
+    max_connections: int = HTTP_CLIENT_MAX_CONNECTIONS
+    max_keepalive_connections: int = HTTP_CLIENT_MAX_KEEPALIVE
+    keepalive_expiry: float = HTTP_CLIENT_KEEPALIVE_EXPIRY
+    timeout: float = HTTP_CLIENT_TIMEOUT
+    connect_timeout: float = HTTP_CLIENT_CONNECT_TIMEOUT
+    http2: bool = HTTP_CLIENT_HTTP2
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled transport to record per-upstream latency and outcomes."""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        except httpx.TimeoutException:
+            status = "timeout"
+            raise
+        finally:
+            UPSTREAM_LATENCY.labels(self.upstream, request.method).observe(time.perf_counter() - start)
+            UPSTREAM_REQUESTS.labels(self.upstream, request.method, status).inc()
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_configs: Dict[str, UpstreamConfig] = {}
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def configure_upstream(upstream: str, **overrides) -> UpstreamConfig:
+    """
+    Set pool limits / timeouts for an upstream before its client is created.
+
+    Args:
+        upstream: Logical upstream name (e.g., 'pricing-service')
+        **overrides: Any UpstreamConfig field
+
+    Returns:
+        The effective configuration
+
+    Example:
+        >>> configure_upstream("pricing-service", timeout=10.0, max_connections=50)
+    """
+    config = replace(_configs.get(upstream, UpstreamConfig()), **overrides)
+    _configs[upstream] = config
+    return config
+
+
+def get_client(upstream: str, base_url: str = "") -> httpx.AsyncClient:
+    """
+    Get the shared client for an upstream, creating it on first use.
+
+    The client lives for the whole application; do not use it as a context
+    manager (that would close the pool). Call close_clients() on shutdown.
+
+    Args:
+        upstream: Logical upstream name used for pooling and metric labels
+        base_url: Optional base URL so callers can pass relative paths
+
+    Returns:
+        Pooled httpx.AsyncClient
+
+    Example:
+        >>> client = get_client("pricing-service", settings.PRICING_SERVICE_URL)
+        >>> response = await client.post("/calculate", json=payload)
+    """
+    client = _clients.get(upstream)
+    if client is not None and not client.is_closed:
+        return client
+
+    config = _configs.get(upstream) or configure_upstream(upstream)
+    http2 = config.http2
+    if http2 and not _http2_available():
+        logger.warning(f"HTTP/2 requested for {upstream} but 'h2' is not installed, using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    transport = httpx.AsyncHTTPTransport(limits=limits, http2=http2, retries=0)
+
+    client = httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+        transport=InstrumentedTransport(upstream, transport),
+    )
+    _clients[upstream] = client
+    logger.info(f"Created pooled HTTP client for {upstream} (http2={http2}, max_connections={config.max_connections})")
+    return client
+
+
+async def close_clients() -> None:
+    """Close every pooled client. Call from the application shutdown hook."""
+    for upstream, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close HTTP client for {upstream}: {e}")
+    _clients.clear()
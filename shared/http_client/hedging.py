@@ -0,0 +1,229 @@
+"""
+Hedged Requests for Idempotent Inter-Service Calls
+
+If an attempt has not answered by the upstream's observed p95 latency, a
+second identical request is sent and whichever answers first wins; the
+loser is cancelled. An attempt that fails outright before the hedge
+delay is retried immediately instead. Every extra attempt is paid for
+from a per-upstream retry budget, so during an overload (when everything
+is slow) hedging degrades to plain single requests instead of doubling
+the load.
+
+Only use this for idempotent calls (GETs, price quotes, lookups).
+"""
+import asyncio
+import os
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Deque, Dict, Optional
+
+import httpx
+from prometheus_client import Counter
+
+from .client import get_client
+
+logger = logging.getLogger(__name__)
+
+# Configuration (defaults for every upstream, override per upstream with configure_hedging)
+HTTP_HEDGE_PERCENTILE = float(os.getenv("HTTP_HEDGE_PERCENTILE", "0.95"))
+HTTP_HEDGE_MIN_DELAY = float(os.getenv("HTTP_HEDGE_MIN_DELAY", "0.05"))  # seconds
+HTTP_HEDGE_DEFAULT_DELAY = float(os.getenv("HTTP_HEDGE_DEFAULT_DELAY", "1.0"))  # until enough samples
+HTTP_HEDGE_BUDGET_RATIO = float(os.getenv("HTTP_HEDGE_BUDGET_RATIO", "0.1"))  # extra attempts per request
+HTTP_HEDGE_BUDGET_MIN_PER_SECOND = float(os.getenv("HTTP_HEDGE_BUDGET_MIN_PER_SECOND", "1"))
+
+HEDGED_REQUESTS = Counter(
+    "upstream_hedged_requests_total",
+    "Extra attempts made by hedged requests",
+    ["upstream", "outcome"]  # hedge_sent, hedge_won, retry_sent, budget_exhausted
+)
+
+
+@dataclass(frozen=True)
+class HedgeConfig:
+    """Hedging policy for one upstream."""
+    percentile: float = HTTP_HEDGE_PERCENTILE
+    min_delay: float = HTTP_HEDGE_MIN_DELAY
+    default_delay: float = HTTP_HEDGE_DEFAULT_DELAY
+    budget_ratio: float = HTTP_HEDGE_BUDGET_RATIO
+    budget_min_per_second: float = HTTP_HEDGE_BUDGET_MIN_PER_SECOND
+    window: int = 500  # latency samples kept
+    min_samples: int = 20  # before the observed percentile is trusted
+
+
+class LatencyTracker:
+    """Rolling window of attempt latencies (successes, plus lower bounds for cancelled losers)."""
+
+    def __init__(self, window: int):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._cached: Optional[float] = None
+        self._dirty = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._dirty += 1
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        if len(self._samples) < min_samples:
+            return None
+        # Re-sorting on every call is wasteful; refresh after a few new samples
+        if self._cached is None or self._dirty >= 10:
+            ordered = sorted(self._samples)
+            self._cached = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            self._dirty = 0
+        return self._cached
+
+
+class RetryBudget:
+    """
+    Token bucket limiting extra attempts.
+
+    Each request deposits `ratio` tokens and the bucket also refills at
+    `min_per_second`; each hedge or retry withdraws one token. With
+    ratio=0.1 at most ~10% extra load is sent to the upstream.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, capacity: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity / 10
+        self._last = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+_hedge_configs: Dict[str, HedgeConfig] = {}
+_trackers: Dict[str, LatencyTracker] = {}
+_budgets: Dict[str, RetryBudget] = {}
+
+
+def configure_hedging(upstream: str, **overrides) -> HedgeConfig:
+    """
+    Set the hedging policy for an upstream (any HedgeConfig field).
+
+    Example:
+        >>> configure_hedging("pricing-service", percentile=0.9, budget_ratio=0.05)
+    """
+    config = replace(_hedge_configs.get(upstream, HedgeConfig()), **overrides)
+    _hedge_configs[upstream] = config
+    _trackers.pop(upstream, None)
+    _budgets.pop(upstream, None)
+    return config
+
+
+def _state(upstream: str):
+    config = _hedge_configs.get(upstream) or configure_hedging(upstream)
+    tracker = _trackers.get(upstream)
+    if tracker is None:
+        tracker = _trackers[upstream] = LatencyTracker(config.window)
+    budget = _budgets.get(upstream)
+    if budget is None:
+        budget = _budgets[upstream] = RetryBudget(config.budget_ratio, config.budget_min_per_second)
+    return config, tracker, budget
+
+
+def hedge_delay(upstream: str) -> float:
+    """Current hedge delay for an upstream: observed percentile, or the default until warmed up."""
+    config, tracker, _ = _state(upstream)
+    observed = tracker.percentile(config.percentile, config.min_samples)
+    return max(config.min_delay, observed if observed is not None else config.default_delay)
+
+
+async def hedged_request(
+    upstream: str,
+    method: str,
+    url: str,
+    base_url: str = "",
+    hedge_after: Optional[float] = None,
+    **kwargs
+) -> httpx.Response:
+    """
+    Send an idempotent request with hedging, on the upstream's pooled client.
+
+    Args:
+        upstream: Logical upstream name (pool, metrics, latency tracking)
+        method: HTTP method
+        url: Absolute URL or path relative to base_url
+        base_url: Passed to get_client() on first use
+        hedge_after: Fixed hedge delay in seconds (default: observed percentile)
+        **kwargs: Passed to httpx.AsyncClient.request (json, params, timeout, ...)
+
+    Returns:
+        The first response received (any status code)
+
+    Raises:
+        The last attempt's exception if every attempt failed
+
+    Example:
+        >>> response = await hedged_request("pricing-service", "POST", f"{url}/calculate", json=payload)
+    """
+    client = get_client(upstream, base_url)
+    _, tracker, budget = _state(upstream)
+    budget.deposit()
+    delay = hedge_after if hedge_after is not None else hedge_delay(upstream)
+
+    async def attempt() -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except asyncio.CancelledError:
+            # The losing attempt took at least this long; dropping it would drag the percentile down
+            tracker.record(time.perf_counter() - start)
+            raise
+        if response.status_code < 500:
+            tracker.record(time.perf_counter() - start)
+        return response
+
+    primary = asyncio.create_task(attempt())
+    pending = {primary}
+    extra_sent = False
+    error: Optional[BaseException] = None
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            task = done.pop()
+            if task.exception() is None:
+                return task.result()
+            # Failed fast: retry now rather than waiting for the hedge delay
+            error = task.exception()
+            if not budget.try_withdraw():
+                HEDGED_REQUESTS.labels(upstream, "budget_exhausted").inc()
+                raise error
+            HEDGED_REQUESTS.labels(upstream, "retry_sent").inc()
+            return await attempt()
+
+        if budget.try_withdraw():
+            HEDGED_REQUESTS.labels(upstream, "hedge_sent").inc()
+            pending.add(asyncio.create_task(attempt()))
+            extra_sent = True
+        else:
+            HEDGED_REQUESTS.labels(upstream, "budget_exhausted").inc()
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if extra_sent and task is not primary:
+                        HEDGED_REQUESTS.labels(upstream, "hedge_won").inc()
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
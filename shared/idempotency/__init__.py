@@ -0,0 +1,22 @@
+"""
+Shared Idempotency Utilities
+
+Idempotency-Key handling for retried POST requests.
+"""
+
+from .store import (
+    IdempotencyRecord,
+    PostgresIdempotencyStore,
+)
+
+from .middleware import (
+    IdempotencyMiddleware,
+    IDEMPOTENCY_HEADER,
+)
+
+__all__ = [
+    "IdempotencyRecord",
+    "PostgresIdempotencyStore",
+    "IdempotencyMiddleware",
+    "IDEMPOTENCY_HEADER",
+]
@@ -0,0 +1,258 @@
+"""
+Idempotency-Key middleware.
+
+Clients retrying a POST after a timeout send the same `Idempotency-Key`
+header. The first request with a key executes normally and its response
+(status, headers and body bytes) is stored; later requests with that key
+get the stored response replayed byte-for-byte instead of executing
+again. Duplicates that arrive while the first request is still running
+wait for it: on the same replica via an in-process future, across
+replicas by polling the store.
+
+Only 2xx/4xx responses are stored. A 5xx or an exception releases the key
+so the client's next retry runs the request again. While the handler runs
+its claim's lease is renewed every third of `lease_seconds`, so a slow
+request is never reclaimed and executed a second time by a retry.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from prometheus_client import Counter
+
+from .store import IdempotencyRecord, PostgresIdempotencyStore, COMPLETED
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome",
+    ["scope", "outcome"]  # executed, replayed, waited, in_progress, mismatch, invalid
+)
+
+
+def _normalize(path: str) -> str:
+    return path.rstrip("/") or "/"
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware enforcing `Idempotency-Key` on selected routes.
+
+    Usage:
+        from shared.idempotency import IdempotencyMiddleware, PostgresIdempotencyStore
+
+        app.add_middleware(
+            IdempotencyMiddleware,
+            store=PostgresIdempotencyStore(AsyncSessionLocal),
+            scope="payment-service",
+            routes=[("POST", "/payments/")],
+        )
+    """
+
+    def __init__(
+        self,
+        app,
+        store: PostgresIdempotencyStore,
+        scope: str,
+        routes: Iterable[Tuple[str, str]],
+        wait_timeout: float = 30.0,
+        purge_interval: float = 300.0
+    ):
+        self.app = app
+        self.store = store
+        self.scope = scope
+        self.routes = {(method.upper(), _normalize(path)) for method, path in routes}
+        self.wait_timeout = wait_timeout
+        self.purge_interval = purge_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._last_purge = time.monotonic()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], _normalize(scope["path"])) not in self.routes:
+            return await self.app(scope, receive, send)
+
+        key = self._header(scope, IDEMPOTENCY_HEADER)
+        if key is None:
+            return await self.app(scope, receive, send)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            IDEMPOTENCY_REQUESTS.labels(self.scope, "invalid").inc()
+            return await self._send_error(send, 400, "Invalid Idempotency-Key header")
+
+        body = await self._read_body(receive)
+        fingerprint = hashlib.sha256(
+            scope["method"].encode() + b" " + scope["path"].encode() + b"\n" + body
+        ).hexdigest()
+
+        # Same replica: piggyback on the in-flight request
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                record = await asyncio.wait_for(asyncio.shield(inflight), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                record = None
+            return await self._respond_existing(send, record, fingerprint, waited=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            owner = await self.store.claim(self.scope, key, fingerprint)
+            if owner:
+                record = await self._execute(scope, body, send, key, fingerprint, owner)
+                future.set_result(record)
+                return
+            record = await self.store.get(self.scope, key)
+            if record is not None and not record.completed:
+                record = await self._poll(key)
+            future.set_result(record)
+            return await self._respond_existing(send, record, fingerprint, waited=False)
+        except BaseException:
+            if not future.done():
+                future.set_result(None)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            self._maybe_purge()
+
+    async def _execute(
+        self, scope, body: bytes, send, key: str, fingerprint: str, owner: str
+    ) -> Optional[IdempotencyRecord]:
+        """Run the request once, streaming the response to the client while capturing it."""
+        status_code = 500
+        headers = []
+        chunks = []
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def capture_send(message):
+            nonlocal status_code, headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(key, owner))
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self.store.release(self.scope, key, owner)
+            raise
+        finally:
+            heartbeat.cancel()
+
+        if status_code >= 500:
+            await self.store.release(self.scope, key, owner)
+            IDEMPOTENCY_REQUESTS.labels(self.scope, "executed").inc()
+            return None
+
+        record = IdempotencyRecord(
+            fingerprint=fingerprint, state=COMPLETED,
+            status_code=status_code, headers=headers, body=b"".join(chunks)
+        )
+        if not await self.store.complete(self.scope, key, owner, record.status_code, record.headers, record.body):
+            logger.warning(f"Idempotency key {key} was reclaimed before its response was stored")
+        IDEMPOTENCY_REQUESTS.labels(self.scope, "executed").inc()
+        return record
+
+    async def _heartbeat(self, key: str, owner: str) -> None:
+        """Keep the claim's lease alive while the handler runs."""
+        interval = self.store.lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.store.extend(self.scope, key, owner):
+                    logger.warning(f"Lost the lease on idempotency key {key}")
+                    return
+            except Exception as e:
+                logger.warning(f"Idempotency lease renewal for {key} failed: {e}")
+
+    async def _poll(self, key: str) -> Optional[IdempotencyRecord]:
+        """Wait for another replica to finish the request (exponential backoff, bounded)."""
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            record = await self.store.get(self.scope, key)
+            if record is None or record.completed:
+                return record
+            delay = min(delay * 2, 1.0)
+        return None
+
+    async def _respond_existing(self, send, record: Optional[IdempotencyRecord], fingerprint: str, waited: bool):
+        if record is None or not record.completed:
+            IDEMPOTENCY_REQUESTS.labels(self.scope, "in_progress").inc()
+            return await self._send_error(
+                send, 409, "A request with this Idempotency-Key is still in progress or failed; retry later"
+            )
+        if record.fingerprint != fingerprint:
+            IDEMPOTENCY_REQUESTS.labels(self.scope, "mismatch").inc()
+            return await self._send_error(
+                send, 422, "Idempotency-Key was already used with a different request"
+            )
+        IDEMPOTENCY_REQUESTS.labels(self.scope, "waited" if waited else "replayed").inc()
+        await send({
+            "type": "http.response.start",
+            "status": record.status_code,
+            "headers": record.headers + [REPLAYED_HEADER]
+        })
+        await send({"type": "http.response.body", "body": record.body})
+
+    def _maybe_purge(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+
+        async def purge():
+            try:
+                removed = await self.store.purge_expired()
+                if removed:
+                    logger.info(f"Purged {removed} expired idempotency keys")
+            except Exception as e:
+                logger.warning(f"Idempotency key purge failed: {e}")
+
+        asyncio.get_running_loop().create_task(purge())
+
+    @staticmethod
+    def _header(scope, name: str) -> Optional[str]:
+        for k, v in scope.get("headers", []):
+            if k.decode("latin-1").lower() == name:
+                return v.decode("latin-1").strip()
+        return None
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    async def _send_error(send, status_code: int, detail: str):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,161 @@
+"""
+Idempotency key store.
+
+One row per (scope, key) in `idempotency_keys`. A request claims its key
+with an insert and gets an owner token; the row stays IN_PROGRESS while
+the handler runs, with a short lease the owner keeps extending, and is
+then completed with the exact response bytes, which are kept for
+`ttl_seconds`. Only expired rows (completed ones past their TTL, or
+claims whose owner stopped renewing the lease) are reclaimed, and
+extend/complete/release only touch the row while the caller still owns it.
+"""
+import json
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+
+_CLAIM_SQL = text("""
+    INSERT INTO idempotency_keys (scope, key, fingerprint, state, owner, created_at, expires_at)
+    VALUES (:scope, :key, :fingerprint, 'IN_PROGRESS', :owner, now(), now() + make_interval(secs => :lease))
+    ON CONFLICT (scope, key) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, state = 'IN_PROGRESS', owner = EXCLUDED.owner,
+            status_code = NULL, response_headers = NULL, response_body = NULL,
+            created_at = EXCLUDED.created_at, expires_at = EXCLUDED.expires_at
+        WHERE idempotency_keys.expires_at < now()
+    RETURNING key
+""")
+
+_EXTEND_SQL = text("""
+    UPDATE idempotency_keys
+    SET expires_at = now() + make_interval(secs => :lease)
+    WHERE scope = :scope AND key = :key AND owner = :owner AND state = 'IN_PROGRESS'
+    RETURNING key
+""")
+
+_GET_SQL = text("""
+    SELECT fingerprint, state, status_code, response_headers, response_body
+    FROM idempotency_keys
+    WHERE scope = :scope AND key = :key AND expires_at >= now()
+""")
+
+_COMPLETE_SQL = text("""
+    UPDATE idempotency_keys
+    SET state = 'COMPLETED', status_code = :status_code, response_headers = :headers,
+        response_body = :body, expires_at = now() + make_interval(secs => :ttl)
+    WHERE scope = :scope AND key = :key AND owner = :owner AND state = 'IN_PROGRESS'
+    RETURNING key
+""")
+
+_RELEASE_SQL = text("""
+    DELETE FROM idempotency_keys
+    WHERE scope = :scope AND key = :key AND owner = :owner AND state = 'IN_PROGRESS'
+""")
+
+_PURGE_SQL = text("DELETE FROM idempotency_keys WHERE expires_at < now()")
+
+
+@dataclass(frozen=True)
+class IdempotencyRecord:
+    """Stored state for one key. `headers` are raw ASGI (name, value) byte pairs."""
+    fingerprint: str
+    state: str
+    status_code: Optional[int] = None
+    headers: List[Tuple[bytes, bytes]] = field(default_factory=list)
+    body: bytes = b""
+
+    @property
+    def completed(self) -> bool:
+        return self.state == COMPLETED
+
+
+def _encode_headers(headers: List[Tuple[bytes, bytes]]) -> str:
+    return json.dumps([[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers])
+
+
+def _decode_headers(raw: Optional[str]) -> List[Tuple[bytes, bytes]]:
+    if not raw:
+        return []
+    return [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(raw)]
+
+
+class PostgresIdempotencyStore:
+    """
+    Idempotency store backed by the service's Postgres database.
+
+    Usage:
+        store = PostgresIdempotencyStore(AsyncSessionLocal, ttl_seconds=86400)
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, ttl_seconds: int = 86400, lease_seconds: int = 60):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds  # How long an IN_PROGRESS claim survives a crashed handler (renewed while it runs)
+
+    async def claim(self, scope: str, key: str, fingerprint: str) -> Optional[str]:
+        """Try to take ownership of a key; returns an owner token if this caller should execute the request."""
+        owner = str(uuid.uuid4())
+        async with self.session_factory() as db:
+            result = await db.execute(_CLAIM_SQL, {
+                "scope": scope, "key": key, "fingerprint": fingerprint, "owner": owner,
+                "lease": float(self.lease_seconds)
+            })
+            claimed = result.first() is not None
+            await db.commit()
+        return owner if claimed else None
+
+    async def extend(self, scope: str, key: str, owner: str) -> bool:
+        """Renew the owner's lease; False if the claim was lost (lease lapsed and reclaimed)."""
+        async with self.session_factory() as db:
+            result = await db.execute(_EXTEND_SQL, {
+                "scope": scope, "key": key, "owner": owner, "lease": float(self.lease_seconds)
+            })
+            extended = result.first() is not None
+            await db.commit()
+        return extended
+
+    async def get(self, scope: str, key: str) -> Optional[IdempotencyRecord]:
+        async with self.session_factory() as db:
+            row = (await db.execute(_GET_SQL, {"scope": scope, "key": key})).first()
+        if row is None:
+            return None
+        return IdempotencyRecord(
+            fingerprint=row.fingerprint,
+            state=row.state,
+            status_code=row.status_code,
+            headers=_decode_headers(row.response_headers),
+            body=bytes(row.response_body or b"")
+        )
+
+    async def complete(
+        self, scope: str, key: str, owner: str, status_code: int, headers: List[Tuple[bytes, bytes]], body: bytes
+    ) -> bool:
+        """Store the final response for replay; False if the caller no longer owns the key."""
+        async with self.session_factory() as db:
+            result = await db.execute(_COMPLETE_SQL, {
+                "scope": scope, "key": key, "owner": owner, "status_code": status_code,
+                "headers": _encode_headers(headers), "body": body, "ttl": float(self.ttl_seconds)
+            })
+            completed = result.first() is not None
+            await db.commit()
+        return completed
+
+    async def release(self, scope: str, key: str, owner: str) -> None:
+        """Drop the owner's in-progress claim so a retry executes the request again."""
+        async with self.session_factory() as db:
+            await db.execute(_RELEASE_SQL, {"scope": scope, "key": key, "owner": owner})
+            await db.commit()
+
+    async def purge_expired(self) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(_PURGE_SQL)
+            await db.commit()
+        return result.rowcount or 0
@@ -0,0 +1,145 @@
+"""
+Unit tests for shared.http_client (pooled clients and hedged requests)
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from shared.http_client import (
+    close_clients,
+    configure_hedging,
+    configure_upstream,
+    get_client,
+    hedge_delay,
+    hedged_request,
+)
+from shared.http_client import client as client_module
+from shared.http_client import hedging
+from shared.http_client.client import InstrumentedTransport, UPSTREAM_REQUESTS
+from shared.http_client.hedging import LatencyTracker, RetryBudget
+
+
+def mock_upstream(upstream: str, handler) -> list:
+    """Install a pooled client for `upstream` answering from `handler(request, attempt)`."""
+    calls = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return await handler(request, len(calls))
+
+    configure_hedging(upstream)  # Fresh latency window and budget
+    client_module._clients[upstream] = httpx.AsyncClient(
+        transport=InstrumentedTransport(upstream, httpx.MockTransport(handle))
+    )
+    return calls
+
+
+class TestPooledClient:
+    """One shared client per upstream"""
+
+    def test_client_is_reused(self):
+        """Every call for an upstream gets the same pooled client"""
+        configure_upstream("test-pooled", timeout=3.0, max_connections=7)
+        client = get_client("test-pooled")
+        assert get_client("test-pooled") is client
+        assert client.timeout.read == 3.0
+        asyncio.run(close_clients())
+        assert client.is_closed
+        assert get_client("test-pooled") is not client
+        asyncio.run(close_clients())
+
+    def test_requests_are_counted_per_upstream(self):
+        """The instrumented transport labels outcomes by upstream and status"""
+        async def ok(request, attempt):
+            return httpx.Response(204)
+
+        mock_upstream("test-metrics", ok)
+        before = UPSTREAM_REQUESTS.labels("test-metrics", "GET", "204")._value.get()
+        asyncio.run(get_client("test-metrics").get("http://upstream/ping"))
+        assert UPSTREAM_REQUESTS.labels("test-metrics", "GET", "204")._value.get() == before + 1
+
+
+class TestHedgedRequest:
+    """Hedging idempotent calls"""
+
+    def test_fast_response_is_not_hedged(self):
+        """An answer before the hedge delay sends nothing extra"""
+        async def fast(request, attempt):
+            return httpx.Response(200, json={"attempt": attempt})
+
+        calls = mock_upstream("test-fast", fast)
+        response = asyncio.run(hedged_request("test-fast", "GET", "http://upstream/quote", hedge_after=0.5))
+        assert response.json() == {"attempt": 1}
+        assert len(calls) == 1
+
+    def test_slow_primary_is_hedged(self):
+        """A second attempt goes out after hedge_after and the faster one wins"""
+        async def first_slow(request, attempt):
+            if attempt == 1:
+                await asyncio.sleep(2)
+            return httpx.Response(200, json={"attempt": attempt})
+
+        calls = mock_upstream("test-slow", first_slow)
+        response = asyncio.run(hedged_request("test-slow", "POST", "http://upstream/quote", json={}, hedge_after=0.05))
+        assert response.json() == {"attempt": 2}
+        assert len(calls) == 2
+
+    def test_losing_primary_is_recorded(self):
+        """The cancelled slow primary still contributes its elapsed time as a latency sample"""
+        async def first_slow(request, attempt):
+            if attempt == 1:
+                await asyncio.sleep(2)
+            return httpx.Response(200)
+
+        mock_upstream("test-loser", first_slow)
+        asyncio.run(hedged_request("test-loser", "GET", "http://upstream/quote", hedge_after=0.1))
+        samples = sorted(hedging._trackers["test-loser"]._samples)
+        assert len(samples) == 2
+        assert samples[-1] >= 0.1
+
+    def test_fast_failure_is_retried(self):
+        """A connection error before the hedge delay is retried at once"""
+        async def first_fails(request, attempt):
+            if attempt == 1:
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={"attempt": attempt})
+
+        calls = mock_upstream("test-retry", first_fails)
+        response = asyncio.run(hedged_request("test-retry", "GET", "http://upstream/quote", hedge_after=1.0))
+        assert response.json() == {"attempt": 2}
+        assert len(calls) == 2
+
+    def test_all_attempts_failing_raises(self):
+        """The last attempt's error propagates"""
+        async def always_fails(request, attempt):
+            raise httpx.ConnectError("refused", request=request)
+
+        mock_upstream("test-down", always_fails)
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(hedged_request("test-down", "GET", "http://upstream/quote", hedge_after=1.0))
+
+    def test_default_delay_until_warmed_up(self):
+        """Without enough samples the configured default delay is used"""
+        configure_hedging("test-delay", default_delay=0.7, min_samples=20)
+        assert hedge_delay("test-delay") == 0.7
+
+
+class TestHedgingPrimitives:
+    """Latency window and retry budget"""
+
+    def test_percentile_needs_min_samples(self):
+        tracker = LatencyTracker(window=100)
+        for ms in range(1, 11):
+            tracker.record(ms / 1000)
+        assert tracker.percentile(0.9, min_samples=20) is None
+        assert tracker.percentile(0.9, min_samples=10) == 0.010
+
+    def test_budget_limits_extra_attempts(self):
+        """Extra attempts are only paid for by deposits"""
+        budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=1.0)
+        assert not budget.try_withdraw()
+        budget.deposit()
+        budget.deposit()
+        assert budget.try_withdraw()
+        assert not budget.try_withdraw()
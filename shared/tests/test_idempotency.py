@@ -0,0 +1,127 @@
+"""
+Unit tests for shared.idempotency
+"""
+import asyncio
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from shared.idempotency import IdempotencyMiddleware, IdempotencyRecord
+from shared.idempotency.store import COMPLETED, IN_PROGRESS
+
+
+class MemoryStore:
+    """In-process stand-in for PostgresIdempotencyStore (same methods)."""
+
+    def __init__(self, lease_seconds=60):
+        self.lease_seconds = lease_seconds
+        self.records = {}
+        self.owners = {}
+        self.extensions = 0
+
+    async def claim(self, scope, key, fingerprint):
+        if (scope, key) in self.records:
+            return None
+        self.records[(scope, key)] = IdempotencyRecord(fingerprint=fingerprint, state=IN_PROGRESS)
+        self.owners[(scope, key)] = f"owner-{len(self.owners)}"
+        return self.owners[(scope, key)]
+
+    async def extend(self, scope, key, owner):
+        self.extensions += 1
+        return self.owners.get((scope, key)) == owner
+
+    async def get(self, scope, key):
+        return self.records.get((scope, key))
+
+    async def complete(self, scope, key, owner, status_code, headers, body):
+        if self.owners.get((scope, key)) != owner:
+            return False
+        fingerprint = self.records[(scope, key)].fingerprint
+        self.records[(scope, key)] = IdempotencyRecord(fingerprint, COMPLETED, status_code, headers, body)
+        return True
+
+    async def release(self, scope, key, owner):
+        if self.owners.get((scope, key)) == owner:
+            self.records.pop((scope, key), None)
+
+    async def purge_expired(self):
+        return 0
+
+
+def make_client(lease_seconds=60):
+    app = FastAPI()
+    store = MemoryStore(lease_seconds)
+    calls = []
+
+    @app.post("/payments/")
+    async def pay(body: dict):
+        calls.append(body)
+        await asyncio.sleep(body.get("delay", 0))
+        if body.get("fail"):
+            raise HTTPException(status_code=503, detail="gateway down")
+        return {"payment_id": f"pay-{len(calls)}", "amount": body["amount"]}
+
+    app.add_middleware(IdempotencyMiddleware, store=store, scope="test", routes=[("POST", "/payments/")], wait_timeout=0.5)
+    return TestClient(app), store, calls
+
+
+class TestIdempotentReplay:
+    """Retried POSTs with the same Idempotency-Key"""
+
+    def test_retry_replays_stored_response(self):
+        """The handler runs once; the retry gets the same bytes back"""
+        client, _, calls = make_client()
+        headers = {"Idempotency-Key": "abc"}
+        first = client.post("/payments/", json={"amount": 10}, headers=headers)
+        second = client.post("/payments/", json={"amount": 10}, headers=headers)
+
+        assert first.status_code == second.status_code == 200
+        assert second.content == first.content
+        assert second.headers["idempotent-replayed"] == "true"
+        assert "idempotent-replayed" not in first.headers
+        assert len(calls) == 1
+
+    def test_key_reused_with_different_body(self):
+        """Same key, different request is rejected"""
+        client, _, calls = make_client()
+        client.post("/payments/", json={"amount": 10}, headers={"Idempotency-Key": "abc"})
+        response = client.post("/payments/", json={"amount": 99}, headers={"Idempotency-Key": "abc"})
+        assert response.status_code == 422
+        assert len(calls) == 1
+
+    def test_server_error_releases_key(self):
+        """A 5xx is not stored, so the next retry executes again"""
+        client, store, calls = make_client()
+        headers = {"Idempotency-Key": "retry-me"}
+        assert client.post("/payments/", json={"amount": 10, "fail": True}, headers=headers).status_code == 503
+        assert store.records == {}
+        assert client.post("/payments/", json={"amount": 10, "fail": True}, headers=headers).status_code == 503
+        assert len(calls) == 2
+
+    def test_in_progress_key_conflicts(self):
+        """A key claimed elsewhere and never finished answers 409"""
+        client, store, calls = make_client()
+        store.records[("test", "busy")] = IdempotencyRecord(fingerprint="x", state=IN_PROGRESS)
+        response = client.post("/payments/", json={"amount": 10}, headers={"Idempotency-Key": "busy"})
+        assert response.status_code == 409
+        assert calls == []
+
+    def test_requests_without_key_always_execute(self):
+        """No header, no idempotency"""
+        client, store, calls = make_client()
+        client.post("/payments/", json={"amount": 10})
+        client.post("/payments/", json={"amount": 10})
+        assert len(calls) == 2
+        assert store.records == {}
+
+
+class TestLease:
+    """In-progress claims outliving their lease"""
+
+    def test_lease_is_renewed_while_handler_runs(self):
+        """A handler slower than the lease keeps its claim, so a retry cannot re-execute it"""
+        client, store, calls = make_client(lease_seconds=0.06)
+        response = client.post("/payments/", json={"amount": 10, "delay": 0.2}, headers={"Idempotency-Key": "slow"})
+        assert response.status_code == 200
+        assert store.extensions >= 2
+        assert store.records[("test", "slow")].completed
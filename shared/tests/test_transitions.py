@@ -0,0 +1,143 @@
+"""
+Unit tests for shared.transitions
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.orm import declarative_base
+
+from shared.transitions import (
+    InvalidTransitionError,
+    RowNotFoundError,
+    VersionConflictError,
+    retry_on_conflict,
+    transition_status,
+)
+
+Base = declarative_base()
+
+
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String(20), nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+
+
+class _Result:
+    def __init__(self, row):
+        self.row = row
+
+    def first(self):
+        return self.row
+
+
+class FakeSession:
+    """Answers the conditional UPDATE and the diagnostic SELECT from a dict row."""
+
+    def __init__(self, row=None):
+        self.row = row  # Current {"status", "version"}, or None if missing
+        self.statements = []
+        self.rollbacks = 0
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        params = stmt.compile().params
+        if stmt.is_dml:
+            if self.row is None or self.row["status"] not in params["status_1"]:
+                return _Result(None)
+            if "version_2" in params and self.row["version"] != params["version_2"]:  # version_1 is the +1
+                return _Result(None)
+            self.row = {"status": params["status"], "version": self.row["version"] + 1}
+            return _Result(SimpleNamespace(version=self.row["version"]))
+        return _Result(SimpleNamespace(**self.row) if self.row else None)
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class TestTransitionStatus:
+    """Conditional status transitions"""
+
+    def test_applies_allowed_transition(self):
+        """Matching status moves the row and bumps its version"""
+        db = FakeSession({"status": "PENDING", "version": 1})
+        row = asyncio.run(transition_status(db, Order, 1, "CONFIRMED", ["PENDING"]))
+        assert row.version == 2
+        assert db.row == {"status": "CONFIRMED", "version": 2}
+        assert len(db.statements) == 1  # No diagnostic SELECT on success
+
+    def test_update_is_conditional(self):
+        """The WHERE clause carries the allowed statuses and the expected version"""
+        db = FakeSession({"status": "PENDING", "version": 3})
+        asyncio.run(transition_status(db, Order, 1, "CONFIRMED", ["PENDING"], expected_version=3))
+        sql = str(db.statements[0])
+        assert "orders.status IN" in sql
+        assert "orders.version = :version_2" in sql
+
+    def test_invalid_transition(self):
+        """A status outside from_statuses raises with the current status"""
+        db = FakeSession({"status": "CANCELLED", "version": 4})
+        with pytest.raises(InvalidTransitionError) as error:
+            asyncio.run(transition_status(db, Order, 1, "CONFIRMED", ["PENDING"]))
+        assert error.value.current_status == "CANCELLED"
+        assert db.row["version"] == 4
+
+    def test_missing_row(self):
+        """No row raises RowNotFoundError"""
+        with pytest.raises(RowNotFoundError):
+            asyncio.run(transition_status(FakeSession(None), Order, 1, "CONFIRMED", ["PENDING"]))
+
+    def test_stale_version_conflicts(self):
+        """Right status but a newer version raises VersionConflictError"""
+        db = FakeSession({"status": "PENDING", "version": 5})
+        with pytest.raises(VersionConflictError):
+            asyncio.run(transition_status(db, Order, 1, "CONFIRMED", ["PENDING"], expected_version=4))
+        assert db.row == {"status": "PENDING", "version": 5}
+
+
+class TestRetryOnConflict:
+    """Re-running read-decide-transition after a conflict"""
+
+    def test_retries_until_applied(self):
+        """A conflicting attempt is rolled back and re-run"""
+        db = FakeSession({"status": "PENDING", "version": 1})
+        attempts = []
+
+        async def confirm():
+            # First attempt read a version that was bumped before its UPDATE
+            version = db.row["version"] if attempts else 0
+            attempts.append(version)
+            return await transition_status(db, Order, 1, "CONFIRMED", ["PENDING"], expected_version=version)
+
+        row = asyncio.run(retry_on_conflict(confirm, name="test_confirm", rollback=db))
+        assert row.version == 2
+        assert attempts == [0, 1]
+        assert db.rollbacks == 1
+
+    def test_gives_up_after_attempts(self):
+        """Persistent conflicts re-raise after the last attempt"""
+        calls = []
+
+        async def always_conflict():
+            calls.append(1)
+            raise VersionConflictError("changed")
+
+        with pytest.raises(VersionConflictError):
+            asyncio.run(retry_on_conflict(always_conflict, attempts=3, name="test_exhausted"))
+        assert len(calls) == 3
+
+    def test_other_errors_are_not_retried(self):
+        """Only version conflicts are retried"""
+        calls = []
+
+        async def invalid():
+            calls.append(1)
+            raise InvalidTransitionError("CANCELLED", "CONFIRMED")
+
+        with pytest.raises(InvalidTransitionError):
+            asyncio.run(retry_on_conflict(invalid, name="test_invalid"))
+        assert len(calls) == 1
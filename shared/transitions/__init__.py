@@ -0,0 +1,24 @@
+"""
+Shared Status Transition Utilities
+
+Optimistic-concurrency status transitions (conditional UPDATE on
+id / status / version) with a retry helper and conflict metrics.
+"""
+
+from .transitions import (
+    TransitionError,
+    RowNotFoundError,
+    InvalidTransitionError,
+    VersionConflictError,
+    transition_status,
+    retry_on_conflict,
+)
+
+__all__ = [
+    "TransitionError",
+    "RowNotFoundError",
+    "InvalidTransitionError",
+    "VersionConflictError",
+    "transition_status",
+    "retry_on_conflict",
+]
@@ -0,0 +1,158 @@
+"""
+Optimistic Status Transitions
+
+Status changes are a single conditional UPDATE instead of
+read-check-write in Python:
+
+    UPDATE bookings SET status = 'CONFIRMED', version = version + 1
+    WHERE id = :id AND status IN ('PENDING') [AND version = :version]
+    RETURNING ...
+
+If no row matches, one diagnostic SELECT tells the caller why: the row
+does not exist, its status does not allow the transition, or (when an
+expected version was given) someone else changed it first. Conflicts can
+be retried with retry_on_conflict(), which re-runs the caller's
+read-decide-transition function, so updates are never lost and hot rows
+are never locked across a request.
+
+Models must have `id`, `status` and an integer `version` column.
+"""
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, Iterable, Optional, TypeVar
+
+from prometheus_client import Counter
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STATUS_TRANSITIONS = Counter(
+    "status_transitions_total",
+    "Conditional status transitions by outcome",
+    ["table", "to_status", "outcome"]  # applied, conflict, invalid, not_found
+)
+TRANSITION_RETRIES = Counter(
+    "status_transition_retries_total",
+    "Transitions retried after a version conflict",
+    ["operation", "result"]  # retried, exhausted
+)
+
+
+class TransitionError(ValueError):
+    """Base class for transitions that did not apply."""
+
+
+class RowNotFoundError(TransitionError):
+    """The row does not exist."""
+
+
+class InvalidTransitionError(TransitionError):
+    """The row's current status does not allow the transition."""
+
+    def __init__(self, current_status: str, to_status: str):
+        super().__init__(f"Cannot change status from {current_status} to {to_status}")
+        self.current_status = current_status
+        self.to_status = to_status
+
+
+class VersionConflictError(TransitionError):
+    """The row changed since it was read (expected version is stale)."""
+
+
+async def transition_status(
+    db: AsyncSession,
+    model,
+    row_id: Any,
+    to_status: str,
+    from_statuses: Iterable[str],
+    expected_version: Optional[int] = None,
+    returning: Iterable = (),
+    **values
+):
+    """
+    Atomically move a row to `to_status` if its status is in `from_statuses`
+    (and its version equals `expected_version`, when given). Does not commit.
+
+    Args:
+        db: Session (the caller commits, so the change can share a transaction)
+        model: Mapped class with id / status / version columns
+        row_id: Primary key
+        to_status: New status
+        from_statuses: Statuses the transition is allowed from
+        expected_version: Version the caller read, for read-decide-write flows
+        returning: Extra columns to return
+        **values: Other columns to set in the same UPDATE
+
+    Returns:
+        Row with the new `version` plus any `returning` columns
+
+    Raises:
+        RowNotFoundError, InvalidTransitionError, VersionConflictError
+
+    Example:
+        >>> await transition_status(db, Booking, booking_id, "CONFIRMED", ["PENDING"])
+    """
+    from_statuses = list(from_statuses)
+    table = model.__tablename__
+    stmt = (
+        update(model)
+        .where(model.id == row_id)
+        .where(model.status.in_(from_statuses))
+        .values(status=to_status, version=model.version + 1, **values)
+        .returning(model.version, *returning)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(model.version == expected_version)
+
+    row = (await db.execute(stmt)).first()
+    if row is not None:
+        STATUS_TRANSITIONS.labels(table, to_status, "applied").inc()
+        return row
+
+    current = (await db.execute(
+        select(model.status, model.version).where(model.id == row_id)
+    )).first()
+    if current is None:
+        STATUS_TRANSITIONS.labels(table, to_status, "not_found").inc()
+        raise RowNotFoundError(f"{table} row {row_id} not found")
+    if current.status not in from_statuses:
+        STATUS_TRANSITIONS.labels(table, to_status, "invalid").inc()
+        raise InvalidTransitionError(current.status, to_status)
+    STATUS_TRANSITIONS.labels(table, to_status, "conflict").inc()
+    raise VersionConflictError(f"{table} row {row_id} changed concurrently (version {current.version})")
+
+
+async def retry_on_conflict(
+    operation: Callable[[], Awaitable[T]],
+    attempts: int = 3,
+    name: str = "transition",
+    rollback: Optional[AsyncSession] = None
+) -> T:
+    """
+    Run `operation` (read, decide, transition_status with expected_version)
+    again when it raises VersionConflictError, with a short jittered backoff.
+
+    Args:
+        operation: Zero-argument coroutine function doing one full attempt
+        attempts: Total attempts before the conflict is re-raised
+        name: Label for status_transition_retries_total
+        rollback: Session to roll back between attempts, if the operation used one
+
+    Example:
+        >>> await retry_on_conflict(lambda: confirm(db, booking_id), name="confirm_booking", rollback=db)
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await operation()
+        except VersionConflictError:
+            if attempt == attempts:
+                TRANSITION_RETRIES.labels(name, "exhausted").inc()
+                raise
+            TRANSITION_RETRIES.labels(name, "retried").inc()
+            if rollback is not None:
+                await rollback.rollback()
+            await asyncio.sleep(random.uniform(0, 0.01 * 2 ** attempt))